@@ -1,8 +1,12 @@
 from flask import Flask, render_template, request, session, redirect, url_for, jsonify
 import sqlite3
 import os
+import time
+import atexit
+import threading
 import traceback
 import numpy as np
+from datetime import date
 import pickle
 from typing import List, Dict, Any
 from difflib import SequenceMatcher
@@ -15,6 +19,8 @@ app.secret_key = "steam_game_recommender_secret_key"
 STEAM_API_DB = "./steam_api.db"  # Original database for pricing/images
 RECOMMENDATIONS_DB = "./steam_recommendations.db"  # New hierarchical database
 VECTORIZER_PATH = "./hierarchical_vectorizer.pkl"
+TRAFFIC_DB = "./traffic.db"  # Searches and recommendations per game, read by the refresh scheduler
+TRAFFIC_FLUSH_SECONDS = 30
 
 class SQLiteGameSearcher:
     def __init__(self, recommendations_db=RECOMMENDATIONS_DB, steam_api_db=STEAM_API_DB):
@@ -165,23 +171,16 @@ class SQLiteGameSearcher:
             game_dict = dict(game)
             
             # Get all tags
-            cursor.execute("""
-            SELECT tag FROM steam_tags WHERE steam_appid = ? ORDER BY tag_order
-            """, (steam_appid,))
-            game_dict['steam_tags'] = [row[0] for row in cursor.fetchall()]
-            
-            cursor.execute("""
-            SELECT tag FROM unique_tags WHERE steam_appid = ? ORDER BY tag_order
-            """, (steam_appid,))
-            game_dict['unique_tags'] = [row[0] for row in cursor.fetchall()]
+            for table in ['steam_tags', 'unique_tags', 'subjective_tags']:
+                cursor.execute(f"""
+                SELECT t.tag FROM {table} x JOIN tags t ON t.id = x.tag_id
+                WHERE x.steam_appid = ? ORDER BY x.tag_order
+                """, (steam_appid,))
+                game_dict[table] = [row[0] for row in cursor.fetchall()]
             
             cursor.execute("""
-            SELECT tag FROM subjective_tags WHERE steam_appid = ? ORDER BY tag_order
-            """, (steam_appid,))
-            game_dict['subjective_tags'] = [row[0] for row in cursor.fetchall()]
-            
-            cursor.execute("""
-            SELECT tag, ratio FROM tag_ratios WHERE steam_appid = ?
+            SELECT t.tag, tr.ratio FROM tag_ratios tr JOIN tags t ON t.id = tr.tag_id
+            WHERE tr.steam_appid = ?
             """, (steam_appid,))
             game_dict['tag_ratios'] = {row[0]: row[1] for row in cursor.fetchall()}
             
@@ -254,11 +253,14 @@ class SQLiteGameSearcher:
             if not candidates:
                 return []
             
+            # Resolve the selected tags to ids once for all candidates
+            resolved_preferences = self._resolve_preference_tags(user_preferences, cursor)
+            
             # Calculate similarities using vectors if available
             if self.vectorizer:
-                similarities = self._calculate_vector_similarities(target_appid, candidates, user_preferences, cursor)
+                similarities = self._calculate_vector_similarities(target_appid, candidates, resolved_preferences, cursor)
             else:
-                similarities = self._calculate_tag_similarities(target_appid, candidates, user_preferences, cursor)
+                similarities = self._calculate_tag_similarities(target_appid, candidates, resolved_preferences, cursor)
             
             # Enhance with Steam API data
             enhanced_games = []
@@ -294,12 +296,12 @@ class SQLiteGameSearcher:
         
         # Check tags
         cursor.execute("""
-        SELECT COUNT(*) FROM unique_tags 
-        WHERE steam_appid = ? AND (
-            LOWER(tag) LIKE '%souls%' OR 
-            LOWER(tag) LIKE '%soulslike%' OR 
-            LOWER(tag) LIKE '%stamina%' OR
-            LOWER(tag) LIKE '%challenging-but-fair%'
+        SELECT COUNT(*) FROM unique_tags ut
+        JOIN tags t ON t.id = ut.tag_id
+        WHERE ut.steam_appid = ? AND (
+            t.normalized LIKE '%souls%' OR 
+            t.normalized LIKE '%stamina%' OR
+            t.normalized LIKE '%challenging-but-fair%'
         )
         """, (steam_appid,))
         
@@ -321,14 +323,15 @@ class SQLiteGameSearcher:
         # Soulslike matches (if applicable)
         if is_soulslike:
             cursor.execute("""
-            SELECT DISTINCT g.steam_appid, 'soulslike' as match_type, 0.5 as hierarchy_bonus
+            SELECT g.steam_appid, 'soulslike' as match_type, 0.5 as hierarchy_bonus
             FROM games g
-            LEFT JOIN unique_tags ut ON g.steam_appid = ut.steam_appid
             WHERE g.steam_appid != ? AND (
                 LOWER(g.name) LIKE '%souls%' OR
                 LOWER(g.sub_sub_genre) LIKE '%souls%' OR
-                LOWER(ut.tag) LIKE '%souls%' OR
-                LOWER(ut.tag) LIKE '%soulslike%'
+                g.steam_appid IN (
+                    SELECT ut.steam_appid FROM unique_tags ut
+                    WHERE ut.tag_id IN (SELECT id FROM tags WHERE kind = 'unique' AND normalized LIKE '%souls%')
+                )
             )
             LIMIT 20
             """, (target_appid,))
@@ -414,23 +417,21 @@ class SQLiteGameSearcher:
     
     def _calculate_tag_similarities(self, target_appid, candidates, user_preferences, cursor):
         """Fallback tag-based similarity calculation"""
-        # Get target game tags
-        cursor.execute("""
-        SELECT tag FROM unique_tags WHERE steam_appid = ?
+        tags_query = """
+        SELECT t.tag FROM unique_tags ut JOIN tags t ON t.id = ut.tag_id WHERE ut.steam_appid = ?
         UNION
-        SELECT tag FROM subjective_tags WHERE steam_appid = ?
-        """, (target_appid, target_appid))
+        SELECT t.tag FROM subjective_tags st JOIN tags t ON t.id = st.tag_id WHERE st.steam_appid = ?
+        """
+        
+        # Get target game tags
+        cursor.execute(tags_query, (target_appid, target_appid))
         
         target_tags = set(row[0] for row in cursor.fetchall())
         
         similarities = []
         for candidate_appid, match_type, hierarchy_bonus in candidates:
             # Get candidate tags
-            cursor.execute("""
-            SELECT tag FROM unique_tags WHERE steam_appid = ?
-            UNION
-            SELECT tag FROM subjective_tags WHERE steam_appid = ?
-            """, (candidate_appid, candidate_appid))
+            cursor.execute(tags_query, (candidate_appid, candidate_appid))
             
             candidate_tags = set(row[0] for row in cursor.fetchall())
             
@@ -459,8 +460,54 @@ class SQLiteGameSearcher:
         similarities.sort(key=lambda x: x['similarity'], reverse=True)
         return similarities
     
+    def _resolve_preference_tags(self, user_preferences, cursor):
+        """Resolve the user's selected tags to tag ids once per request"""
+        if not user_preferences:
+            return None
+        
+        def tag_ids(kinds, tags):
+            if not tags:
+                return {}
+            kind_placeholders = ','.join(['?' for _ in kinds])
+            tag_placeholders = ','.join(['?' for _ in tags])
+            cursor.execute(f"""
+            SELECT id, LOWER(tag) FROM tags WHERE kind IN ({kind_placeholders}) AND tag IN ({tag_placeholders})
+            """, list(kinds) + list(tags))
+            return {row[0]: row[1] for row in cursor.fetchall()}
+        
+        preferred_tags = user_preferences.get('preferred_tags', [])
+        preferred_steam_tags = user_preferences.get('preferred_steam_tags', [])
+        
+        resolved = {
+            'aesthetics': user_preferences.get('aesthetics', {}),
+            'preferred_tag_count': len(preferred_tags),
+            'preferred_tag_ids': tag_ids(['unique', 'subjective'], preferred_tags),
+            'preferred_steam_tag_count': len(preferred_steam_tags),
+            'preferred_steam_tag_ids': tag_ids(['steam'], preferred_steam_tags),
+            'steam_tag_combos': []
+        }
+        
+        # Extra bonus for popular combinations
+        popular_combos = {
+            ('roguelike', 'procedural generation'): 0.1,
+            ('souls-like', 'difficult'): 0.1,
+            ('metroidvania', 'exploration'): 0.1,
+            ('platformer', 'pixel graphics'): 0.05,
+            ('puzzle', 'relaxing'): 0.05
+        }
+        
+        selected_tags_lower = [tag.lower() for tag in preferred_steam_tags]
+        for combo, combo_bonus in popular_combos.items():
+            if all(tag in selected_tags_lower for tag in combo):
+                cursor.execute(f"""
+                SELECT id FROM tags WHERE kind = 'steam' AND LOWER(tag) IN ({','.join(['?' for _ in combo])})
+                """, list(combo))
+                resolved['steam_tag_combos'].append(([row[0] for row in cursor.fetchall()], len(combo), combo_bonus))
+        
+        return resolved
+    
     def _calculate_preference_bonus_sql(self, candidate_appid, user_preferences, cursor):
-        """Calculate preference bonus using SQL queries"""
+        """Calculate preference bonus using SQL queries, user_preferences comes from _resolve_preference_tags"""
         if not user_preferences:
             return 0
         
@@ -480,61 +527,126 @@ class SQLiteGameSearcher:
                         bonus += 0.1
         
         # Unique/subjective tag preferences
-        preferred_tags = user_preferences.get('preferred_tags', [])
-        if preferred_tags:
-            placeholders = ','.join(['?' for _ in preferred_tags])
+        preferred_tag_ids = user_preferences['preferred_tag_ids']
+        if preferred_tag_ids:
+            placeholders = ','.join(['?' for _ in preferred_tag_ids])
             cursor.execute(f"""
-            SELECT COUNT(*) FROM (
-                SELECT tag FROM unique_tags WHERE steam_appid = ? AND tag IN ({placeholders})
-                UNION
-                SELECT tag FROM subjective_tags WHERE steam_appid = ? AND tag IN ({placeholders})
-            )
-            """, [candidate_appid] + preferred_tags + [candidate_appid] + preferred_tags)
+            SELECT tag_id FROM unique_tags WHERE steam_appid = ? AND tag_id IN ({placeholders})
+            UNION
+            SELECT tag_id FROM subjective_tags WHERE steam_appid = ? AND tag_id IN ({placeholders})
+            """, [candidate_appid] + list(preferred_tag_ids) + [candidate_appid] + list(preferred_tag_ids))
             
-            matching_count = cursor.fetchone()[0]
+            # The same tag text can exist as both a unique and a subjective tag
+            matching_count = len({preferred_tag_ids[row[0]] for row in cursor.fetchall()})
             if matching_count > 0:
-                bonus += (matching_count / len(preferred_tags)) * 0.15
+                bonus += (matching_count / user_preferences['preferred_tag_count']) * 0.15
         
         # Steam tag preferences (NEW)
-        preferred_steam_tags = user_preferences.get('preferred_steam_tags', [])
-        if preferred_steam_tags:
-            placeholders = ','.join(['?' for _ in preferred_steam_tags])
+        preferred_steam_tag_ids = user_preferences['preferred_steam_tag_ids']
+        if preferred_steam_tag_ids:
+            placeholders = ','.join(['?' for _ in preferred_steam_tag_ids])
             cursor.execute(f"""
             SELECT COUNT(*) FROM steam_tags 
-            WHERE steam_appid = ? AND tag IN ({placeholders})
-            """, [candidate_appid] + preferred_steam_tags)
+            WHERE steam_appid = ? AND tag_id IN ({placeholders})
+            """, [candidate_appid] + list(preferred_steam_tag_ids))
             
             matching_steam_tags = cursor.fetchone()[0]
             if matching_steam_tags > 0:
                 # Steam tags get higher weight since they're more specific to what users want
-                steam_tag_bonus = (matching_steam_tags / len(preferred_steam_tags)) * 0.25
+                steam_tag_bonus = (matching_steam_tags / user_preferences['preferred_steam_tag_count']) * 0.25
                 bonus += steam_tag_bonus
                 
-                # Extra bonus for popular combinations
-                popular_combos = {
-                    ('roguelike', 'procedural generation'): 0.1,
-                    ('souls-like', 'difficult'): 0.1,
-                    ('metroidvania', 'exploration'): 0.1,
-                    ('platformer', 'pixel graphics'): 0.05,
-                    ('puzzle', 'relaxing'): 0.05
-                }
-                
-                selected_tags_lower = [tag.lower() for tag in preferred_steam_tags]
-                for combo, combo_bonus in popular_combos.items():
-                    if all(tag in selected_tags_lower for tag in combo):
-                        # Check if candidate has this combo too
-                        cursor.execute(f"""
-                        SELECT COUNT(*) FROM steam_tags 
-                        WHERE steam_appid = ? AND LOWER(tag) IN ({','.join(['?' for _ in combo])})
-                        """, [candidate_appid] + list(combo))
-                        
-                        if cursor.fetchone()[0] == len(combo):
-                            bonus += combo_bonus
+                for combo_tag_ids, combo_size, combo_bonus in user_preferences['steam_tag_combos']:
+                    if not combo_tag_ids:
+                        continue
+                    # Check if candidate has this combo too
+                    cursor.execute(f"""
+                    SELECT COUNT(DISTINCT LOWER(t.tag)) FROM steam_tags st
+                    JOIN tags t ON t.id = st.tag_id
+                    WHERE st.steam_appid = ? AND st.tag_id IN ({','.join(['?' for _ in combo_tag_ids])})
+                    """, [candidate_appid] + combo_tag_ids)
+                    
+                    if cursor.fetchone()[0] == combo_size:
+                        bonus += combo_bonus
         
         return bonus
 
+class TrafficRecorder:
+    """Counts searches for games and their appearances in recommendations, per day.
+    
+    The tagging pipeline's refresh scheduler refreshes the games users look at first. Requests
+    only add to in-memory counts, a background thread writes them to traffic.db every
+    flush_interval seconds and once more at exit.
+    """
+    
+    def __init__(self, traffic_db=TRAFFIC_DB, flush_interval=TRAFFIC_FLUSH_SECONDS):
+        self.traffic_db = traffic_db
+        self.flush_interval = flush_interval
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.create_table()
+        threading.Thread(target=self.flush_periodically, daemon=True).start()
+        atexit.register(self.flush)
+    
+    def create_table(self):
+        try:
+            conn = sqlite3.connect(self.traffic_db)
+            try:
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS game_traffic (
+                    steam_appid INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    searches INTEGER NOT NULL DEFAULT 0,
+                    recommendations INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (steam_appid, day)
+                )
+                """)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error creating traffic table: {e}")
+    
+    def record(self, searched=(), recommended=()):
+        today = date.today().isoformat()
+        with self.lock:
+            for appid in searched:
+                self.counts.setdefault((appid, today), [0, 0])[0] += 1
+            for appid in recommended:
+                self.counts.setdefault((appid, today), [0, 0])[1] += 1
+    
+    def flush(self):
+        """Add the counts gathered since the last flush to traffic.db"""
+        with self.lock:
+            counts, self.counts = self.counts, {}
+        if not counts:
+            return
+        
+        rows = [(appid, day, searches, recommendations) for (appid, day), (searches, recommendations) in counts.items()]
+        try:
+            conn = sqlite3.connect(self.traffic_db, timeout=30)
+            try:
+                conn.executemany("""
+                INSERT INTO game_traffic (steam_appid, day, searches, recommendations) VALUES (?, ?, ?, ?)
+                ON CONFLICT(steam_appid, day) DO UPDATE SET
+                    searches = searches + excluded.searches,
+                    recommendations = recommendations + excluded.recommendations
+                """, rows)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Traffic is a hint for the scheduler, the counts are lost rather than blocking anything
+            print(f"Error recording traffic: {e}")
+    
+    def flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
 # Initialize the search engine
 game_searcher = SQLiteGameSearcher()
+traffic_recorder = TrafficRecorder()
 
 @app.route('/')
 def index():
@@ -561,6 +673,8 @@ def search():
     if not reference_game:
         return redirect(url_for('index'))
     
+    traffic_recorder.record(searched=[target_appid])
+    
     # Get available preferences
     preferences = game_searcher.get_available_preferences(target_appid)
     
@@ -606,6 +720,7 @@ def recommend():
     
     # Find similar games
     similar_games = game_searcher.find_similar_games(target_appid, user_preferences, limit=10)
+    traffic_recorder.record(recommended=[int(game['appid']) for game in similar_games])
     
     return render_template('results_hierarchical.html',
                           games=similar_games,
@@ -665,26 +780,25 @@ def debug_stats():
     try:
         stats = {}
         
-        # Basic counts
-        cursor.execute("SELECT COUNT(*) FROM games")
-        stats['total_games'] = cursor.fetchone()[0]
+        # Summaries are materialized by the converter, so these are plain lookups
+        cursor.execute("SELECT value FROM summary_counts WHERE name = 'total_games'")
+        row = cursor.fetchone()
+        stats['total_games'] = row[0] if row else 0
         
         # Top hierarchies
         cursor.execute("""
-        SELECT main_genre, sub_genre, sub_sub_genre, COUNT(*) as count
-        FROM games 
-        GROUP BY main_genre, sub_genre, sub_sub_genre
-        ORDER BY count DESC
+        SELECT main_genre, sub_genre, sub_sub_genre, game_count
+        FROM hierarchy_summary
+        ORDER BY game_count DESC
         LIMIT 20
         """)
         stats['top_hierarchies'] = cursor.fetchall()
         
         # Popular tags
         cursor.execute("""
-        SELECT tag, COUNT(*) as count
-        FROM unique_tags
-        GROUP BY tag
-        ORDER BY count DESC
+        SELECT tag, usage_count
+        FROM popular_unique_tags
+        ORDER BY usage_count DESC
         LIMIT 20
         """)
         stats['popular_unique_tags'] = cursor.fetchall()
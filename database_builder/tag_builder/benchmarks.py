@@ -0,0 +1,248 @@
+# benchmarks for the tag builder pipeline, run one suite at a time:
+#   python benchmarks.py converter --json steam_games_with_hierarchical_tags.json --workers 1 2 4 8
+#   python benchmarks.py keywords --reviews 2000
+#   python benchmarks.py analysis --games 200 --workers 1 2 4 8
+#   python benchmarks.py tags --sizes 1000 10000 30000
+# everything is written into a temporary directory so the real databases are never touched
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from json_converter import HierarchicalDatabaseConverter
+from tag_registry import TagCategory
+
+def _quiet():
+    """Swallow the pipeline's progress prints while timing"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+def benchmark_converter(json_file, worker_counts, repeats=1):
+    """Time the bulk converter serially and with each worker count, and print the speedup curve"""
+    print(f"converter benchmark on {json_file}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = []
+        for workers in [0] + list(worker_counts):
+            best = None
+            for _ in range(repeats):
+                converter = HierarchicalDatabaseConverter(
+                    json_file,
+                    os.path.join(tmp_dir, f"bench_{workers}.db"),
+                    vectorizer_path=os.path.join(tmp_dir, f"bench_{workers}.pkl")
+                )
+                with _quiet():
+                    converter.load_json_data()
+                    start = time.perf_counter()
+                    converter.bulk_build(workers=workers)
+                    elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results.append((workers, best))
+
+    baseline = results[0][1]
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    for workers, seconds in results:
+        label = "serial" if workers == 0 else str(workers)
+        print(f"{label:>8} {seconds:9.2f} {baseline / seconds:7.2f}x")
+    return results
+
+def _sample_reviews(json_file, count, seed=0):
+    """Review texts from a converter input file, or synthetic ones built from the keyword sets"""
+    if json_file and os.path.exists(json_file):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            games = json.load(f)
+        texts = [r['review'] for game in games.values() for r in game.get('reviews', [])]
+        if texts:
+            return (texts * (count // len(texts) + 1))[:count]
+
+    import extract_verdicts as ev
+    rng = random.Random(seed)
+    vocabulary = sorted(ev.ART_STYLE_KEYWORDS | ev.THEME_KEYWORDS | ev.MUSIC_KEYWORDS
+                        | ev.SUBJECTIVE_QUALITY_KEYWORDS | ev.GAMEPLAY_KEYWORDS)
+    filler = "the game i played this for hours and it was what you expect from a title like that".split()
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(vocabulary) if rng.random() < 0.15 else rng.choice(filler)
+                 for _ in range(rng.randint(40, 400))]
+        texts.append(' '.join(words).capitalize())
+    return texts
+
+def _legacy_keyword_hits(text, keyword_sets):
+    """The per-keyword scan the find_* helpers used before the automaton"""
+    lower = text.lower()
+    return {
+        name: {kw: lower.count(kw) for kw in keywords if kw in lower}
+        for name, keywords in keyword_sets.items()
+    }
+
+def benchmark_keywords(json_file, review_count, repeats=3):
+    """Time per-keyword substring scans against one automaton pass and check they agree"""
+    # extract_verdicts builds its OpenAI client on import, the key is never used here
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    import extract_verdicts as ev
+
+    texts = _sample_reviews(json_file, review_count)
+    keyword_sets = dict(ev.REVIEW_KEYWORDS.categories)
+    print(f"keyword benchmark on {len(texts)} reviews, "
+          f"{len(ev.REVIEW_KEYWORDS.keywords)} keywords in {len(keyword_sets)} categories")
+
+    mismatches = sum(
+        1 for text in texts
+        if _legacy_keyword_hits(text, keyword_sets) != ev.REVIEW_KEYWORDS.scan.__wrapped__(text)
+    )
+
+    def best_of(fn):
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for text in texts:
+                fn(text)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    legacy = best_of(lambda text: _legacy_keyword_hits(text, keyword_sets))
+    automaton = best_of(ev.REVIEW_KEYWORDS.scan.__wrapped__)
+
+    print(f"{'scan':>10} {'seconds':>9} {'speedup':>8}")
+    print(f"{'legacy':>10} {legacy:9.3f} {1.0:7.2f}x")
+    print(f"{'automaton':>10} {automaton:9.3f} {legacy / automaton:7.2f}x")
+    print(f"mismatched reviews: {mismatches}")
+    return legacy, automaton, mismatches
+
+def benchmark_analysis(json_file, game_count, worker_counts, reviews_per_game=200):
+    """Time review analysis for a batch of games on the main process and on each pool size"""
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    import extract_verdicts as ev
+
+    texts = _sample_reviews(json_file, reviews_per_game * 4)
+    rng = random.Random(0)
+    games = [
+        [{'review': rng.choice(texts), 'voted_up': rng.random() < 0.7, 'playtime_hours': round(rng.random() * 50, 1)}
+         for _ in range(reviews_per_game)]
+        for _ in range(game_count)
+    ]
+    print(f"analysis benchmark on {game_count} games x {reviews_per_game} reviews")
+
+    results = []
+    start = time.perf_counter()
+    for raw_reviews in games:
+        ev.analyze_game_reviews(raw_reviews)
+    results.append((0, time.perf_counter() - start))
+
+    for workers in worker_counts:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # start the workers outside the timed region
+            list(pool.map(ev.analyze_game_reviews, games[:workers]))
+            start = time.perf_counter()
+            list(pool.map(ev.analyze_game_reviews, games))
+            results.append((workers, time.perf_counter() - start))
+
+    baseline = results[0][1]
+    print(f"{'workers':>8} {'seconds':>9} {'games/s':>8} {'speedup':>8}")
+    for workers, seconds in results:
+        label = "serial" if workers == 0 else str(workers)
+        print(f"{label:>8} {seconds:9.2f} {game_count / seconds:8.1f} {baseline / seconds:7.2f}x")
+    return results
+
+def _legacy_normalize_tag(tag, existing_tags):
+    """The scan over every existing tag that canonicalized tags before the registry's indexes"""
+    normalized = tag.strip().lower()
+    if normalized in existing_tags:
+        return normalized
+    for existing in existing_tags:
+        if normalized.replace('-', '') == existing.replace('-', ''):
+            return existing
+        if normalized.replace(' ', '-') == existing:
+            return existing
+        if normalized.replace('-', ' ') == existing:
+            return existing
+        if normalized.rstrip('s') == existing or normalized == existing.rstrip('s'):
+            return existing
+    return normalized
+
+def _tag_variations(rng, tags, count):
+    """Tags a model might answer with, known tags respelled plus some new ones"""
+    variations = []
+    for _ in range(count):
+        tag = rng.choice(tags)
+        roll = rng.random()
+        if roll < 0.25:
+            tag = tag.replace('-', ' ')
+        elif roll < 0.5:
+            tag = tag + 's'
+        elif roll < 0.6:
+            tag = tag.upper()
+        elif roll < 0.8:
+            tag = f"{tag}-{rng.randint(0, 10 ** 6)}"
+        variations.append(tag)
+    return variations
+
+def benchmark_tags(sizes, lookups=500):
+    """Time canonicalizing tags against vocabularies of each size, legacy scan vs registry index"""
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    words = ' '.join(_sample_reviews(None, 200)).lower().replace('.', '').split()
+    rng = random.Random(0)
+    print(f"tag benchmark, {lookups} lookups per vocabulary size")
+    print(f"{'tags':>8} {'legacy us/tag':>14} {'index us/tag':>13} {'speedup':>8} {'mismatches':>11}")
+
+    results = []
+    for size in sizes:
+        category = TagCategory()
+        while len(category) < size:
+            category.add(category.canonical('-'.join(rng.sample(words, 2)) + f"-{rng.randint(0, 10 ** 6)}"))
+        existing = set(category.rank)
+        queries = _tag_variations(rng, category.sorted, lookups)
+
+        start = time.perf_counter()
+        legacy = [_legacy_normalize_tag(tag, existing) for tag in queries]
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = [category.canonical(tag) for tag in queries]
+        index_seconds = time.perf_counter() - start
+
+        mismatches = sum(1 for a, b in zip(legacy, indexed) if a != b)
+        print(f"{size:>8} {legacy_seconds / lookups * 1e6:14.1f} {index_seconds / lookups * 1e6:13.2f} "
+              f"{legacy_seconds / index_seconds:7.0f}x {mismatches:>11}")
+        results.append((size, legacy_seconds, index_seconds, mismatches))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tag builder benchmarks")
+    subparsers = parser.add_subparsers(dest="suite", required=True)
+
+    converter_parser = subparsers.add_parser("converter", help="serial vs parallel JSON to SQLite build")
+    converter_parser.add_argument("--json", default="steam_games_with_hierarchical_tags.json")
+    converter_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    converter_parser.add_argument("--repeats", type=int, default=1)
+
+    keywords_parser = subparsers.add_parser("keywords", help="per-keyword scans vs the keyword automaton")
+    keywords_parser.add_argument("--json", default=None, help="take review texts from a converter input file")
+    keywords_parser.add_argument("--reviews", type=int, default=2000)
+    keywords_parser.add_argument("--repeats", type=int, default=3)
+
+    analysis_parser = subparsers.add_parser("analysis", help="review analysis on the main process vs a process pool")
+    analysis_parser.add_argument("--json", default=None, help="take review texts from a converter input file")
+    analysis_parser.add_argument("--games", type=int, default=200)
+    analysis_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+
+    tags_parser = subparsers.add_parser("tags", help="linear tag normalization vs the tag registry's indexes")
+    tags_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 30000])
+    tags_parser.add_argument("--lookups", type=int, default=500)
+
+    args = parser.parse_args()
+
+    if args.suite == "converter":
+        benchmark_converter(args.json, args.workers, args.repeats)
+    elif args.suite == "keywords":
+        benchmark_keywords(args.json, args.reviews, args.repeats)
+    elif args.suite == "analysis":
+        benchmark_analysis(args.json, args.games, args.workers)
+    elif args.suite == "tags":
+        benchmark_tags(args.sizes, args.lookups)
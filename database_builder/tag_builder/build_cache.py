@@ -0,0 +1,88 @@
+# build manifest that remembers which build stages already ran for which inputs
+# each stage records a content hash of its inputs and of the outputs it produced,
+# a stage is skipped when both still match what is on disk
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hash_json(obj):
+    """Hash any JSON-serializable value independent of dict ordering"""
+    return hash_bytes(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+
+def hash_file(path, chunk_size=1 << 20):
+    """Hash a file's contents, None when it doesn't exist"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_query(cursor, sql, params=()):
+    """Hash every row a query returns, the query must have a deterministic ORDER BY"""
+    digest = hashlib.sha256()
+    cursor.execute(sql, params)
+    for row in cursor:
+        digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+class BuildManifest:
+    def __init__(self, path='build_manifest.json', force=()):
+        self.path = path
+        self.force = set(force)
+        self.stages = {}
+        self.results = []  # (stage, hit) in the order stages were checked
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.stages = json.load(f).get('stages', {})
+        except FileNotFoundError:
+            self.stages = {}
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'stages': self.stages}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self, stage, inputs, current_outputs):
+        """Whether a stage can be skipped.
+
+        current_outputs is a callable so outputs are only hashed when the inputs match.
+        """
+        recorded = self.stages.get(stage)
+        fresh = (
+            stage not in self.force and 'all' not in self.force
+            and recorded is not None
+            and recorded['inputs'] == inputs
+            and recorded['outputs'] == current_outputs()
+        )
+        self.results.append((stage, fresh))
+        return fresh
+
+    def record(self, stage, inputs, outputs):
+        self.stages[stage] = {
+            'inputs': inputs,
+            'outputs': outputs,
+            'built_at': datetime.now().isoformat()
+        }
+        self.save()
+
+    def print_report(self):
+        print("\n📦 BUILD CACHE:")
+        for stage, hit in self.results:
+            if hit:
+                print(f"   {stage:<10} hit (skipped)")
+            else:
+                reason = "forced" if stage in self.force or 'all' in self.force else "rebuilt"
+                print(f"   {stage:<10} miss ({reason})")
+        hits = sum(1 for _, hit in self.results if hit)
+        print(f"   {hits} hits, {len(self.results) - hits} misses")
@@ -0,0 +1,160 @@
+# local stand-in for the chat completions endpoint, for testing the tagging stage without the api:
+#   python completion_stub_server.py --port 8766 --latency 1.0 --rate-limit-chance 0.1
+#   OPENAI_BASE_URL=http://127.0.0.1:8766/v1 OPENAI_API_KEY=stub python extract_verdicts.py --llm-workers 8
+# answers are deterministic per game and spell tags with the variations the registry has to fold
+# together (hyphens, spaces, plurals). packed prompts get a block per game, some of which can be
+# left out, and a share of requests is rejected with openai's rate limit error.
+# the request counts and the most requests seen in flight at once are printed on shutdown
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GENRES = ["action", "rpg", "strategy", "simulation", "adventure"]
+SUB_GENRES = ["action-rpg", "roguelike", "turn based", "city builders", "metroidvania"]
+SUB_SUB_GENRES = ["deck-building", "open world", "base-building", "real-time"]
+ART_STYLES = ["pixel-art", "pixel art", "hand-drawn", "realistic", "anime"]
+THEMES = ["medieval-fantasy", "sci-fi", "post apocalyptic", "cyberpunk"]
+MUSIC_STYLES = ["orchestral", "chiptune", "electronic", "ambient"]
+UNIQUE_TAGS = ["permadeath", "crafting", "procedural-generation", "procedural generation", "time-loop", "base-building"]
+SUBJECTIVE_TAGS = ["great-story", "great story", "buggy-launch", "addictive-gameplay", "repetitive-content", "beautiful-visuals"]
+RATIO_TAGS = ["combat", "exploration", "story", "puzzles", "crafting"]
+
+class CompletionStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self, rate_limited):
+        with self.lock:
+            self.in_flight -= 1
+            if rate_limited:
+                self.rate_limited += 1
+            else:
+                self.completed += 1
+
+def stub_game_tags(game_section):
+    """Tag block for one game, seeded by its name"""
+    game = re.search(r'game:\s*(.+)', game_section)
+    seed = (game.group(1) if game else game_section).encode('utf-8')
+    rng = random.Random(hashlib.sha256(seed).hexdigest())
+
+    ratio_tags = rng.sample(RATIO_TAGS, 3)
+    ratios = [rng.randint(10, 60) for _ in ratio_tags]
+    return "\n".join([
+        f"MAIN_GENRE: {rng.choice(GENRES)}",
+        f"SUB_GENRE: {rng.choice(SUB_GENRES)}",
+        f"SUB_SUB_GENRE: {rng.choice(SUB_SUB_GENRES)}",
+        f"ART_STYLE: {rng.choice(ART_STYLES)}",
+        f"THEME: {rng.choice(THEMES)}",
+        f"MUSIC_STYLE: {rng.choice(MUSIC_STYLES)}",
+        f"UNIQUE_TAGS: {', '.join(rng.sample(UNIQUE_TAGS, 3))}",
+        f"SUBJECTIVE_TAGS: {', '.join(rng.sample(SUBJECTIVE_TAGS, 3))}",
+        f"RATIOS: {' '.join(f'{tag}:{ratio}%' for tag, ratio in zip(ratio_tags, ratios))}"
+    ])
+
+def stub_tags(messages, drop_chance=0.0):
+    """Tag response in the format extract_verdicts parses, a block per game for a packed prompt"""
+    user_prompt = messages[-1]["content"] if messages else ""
+    parts = re.split(r'^(=== GAME \d+ ===)$', user_prompt, flags=re.MULTILINE)
+    if len(parts) == 1:
+        return stub_game_tags(user_prompt)
+
+    blocks = []
+    for header, section in zip(parts[1::2], parts[2::2]):
+        if random.random() >= drop_chance:
+            blocks.append(f"{header}\n{stub_game_tags(section)}")
+    return "\n\n".join(blocks)
+
+def make_handler(stats, latency, rate_limit_chance, drop_chance):
+    class CompletionHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self.send_error(404)
+                return
+
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b'{}')
+            stats.enter()
+            rate_limited = random.random() < rate_limit_chance
+            try:
+                time.sleep(latency)
+                if rate_limited:
+                    self.reply(429, {"error": {
+                        "message": "Rate limit reached for requests",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded"
+                    }}, {"Retry-After": "0"})
+                    return
+
+                content = stub_tags(request.get("messages", []), drop_chance)
+                self.reply(200, {
+                    "id": f"chatcmpl-stub-{stats.completed}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                })
+            finally:
+                stats.leave(rate_limited)
+
+        def reply(self, status, body, headers=None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CompletionHandler
+
+def serve(port=8766, latency=0.5, rate_limit_chance=0.0, drop_chance=0.0):
+    """Start the stub server on a background thread, returns the server"""
+    stats = CompletionStats()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stats, latency, rate_limit_chance, drop_chance))
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub chat completions server")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds every request takes")
+    parser.add_argument("--rate-limit-chance", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--drop-chance", type=float, default=0.0, help="share of games left out of packed answers")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.rate_limit_chance, args.drop_chance)
+    print(f"stub completions on http://127.0.0.1:{args.port}/v1")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        stats = server.stats
+        print(f"{stats.completed} completed, {stats.rate_limited} rate limited, "
+              f"at most {stats.max_in_flight} in flight")
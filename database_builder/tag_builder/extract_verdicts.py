@@ -1,27 +1,38 @@
-import requests
 import sqlite3
 import json
 import os
 import time
 import re
+import random
+import argparse
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from openai import OpenAI
+from keyword_engine import KeywordAutomaton
+from http_cache import HTTP_CACHE, add_cache_arguments, configure_from_args
+from build_cache import hash_json
+from pipeline_state import ReviewRefreshState
+from llm_cache import LLM_CACHE
+from tag_registry import TagRegistry
+from tag_classifier import TagClassifier, review_keywords, training_fields
+from result_log import ResultLog, iter_json_results
+from work_queue import WorkQueue
+from refresh_scheduler import RefreshScheduler, RECOMMENDATIONS_DB, TRAFFIC_DB
+from pipeline_metrics import METRICS, timed_call, print_report, add_metrics_arguments, configure_metrics_from_args
+from steam_fetcher import (
+    STEAM_STORE_URL, appdetails_params, parse_steam_appdetails, iter_steam_review_pages,
+    fetch_games_in_background, add_fetcher_arguments, fetcher_options
+)
 
 analyzer = SentimentIntensityAnalyzer()
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
-TAG_CONTEXT = {
-    'ratio_tags': set(),
-    'unique_tags': set(),
-    'subjective_tags': set(),
-    'main_genres': set(),
-    'sub_genres': set(),
-    'sub_sub_genres': set(),
-    'art_styles': set(),
-    'themes': set(),
-    'music_styles': set()
-}
+# OPENAI_BASE_URL points the client at another endpoint, like completion_stub_server.py
+client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), base_url=os.getenv('OPENAI_BASE_URL'))
+
+# every tag a response assigns is canonicalized and added through the registry,
+# saved to tag_context.json so later runs keep using the same tags
+TAG_REGISTRY = TagRegistry()
 
 GAMEPLAY_KEYWORDS = {
     "vibes", "soundtrack", "music", "overall", "the good", "pros", "cons",
@@ -166,21 +177,64 @@ TOXICITY_PHRASES = {
     "worst community", "matchmaking is broken", "smurfs", "trolls", "chain queuing"
 }
 
+POSITIVE_QUALITY_WORDS = ["great", "good", "amazing", "well", "smooth", "polished", "satisfying", "fun", "challenging", "worth", "innovative", "beautiful", "relaxing"]
+
+# Quality keywords counted as positive, the rest count as negative
+POSITIVE_QUALITY_KEYWORDS = {
+    keyword for keyword in SUBJECTIVE_QUALITY_KEYWORDS
+    if any(pos_word in keyword for pos_word in POSITIVE_QUALITY_WORDS)
+}
+
+# One automaton over every keyword set, each review is scanned once for all categories
+REVIEW_KEYWORDS = KeywordAutomaton({
+    'art_style': ART_STYLE_KEYWORDS,
+    'theme': THEME_KEYWORDS,
+    'music': MUSIC_KEYWORDS,
+    'quality': SUBJECTIVE_QUALITY_KEYWORDS,
+    'gameplay': GAMEPLAY_KEYWORDS,
+    'toxicity': TOXICITY_PHRASES
+})
+
 def check_existing_reviews(db_path="steam_api.db", steam_appid=None):
     # Removed - we no longer skip games with existing reviews
     return False, []
 
 def get_games_from_database(db_path="steam_api.db"):
+    """Games in table order with the genres and description the go builder stored for them.
+    
+    Read in one query, so the fetch stage only asks appdetails for games whose local data is
+    incomplete (see steam_fetcher.local_app_details).
+    """
     try:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        cursor.execute("SELECT game_id, game_name, steam_appid FROM main_game")
-        games = cursor.fetchall()
+        try:
+            # steam_api can hold several rows per game, the latest one wins
+            cursor.execute("""
+            SELECT m.game_id, m.game_name, m.steam_appid, s.description, g.genre
+            FROM main_game m
+            LEFT JOIN (SELECT steam_appid, description, MAX(detail_id) FROM steam_api GROUP BY steam_appid) s
+                ON s.steam_appid = m.steam_appid
+            LEFT JOIN genres g ON g.steam_appid = m.steam_appid
+            ORDER BY m.game_id, g.rowid
+            """)
+            rows = cursor.fetchall()
+        except sqlite3.OperationalError:
+            print("no steam_api/genres tables, fetching appdetails for every game")
+            cursor.execute("SELECT game_id, game_name, steam_appid, NULL, NULL FROM main_game ORDER BY game_id")
+            rows = cursor.fetchall()
         
         conn.close()
         
-        return [{"game_id": row[0], "game_name": row[1], "steam_appid": row[2]} for row in games]
+        games = []
+        for game_id, game_name, steam_appid, description, genre in rows:
+            if not games or games[-1]["game_id"] != game_id:
+                games.append({"game_id": game_id, "game_name": game_name, "steam_appid": steam_appid,
+                              "steam_api_genres": [], "steam_api_description": description or ""})
+            if genre:
+                games[-1]["steam_api_genres"].append(genre)
+        return games
     
     except Exception as e:
         print(f"error reading database: {e}")
@@ -189,43 +243,9 @@ def get_games_from_database(db_path="steam_api.db"):
 def get_steam_tags_and_description(appid: int) -> tuple:
     """Get official Steam tags and game description"""
     try:
-        url = f"https://store.steampowered.com/api/appdetails"
-        params = {"appids": appid, "filters": "categories,genres,short_description,detailed_description"}
-        
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
-        
-        if str(appid) not in data or not data[str(appid)]["success"]:
-            return [], ""
-        
-        game_data = data[str(appid)]["data"]
-        tags = []
-        description = ""
-        
-        # Get genres
-        if "genres" in game_data:
-            for genre in game_data["genres"]:
-                tags.append(genre["description"].lower())
-        
-        # Get categories (like multiplayer, co-op, etc.)
-        if "categories" in game_data:
-            for category in game_data["categories"]:
-                cat_name = category["description"].lower()
-                # Filter out less useful categories
-                if cat_name not in ["steam achievements", "steam cloud", "steam trading cards", "full controller support"]:
-                    tags.append(cat_name)
-        
-        # Get description (prefer short, fallback to detailed)
-        if "short_description" in game_data and game_data["short_description"]:
-            description = game_data["short_description"]
-        elif "detailed_description" in game_data and game_data["detailed_description"]:
-            # Clean HTML tags from detailed description and limit length
-            import re
-            description = re.sub(r'<[^>]+>', '', game_data["detailed_description"])
-            if len(description) > 500:
-                description = description[:500] + "..."
-        
-        return tags[:3], description  # Return top 3 most relevant tags and description
+        url = f"{STEAM_STORE_URL}/api/appdetails"
+        response = HTTP_CACHE.get(url, params=appdetails_params(appid), timeout=10)
+        return parse_steam_appdetails(appid, response.json())
     
     except Exception as e:
         print(f"error fetching steam data for appid {appid}: {e}")
@@ -233,127 +253,32 @@ def get_steam_tags_and_description(appid: int) -> tuple:
 
 def find_art_style_reviews(reviews: list) -> list:
     """Find reviews that mention art style or visual elements"""
-    art_style_reviews = []
-    
-    for review in reviews:
-        text = review['review'].lower()
-        
-        # Check for art style keywords
-        art_mentions = 0
-        mentioned_keywords = []
-        
-        for keyword in ART_STYLE_KEYWORDS:
-            if keyword in text:
-                art_mentions += text.count(keyword)
-                mentioned_keywords.append(keyword)
-        
-        if art_mentions > 0:
-            review['art_style_score'] = art_mentions
-            review['art_keywords'] = mentioned_keywords
-            art_style_reviews.append(review)
-    
-    # Sort by art style relevance and review quality
-    art_style_reviews.sort(key=lambda r: (r['art_style_score'], r['voted_up'], r['playtime_hours']), reverse=True)
-    
-    return art_style_reviews[:3]  # Return top 3 art style reviews
+    return select_category_reviews([analyze_review(r) for r in reviews], 'art_style')
 
 def find_theme_reviews(reviews: list) -> list:
     """Find reviews that mention themes, settings, or story elements"""
-    theme_reviews = []
-    
-    for review in reviews:
-        text = review['review'].lower()
-        
-        # Check for theme keywords
-        theme_mentions = 0
-        mentioned_keywords = []
-        
-        for keyword in THEME_KEYWORDS:
-            if keyword in text:
-                theme_mentions += text.count(keyword)
-                mentioned_keywords.append(keyword)
-        
-        if theme_mentions > 0:
-            review['theme_score'] = theme_mentions
-            review['theme_keywords'] = mentioned_keywords
-            theme_reviews.append(review)
-    
-    # Sort by theme relevance and review quality
-    theme_reviews.sort(key=lambda r: (r['theme_score'], r['voted_up'], r['playtime_hours']), reverse=True)
-    
-    return theme_reviews[:3]  # Return top 3 theme reviews
+    return select_category_reviews([analyze_review(r) for r in reviews], 'theme')
 
 def find_music_reviews(reviews: list) -> list:
     """Find reviews that mention music, soundtrack, or audio"""
-    music_reviews = []
-    
-    for review in reviews:
-        text = review['review'].lower()
-        
-        # Check for music keywords
-        music_mentions = 0
-        mentioned_keywords = []
-        
-        for keyword in MUSIC_KEYWORDS:
-            if keyword in text:
-                music_mentions += text.count(keyword)
-                mentioned_keywords.append(keyword)
-        
-        if music_mentions > 0:
-            review['music_score'] = music_mentions
-            review['music_keywords'] = mentioned_keywords
-            music_reviews.append(review)
-    
-    # Sort by music relevance and review quality
-    music_reviews.sort(key=lambda r: (r['music_score'], r['voted_up'], r['playtime_hours']), reverse=True)
-    
-    return music_reviews[:3]  # Return top 3 music reviews
+    return select_category_reviews([analyze_review(r) for r in reviews], 'music')
 
 def find_subjective_quality_reviews(reviews: list) -> list:
     """Find reviews that mention subjective quality aspects (positive and negative)"""
-    quality_reviews = []
-    
-    for review in reviews:
-        text = review['review'].lower()
-        
-        # Check for subjective quality keywords
-        quality_mentions = 0
-        mentioned_keywords = []
-        positive_mentions = 0
-        negative_mentions = 0
-        
-        for keyword in SUBJECTIVE_QUALITY_KEYWORDS:
-            if keyword in text:
-                count = text.count(keyword)
-                quality_mentions += count
-                mentioned_keywords.append(keyword)
-                
-                # Categorize as positive or negative based on keyword
-                if any(pos_word in keyword for pos_word in ["great", "good", "amazing", "well", "smooth", "polished", "satisfying", "fun", "challenging", "worth", "innovative", "beautiful", "relaxing"]):
-                    positive_mentions += count
-                else:
-                    negative_mentions += count
-        
-        if quality_mentions > 0:
-            review['quality_score'] = quality_mentions
-            review['quality_keywords'] = mentioned_keywords
-            review['positive_sentiment_score'] = positive_mentions
-            review['negative_sentiment_score'] = negative_mentions
-            review['overall_sentiment'] = 'positive' if positive_mentions > negative_mentions else 'negative' if negative_mentions > positive_mentions else 'mixed'
-            quality_reviews.append(review)
-    
-    # Sort by quality relevance and overall usefulness
-    quality_reviews.sort(key=lambda r: (r['quality_score'], r['voted_up'], r['playtime_hours']), reverse=True)
-    
-    return quality_reviews[:5]  # Return top 5 quality-focused reviews
+    return select_quality_reviews([analyze_review(r) for r in reviews])
 
 def mentions_toxicity(text: str, phrases=TOXICITY_PHRASES) -> bool:
+    if phrases is TOXICITY_PHRASES:
+        return bool(REVIEW_KEYWORDS.scan(text)['toxicity'])
     lower = text.lower()
     return any(p in lower for p in phrases)
 
 def gameplay_keyword_stats(text: str, keywords=GAMEPLAY_KEYWORDS) -> dict:
-    lower_text = text.lower()
-    keyword_hits = {kw: lower_text.count(kw) for kw in keywords if kw in lower_text}
+    if keywords is GAMEPLAY_KEYWORDS:
+        keyword_hits = dict(REVIEW_KEYWORDS.scan(text)['gameplay'])
+    else:
+        lower_text = text.lower()
+        keyword_hits = {kw: lower_text.count(kw) for kw in keywords if kw in lower_text}
     total_hits = sum(keyword_hits.values())
     return {"total": total_hits, "matched_keywords": keyword_hits}
 
@@ -369,57 +294,162 @@ def is_complaint(text: str) -> bool:
     sentiment = analyzer.polarity_scores(text)
     return sentiment['compound'] < -0.5
 
-def normalize_tag(tag: str, existing_tags: set) -> str:
-    """Normalize a tag to match existing ones or create a consistent new one"""
-    normalized = tag.strip().lower()
-    
-    # Check for exact matches first
-    if normalized in existing_tags:
-        return normalized
-    
-    # Check for similar tags (handle common variations)
-    for existing in existing_tags:
-        # Handle hyphenated vs non-hyphenated
-        if normalized.replace('-', '') == existing.replace('-', ''):
-            return existing
-        if normalized.replace(' ', '-') == existing:
-            return existing
-        if normalized.replace('-', ' ') == existing:
-            return existing
-        
-        # Handle plural/singular
-        if normalized.rstrip('s') == existing or normalized == existing.rstrip('s'):
-            return existing
+QUALITY_REVIEW_LIMIT = 5
+TOP_REVIEW_LIMIT = 3
+
+# Upper bound on reviews fetched per game, fetching stops earlier once EnoughReviews says so
+MAX_REVIEWS_PER_GAME = 500
+
+# category -> (score field, keywords field, how many reviews to keep)
+CATEGORY_REVIEW_FIELDS = {
+    'art_style': ('art_style_score', 'art_keywords', 3),
+    'theme': ('theme_score', 'theme_keywords', 3),
+    'music': ('music_score', 'music_keywords', 3)
+}
+
+def analyze_review(review: dict) -> dict:
+    """Compute everything review selection needs from one scan of the review.
     
-    return normalized
+    The review dict itself is left untouched, selections hand out annotated copies.
+    VADER only runs on reviews that mention toxicity, the only place sentiment is used.
+    """
+    text = review['review']
+    hits = REVIEW_KEYWORDS.scan(text)
+    toxic = bool(hits['toxicity'])
+    return {
+        'review': review,
+        'hits': hits,
+        'scores': {name: sum(counts.values()) for name, counts in hits.items()},
+        'positive_quality': sum(count for keyword, count in hits['quality'].items() if keyword in POSITIVE_QUALITY_KEYWORDS),
+        'comprehensible': is_comprehensible(text),
+        'toxic': toxic,
+        'complaint': is_complaint(text) if toxic else False
+    }
 
-def generate_hierarchical_tags(game_name: str, steam_tags: list, steam_description: str, reviews_text: list, art_style_reviews: list = None, theme_reviews: list = None, music_reviews: list = None, quality_reviews: list = None, retry_count: int = 0):
-    art_style_context = ""
-    theme_context = ""
-    music_context = ""
-    quality_context = ""
-    description_context = ""
+def _relevance_order(records: list, category: str) -> list:
+    matched = [rec for rec in records if rec['scores'][category] > 0]
+    matched.sort(key=lambda rec: (rec['scores'][category], rec['review']['voted_up'], rec['review']['playtime_hours']), reverse=True)
+    return matched
+
+def select_category_reviews(records: list, category: str) -> list:
+    """Top reviews for an art style, theme or music category, sorted by relevance and review quality"""
+    score_field, keywords_field, limit = CATEGORY_REVIEW_FIELDS[category]
+    return [
+        dict(rec['review'], **{score_field: rec['scores'][category], keywords_field: list(rec['hits'][category])})
+        for rec in _relevance_order(records, category)[:limit]
+    ]
+
+def select_quality_reviews(records: list, limit: int = QUALITY_REVIEW_LIMIT) -> list:
+    """Top reviews mentioning subjective quality, with their positive/negative balance"""
+    selected = []
+    for rec in _relevance_order(records, 'quality')[:limit]:
+        positive = rec['positive_quality']
+        negative = rec['scores']['quality'] - positive
+        selected.append(dict(
+            rec['review'],
+            quality_score=rec['scores']['quality'],
+            quality_keywords=list(rec['hits']['quality']),
+            positive_sentiment_score=positive,
+            negative_sentiment_score=negative,
+            overall_sentiment='positive' if positive > negative else 'negative' if negative > positive else 'mixed'
+        ))
+    return selected
+
+def top_review_tier(rec: dict):
+    """'top' for reviews worth sending to the model, 'fallback' for weaker usable ones, else None"""
+    review = rec['review']
+    if len(review['review']) < 200 or review["playtime_hours"] < 1:
+        return None
+    if not rec['comprehensible']:
+        return None
     
-    if steam_description:
-        description_context = f"\n\nsteam official description: {steam_description}"
+    gameplay_total = rec['scores']['gameplay']
+    if gameplay_total < 1:
+        return None
+    if gameplay_total < 6:
+        return 'fallback'
+    if rec['complaint'] and rec['toxic']:
+        return 'fallback'
+    return 'top'
+
+class EnoughReviews:
+    """Running candidate counts for one game's selections, fed one page of reviews at a time.
     
-    if art_style_reviews:
-        art_style_context = f"\n\nart style mentions from reviews: {' | '.join([r['review'][:150] + '...' for r in art_style_reviews[:2]])}"
+    Calling it with a page analyzes only that page and says whether every selection now has
+    as many candidates as it keeps, so no more pages are needed.
+    """
     
-    if theme_reviews:
-        theme_context = f"\n\ntheme/setting mentions from reviews: {' | '.join([r['review'][:150] + '...' for r in theme_reviews[:2]])}"
+    def __init__(self):
+        self.candidates = dict.fromkeys(list(CATEGORY_REVIEW_FIELDS) + ['quality', 'top'], 0)
     
-    if music_reviews:
-        music_context = f"\n\nmusic/soundtrack mentions from reviews: {' | '.join([r['review'][:150] + '...' for r in music_reviews[:2]])}"
+    def __call__(self, page: list) -> bool:
+        for review in page:
+            rec = analyze_review(review)
+            for category in CATEGORY_REVIEW_FIELDS:
+                if rec['scores'][category] > 0:
+                    self.candidates[category] += 1
+            if rec['scores']['quality'] > 0:
+                self.candidates['quality'] += 1
+            if top_review_tier(rec) == 'top':
+                self.candidates['top'] += 1
+        
+        for category, (_, _, limit) in CATEGORY_REVIEW_FIELDS.items():
+            if self.candidates[category] < limit:
+                return False
+        return self.candidates['quality'] >= QUALITY_REVIEW_LIMIT and self.candidates['top'] >= TOP_REVIEW_LIMIT
+
+def select_top_reviews(records: list, limit: int = TOP_REVIEW_LIMIT) -> list:
+    """Long, readable, gameplay-focused reviews, falling back to the best weaker candidate"""
+    filtered_reviews = []
+    fallback_candidates = []
     
-    if quality_reviews:
-        quality_context = f"\n\nquality aspects mentioned in reviews: {' | '.join([r['review'][:150] + '...' for r in quality_reviews[:2]])}"
+    for rec in records:
+        tier = top_review_tier(rec)
+        if tier is None:
+            continue
+        
+        candidate = dict(rec['review'], keyword_stats={"total": rec['scores']['gameplay'], "matched_keywords": dict(rec['hits']['gameplay'])})
+        fallback_candidates.append(candidate)
+        if tier == 'top':
+            filtered_reviews.append(candidate)
     
-    system_prompt = f"""you are a game categorization expert. based on steam's official tags, official description, user reviews, and specific mentions of art, theme, music, and quality aspects, create a comprehensive classification system.
+    if not filtered_reviews and fallback_candidates:
+        best_fallback = sorted(
+            fallback_candidates,
+            key=lambda r: (r["voted_up"], r["keyword_stats"]["total"]),
+            reverse=True
+        )[0]
+        filtered_reviews.append(best_fallback)
+    
+    return filtered_reviews[:limit]
 
-steam's official tags for this game: {', '.join(steam_tags)}
+# tags of each category listed in the prompt, the rest are only counted
+PROMPT_CONTEXT_LIMITS = {
+    'main_genres': 15,
+    'sub_genres': 15,
+    'sub_sub_genres': 15,
+    'art_styles': 15,
+    'themes': 15,
+    'music_styles': 15,
+    'unique_tags': 20,
+    'subjective_tags': 20
+}
 
-your task:
+# header that starts each game's block in a packed request and its response
+PACKED_GAME_HEADER = "=== GAME {} ==="
+
+# retries for a rate-limited request, waits grow exponentially up to the cap
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BASE = 5
+LLM_RETRY_CAP = 60
+
+def context_line(context: dict, label: str, category: str) -> str:
+    count, shown = context[category]
+    return f"- {label} ({count} existing): {', '.join(shown)}{'...' if count > PROMPT_CONTEXT_LIMITS[category] else ''}"
+
+TAG_PROMPT_INTRO = '''you are a game categorization expert. based on steam's official tags, official description, user reviews, and specific mentions of art, theme, music, and quality aspects, create a comprehensive classification system.'''
+
+TAG_PROMPT_TASK = '''your task:
 1. identify the MAIN GENRE (the primary category this game belongs to)
 2. identify the SUB GENRE (more specific classification within the main genre)  
 3. identify the SUB-SUB GENRE (very specific mechanics/style within the sub genre)
@@ -433,19 +463,9 @@ your task:
 use steam's official description as the primary source of truth for genre classification, then supplement with user review insights for subjective aspects.
 
 IMPORTANT: For subjective tags, include BOTH positive and negative quality aspects that reviewers consistently mention. 
-Examples: "great-story", "buggy-launch", "addictive-gameplay", "poor-optimization", "beautiful-visuals", "repetitive-content"
-
-consistency rules - ALWAYS use existing tags when appropriate:
-- main genres ({len(TAG_CONTEXT['main_genres'])} existing): {', '.join(sorted(list(TAG_CONTEXT['main_genres']))[:15])}{'...' if len(TAG_CONTEXT['main_genres']) > 15 else ''}
-- sub genres ({len(TAG_CONTEXT['sub_genres'])} existing): {', '.join(sorted(list(TAG_CONTEXT['sub_genres']))[:15])}{'...' if len(TAG_CONTEXT['sub_genres']) > 15 else ''}
-- sub-sub genres ({len(TAG_CONTEXT['sub_sub_genres'])} existing): {', '.join(sorted(list(TAG_CONTEXT['sub_sub_genres']))[:15])}{'...' if len(TAG_CONTEXT['sub_sub_genres']) > 15 else ''}
-- art styles ({len(TAG_CONTEXT['art_styles'])} existing): {', '.join(sorted(list(TAG_CONTEXT['art_styles']))[:15])}{'...' if len(TAG_CONTEXT['art_styles']) > 15 else ''}
-- themes ({len(TAG_CONTEXT['themes'])} existing): {', '.join(sorted(list(TAG_CONTEXT['themes']))[:15])}{'...' if len(TAG_CONTEXT['themes']) > 15 else ''}
-- music styles ({len(TAG_CONTEXT['music_styles'])} existing): {', '.join(sorted(list(TAG_CONTEXT['music_styles']))[:15])}{'...' if len(TAG_CONTEXT['music_styles']) > 15 else ''}
-- unique tags ({len(TAG_CONTEXT['unique_tags'])} existing): {', '.join(sorted(list(TAG_CONTEXT['unique_tags']))[:20])}{'...' if len(TAG_CONTEXT['unique_tags']) > 20 else ''}
-- subjective tags ({len(TAG_CONTEXT['subjective_tags'])} existing): {', '.join(sorted(list(TAG_CONTEXT['subjective_tags']))[:20])}{'...' if len(TAG_CONTEXT['subjective_tags']) > 20 else ''}
-
-examples of full classification WITH subjective quality tags:
+Examples: "great-story", "buggy-launch", "addictive-gameplay", "poor-optimization", "beautiful-visuals", "repetitive-content"'''
+
+TAG_PROMPT_EXAMPLES = '''examples of full classification WITH subjective quality tags:
 - dark souls 3: soulslike -> action-rpg -> stamina-based-combat -> realistic -> medieval-fantasy -> orchestral -> [challenging-but-fair, great-atmosphere, steep-learning-curve, rewarding-mastery]
 - cyberpunk 2077: rpg -> action-rpg -> open-world -> realistic -> cyberpunk-future -> synthwave -> [ambitious-scope, buggy-launch, great-story, performance-issues]
 - stardew valley: simulation -> farming-sim -> life-sim -> pixel-art -> rural-countryside -> folk -> [relaxing-gameplay, addictive-progression, cozy-atmosphere, wholesome-content]
@@ -459,10 +479,9 @@ canonical forms (always use these):
 - art styles: "pixel-art", "anime", "realistic", "cartoon", "minimalist", "hand-drawn"
 - themes: "medieval-fantasy", "sci-fi", "cyberpunk", "modern", "post-apocalyptic", "urban", "rural"
 - music: "orchestral", "electronic", "ambient", "jazz", "rock", "chiptune", "atmospheric"
-- genres: "soulslike", "jrpg", "fps", "turn-based", "real-time"
+- genres: "soulslike", "jrpg", "fps", "turn-based", "real-time"'''
 
-response format:
-MAIN_GENRE: [primary genre]
+TAG_RESPONSE_FORMAT = '''MAIN_GENRE: [primary genre]
 SUB_GENRE: [sub genre within main]
 SUB_SUB_GENRE: [specific mechanics/style]
 ART_STYLE: [visual/aesthetic style]
@@ -470,482 +489,982 @@ THEME: [setting/world/story theme]
 MUSIC_STYLE: [soundtrack genre/mood]
 UNIQUE_TAGS: tag1, tag2, tag3, tag4
 SUBJECTIVE_TAGS: tag1, tag2, tag3, tag4
-RATIOS: element1:percentage% element2:percentage% element3:percentage%"""
+RATIOS: element1:percentage% element2:percentage% element3:percentage%'''
+
+def consistency_rules(context: dict) -> str:
+    return f"""consistency rules - ALWAYS use existing tags when appropriate:
+{context_line(context, 'main genres', 'main_genres')}
+{context_line(context, 'sub genres', 'sub_genres')}
+{context_line(context, 'sub-sub genres', 'sub_sub_genres')}
+{context_line(context, 'art styles', 'art_styles')}
+{context_line(context, 'themes', 'themes')}
+{context_line(context, 'music styles', 'music_styles')}
+{context_line(context, 'unique tags', 'unique_tags')}
+{context_line(context, 'subjective tags', 'subjective_tags')}"""
+
+def game_prompt_section(game_name: str, steam_tags: list, steam_description: str, reviews_text: list, art_style_reviews: list = None, theme_reviews: list = None, music_reviews: list = None, quality_reviews: list = None) -> str:
+    """What the user prompt says about one game"""
+    art_style_context = ""
+    theme_context = ""
+    music_context = ""
+    quality_context = ""
+    description_context = ""
+    
+    if steam_description:
+        description_context = f"\n\nsteam official description: {steam_description}"
+    
+    if art_style_reviews:
+        art_style_context = f"\n\nart style mentions from reviews: {' | '.join([r['review'][:150] + '...' for r in art_style_reviews[:2]])}"
+    
+    if theme_reviews:
+        theme_context = f"\n\ntheme/setting mentions from reviews: {' | '.join([r['review'][:150] + '...' for r in theme_reviews[:2]])}"
+    
+    if music_reviews:
+        music_context = f"\n\nmusic/soundtrack mentions from reviews: {' | '.join([r['review'][:150] + '...' for r in music_reviews[:2]])}"
+    
+    if quality_reviews:
+        quality_context = f"\n\nquality aspects mentioned in reviews: {' | '.join([r['review'][:150] + '...' for r in quality_reviews[:2]])}"
     
     combined_text = " ".join(reviews_text)
     if len(combined_text) > 400:
         combined_text = combined_text[:400] + "..."
     
-    user_prompt = f"""game: {game_name}
+    return f"""game: {game_name}
 steam official tags: {', '.join(steam_tags)}
-user reviews sample: {combined_text}{description_context}{art_style_context}{theme_context}{music_context}{quality_context}
+user reviews sample: {combined_text}{description_context}{art_style_context}{theme_context}{music_context}{quality_context}"""
+
+def build_tag_request(game_name: str, steam_tags: list, steam_description: str, reviews_text: list, art_style_reviews: list = None, theme_reviews: list = None, music_reviews: list = None, quality_reviews: list = None, context: dict = None) -> dict:
+    """Chat completion request for one game, `context` is a TAG_REGISTRY snapshot"""
+    if context is None:
+        context = TAG_REGISTRY.snapshot(PROMPT_CONTEXT_LIMITS)
+    
+    system_prompt = f"""{TAG_PROMPT_INTRO}
+
+steam's official tags for this game: {', '.join(steam_tags)}
+
+{TAG_PROMPT_TASK}
+
+{consistency_rules(context)}
+
+{TAG_PROMPT_EXAMPLES}
+
+response format:
+{TAG_RESPONSE_FORMAT}"""
+    
+    user_prompt = f"""{game_prompt_section(game_name, steam_tags, steam_description, reviews_text, art_style_reviews, theme_reviews, music_reviews, quality_reviews)}
 
 create comprehensive classification and tags for this game. use the official description as primary context, then supplement with review insights for subjective quality aspects."""
     
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.2,
-            max_tokens=200
-        )
-        
-        response_text = response.choices[0].message.content.strip()
-        
-        # Parse response
-        main_genre_match = re.search(r'MAIN_GENRE:\s*(.+?)(?:\n|$)', response_text)
-        sub_genre_match = re.search(r'SUB_GENRE:\s*(.+?)(?:\n|$)', response_text)
-        sub_sub_genre_match = re.search(r'SUB_SUB_GENRE:\s*(.+?)(?:\n|$)', response_text)
-        art_style_match = re.search(r'ART_STYLE:\s*(.+?)(?:\n|$)', response_text)
-        theme_match = re.search(r'THEME:\s*(.+?)(?:\n|$)', response_text)
-        music_style_match = re.search(r'MUSIC_STYLE:\s*(.+?)(?:\n|$)', response_text)
-        unique_match = re.search(r'UNIQUE_TAGS:\s*(.+?)(?:\n|$)', response_text)
-        subjective_match = re.search(r'SUBJECTIVE_TAGS:\s*(.+?)(?:\n|$)', response_text)
-        ratios_match = re.search(r'RATIOS:\s*(.+?)(?:\n|$)', response_text)
-        
-        # Extract and normalize tags
-        main_genre = normalize_tag(main_genre_match.group(1), TAG_CONTEXT['main_genres']) if main_genre_match else "unknown"
-        sub_genre = normalize_tag(sub_genre_match.group(1), TAG_CONTEXT['sub_genres']) if sub_genre_match else "unknown"
-        sub_sub_genre = normalize_tag(sub_sub_genre_match.group(1), TAG_CONTEXT['sub_sub_genres']) if sub_sub_genre_match else "unknown"
-        art_style = normalize_tag(art_style_match.group(1), TAG_CONTEXT['art_styles']) if art_style_match else "unknown"
-        theme = normalize_tag(theme_match.group(1), TAG_CONTEXT['themes']) if theme_match else "unknown"
-        music_style = normalize_tag(music_style_match.group(1), TAG_CONTEXT['music_styles']) if music_style_match else "unknown"
-        
-        unique_tags = []
-        if unique_match:
-            raw_tags = [tag.strip() for tag in unique_match.group(1).split(',')]
-            for tag in raw_tags:
-                if tag:
-                    normalized = normalize_tag(tag, TAG_CONTEXT['unique_tags'])
-                    unique_tags.append(normalized)
-                    TAG_CONTEXT['unique_tags'].add(normalized)
-        
-        subjective_tags = []
-        if subjective_match:
-            raw_tags = [tag.strip() for tag in subjective_match.group(1).split(',')]
-            for tag in raw_tags:
-                if tag:
-                    normalized = normalize_tag(tag, TAG_CONTEXT['subjective_tags'])
-                    subjective_tags.append(normalized)
-                    TAG_CONTEXT['subjective_tags'].add(normalized)
-        
-        tag_ratios = {}
-        if ratios_match:
-            ratios_text = ratios_match.group(1)
-            ratio_parts = re.findall(r'([^:]+):(\d+)%', ratios_text)
-            for tag, percentage in ratio_parts:
-                normalized_tag = normalize_tag(tag, TAG_CONTEXT['ratio_tags'])
-                tag_ratios[normalized_tag] = int(percentage)
-                TAG_CONTEXT['ratio_tags'].add(normalized_tag)
-        
-        # Add to context
-        TAG_CONTEXT['main_genres'].add(main_genre)
-        TAG_CONTEXT['sub_genres'].add(sub_genre)
-        TAG_CONTEXT['sub_sub_genres'].add(sub_sub_genre)
-        TAG_CONTEXT['art_styles'].add(art_style)
-        TAG_CONTEXT['themes'].add(theme)
-        TAG_CONTEXT['music_styles'].add(music_style)
-        
-        # Normalize ratios to 100%
-        total = sum(tag_ratios.values())
-        if total != 100 and total > 0:
-            for tag in tag_ratios:
-                tag_ratios[tag] = round(tag_ratios[tag] * 100 / total)
-            
-            diff = 100 - sum(tag_ratios.values())
-            if diff != 0 and tag_ratios:
-                largest_tag = max(tag_ratios.keys(), key=lambda k: tag_ratios[k])
-                tag_ratios[largest_tag] += diff
-        
-        if not tag_ratios:
-            tag_ratios = {"general": 100}
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.2,
+        "max_tokens": 200
+    }
+
+def build_packed_tag_request(games: list, context: dict = None) -> dict:
+    """One request tagging several games, each entry of `games` holds build_tag_request's arguments.
+    
+    The instructions and tag context are sent once instead of once per game, the answer has a
+    block per game that split_packed_response separates again.
+    """
+    if context is None:
+        context = TAG_REGISTRY.snapshot(PROMPT_CONTEXT_LIMITS)
+    
+    system_prompt = f"""{TAG_PROMPT_INTRO}
+
+you will classify {len(games)} games at once, each game is listed with its own steam tags. classify each game independently.
+
+{TAG_PROMPT_TASK}
+
+{consistency_rules(context)}
+
+{TAG_PROMPT_EXAMPLES}
+
+response format, one block per game in the order given, each starting with its header line:
+{PACKED_GAME_HEADER.format(1)}
+{TAG_RESPONSE_FORMAT}
+{PACKED_GAME_HEADER.format(2)}
+..."""
+    
+    sections = [f"{PACKED_GAME_HEADER.format(i)}\n{game_prompt_section(**game)}" for i, game in enumerate(games, 1)]
+    user_prompt = "\n\n".join(sections) + """
+
+create comprehensive classification and tags for each game. use the official descriptions as primary context, then supplement with review insights for subjective quality aspects."""
+    
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.2,
+        "max_tokens": 200 * len(games)
+    }
+
+def split_packed_response(response_text: str, count: int) -> list:
+    """Per-game blocks of a packed response, None for a game whose block is missing or has no MAIN_GENRE"""
+    blocks = [None] * count
+    parts = re.split(r'^\s*=+\s*GAME\s+(\d+)\s*=+\s*$', response_text, flags=re.MULTILINE | re.IGNORECASE)
+    for number, block in zip(parts[1::2], parts[2::2]):
+        index = int(number) - 1
+        if 0 <= index < count and blocks[index] is None and 'MAIN_GENRE:' in block:
+            blocks[index] = block.strip()
+    return blocks
+
+def retry_delay(attempt: int, base: float = LLM_RETRY_BASE, cap: float = LLM_RETRY_CAP) -> float:
+    """Exponential backoff with full jitter, so workers throttled together don't retry together"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def request_tag_completion(request: dict, game_name: str) -> str:
+    """Response text for a tag request, retrying rate limits. Safe to call from several threads."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return LLM_CACHE.chat_completion_text(client, **request)
+        except Exception as e:
+            if "rate_limit_exceeded" not in str(e) or attempt == LLM_MAX_RETRIES:
+                raise
+            wait_time = retry_delay(attempt)
+            print(f"rate limit hit for {game_name}. waiting {wait_time:.1f} seconds before retry {attempt + 1}/{LLM_MAX_RETRIES}...")
+            time.sleep(wait_time)
+
+def request_tag_batch(games: list, context: dict) -> list:
+    """Response text per game for a batch of build_tag_request arguments, or the exception it failed with.
+    
+    A batch of several games goes out as one packed request, games whose block is missing
+    from the answer are then requested on their own.
+    """
+    start = time.perf_counter()
+    outcomes = [None] * len(games)
+    if len(games) > 1:
+        try:
+            packed_text = request_tag_completion(build_packed_tag_request(games, context),
+                                                 ', '.join(game["game_name"] for game in games))
+            outcomes = split_packed_response(packed_text, len(games))
+        except Exception as e:
+            return [e] * len(games)
+    
+    for i, game in enumerate(games):
+        if outcomes[i] is None:
+            try:
+                outcomes[i] = request_tag_completion(build_tag_request(**game, context=context), game["game_name"])
+            except Exception as e:
+                outcomes[i] = e
+    METRICS.record_stage('tag', time.perf_counter() - start, len(games))
+    return outcomes
+
+class TagBatch:
+    """Games that share one tag request, collected until the batch is submitted"""
+    
+    def __init__(self):
+        self.games = []
+        self.future = None
+    
+    def add(self, game_inputs: dict) -> int:
+        self.games.append(game_inputs)
+        return len(self.games) - 1
+    
+    def submit(self, executor, context: dict):
+        self.future = executor.submit(request_tag_batch, self.games, context)
+    
+    def response_text(self, index: int) -> str:
+        outcome = self.future.result()[index]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+def parse_tag_response(response_text: str) -> dict:
+    """Raw fields of a response, nothing canonicalized yet"""
+    def field(name):
+        match = re.search(rf'{name}:\s*(.+?)(?:\n|$)', response_text)
+        return match.group(1) if match else None
+    
+    def tag_list(name):
+        value = field(name)
+        return [tag.strip() for tag in value.split(',') if tag.strip()] if value else []
+    
+    ratios = field('RATIOS')
+    return {
+        "main_genre": field('MAIN_GENRE'),
+        "sub_genre": field('SUB_GENRE'),
+        "sub_sub_genre": field('SUB_SUB_GENRE'),
+        "art_style": field('ART_STYLE'),
+        "theme": field('THEME'),
+        "music_style": field('MUSIC_STYLE'),
+        "unique_tags": tag_list('UNIQUE_TAGS'),
+        "subjective_tags": tag_list('SUBJECTIVE_TAGS'),
+        "tag_ratios": [(tag, int(percentage)) for tag, percentage in re.findall(r'([^:]+):(\d+)%', ratios)] if ratios else []
+    }
+
+# field of a parsed response -> registry category its tags are canonicalized against
+TAG_FIELD_CATEGORIES = {
+    "main_genre": 'main_genres',
+    "sub_genre": 'sub_genres',
+    "sub_sub_genre": 'sub_sub_genres',
+    "art_style": 'art_styles',
+    "theme": 'themes',
+    "music_style": 'music_styles'
+}
+
+def commit_tags(parsed: dict, registry=None) -> dict:
+    """Canonicalize a parsed response against the registry and add its tags.
+    
+    The pipeline calls this in game order, which keeps the tags of a run deterministic.
+    """
+    registry = registry or TAG_REGISTRY
+    assignments = [(category, parsed[key] or "unknown") for key, category in TAG_FIELD_CATEGORIES.items()]
+    assignments += [('unique_tags', tag) for tag in parsed["unique_tags"]]
+    assignments += [('subjective_tags', tag) for tag in parsed["subjective_tags"]]
+    assignments += [('ratio_tags', tag) for tag, _ in parsed["tag_ratios"]]
+    canonical = iter(registry.commit(assignments))
+    
+    tag_data = {key: next(canonical) for key in TAG_FIELD_CATEGORIES}
+    tag_data["unique_tags"] = [next(canonical) for _ in parsed["unique_tags"]]
+    tag_data["subjective_tags"] = [next(canonical) for _ in parsed["subjective_tags"]]
+    
+    tag_ratios = {}
+    for _, percentage in parsed["tag_ratios"]:
+        tag_ratios[next(canonical)] = percentage
+    
+    # Normalize ratios to 100%
+    total = sum(tag_ratios.values())
+    if total != 100 and total > 0:
+        for tag in tag_ratios:
+            tag_ratios[tag] = round(tag_ratios[tag] * 100 / total)
         
+        diff = 100 - sum(tag_ratios.values())
+        if diff != 0 and tag_ratios:
+            largest_tag = max(tag_ratios.keys(), key=lambda k: tag_ratios[k])
+            tag_ratios[largest_tag] += diff
+    
+    if not tag_ratios:
+        tag_ratios = {"general": 100}
+    
+    tag_data["tag_ratios"] = tag_ratios
+    return tag_data
+
+def failed_tags(game_name: str, error: Exception) -> dict:
+    """Placeholder tags for a game whose request failed, nothing is added to the registry"""
+    error_str = str(error)
+    
+    if "insufficient_quota" in error_str:
+        print(f"api quota exceeded for {game_name}. skipping...")
         return {
-            "main_genre": main_genre,
-            "sub_genre": sub_genre,
-            "sub_sub_genre": sub_sub_genre,
-            "art_style": art_style,
-            "theme": theme,
-            "music_style": music_style,
-            "unique_tags": unique_tags,
-            "subjective_tags": subjective_tags,
-            "tag_ratios": tag_ratios
+            "main_genre": "skipped",
+            "sub_genre": "api-limit",
+            "sub_sub_genre": "quota-exceeded",
+            "art_style": "unknown",
+            "theme": "unknown",
+            "music_style": "unknown",
+            "unique_tags": ["api-limit-reached"],
+            "subjective_tags": ["skipped"],
+            "tag_ratios": {"skipped": 100}
         }
-        
-    except Exception as e:
-        error_str = str(e)
-        
-        if "insufficient_quota" in error_str:
-            print(f"api quota exceeded for {game_name}. skipping...")
-            return {
-                "main_genre": "skipped",
-                "sub_genre": "api-limit",
-                "sub_sub_genre": "quota-exceeded",
-                "art_style": "unknown",
-                "theme": "unknown",
-                "music_style": "unknown",
-                "unique_tags": ["api-limit-reached"],
-                "subjective_tags": ["skipped"],
-                "tag_ratios": {"skipped": 100}
-            }
-        
-        elif "rate_limit_exceeded" in error_str:
-            if retry_count < 3:
-                wait_time = 5 + (retry_count * 2)
-                print(f"rate limit hit for {game_name}. waiting {wait_time} seconds before retry {retry_count + 1}/3...")
-                time.sleep(wait_time)
-                return generate_hierarchical_tags(game_name, steam_tags, steam_description, reviews_text, art_style_reviews, theme_reviews, music_reviews, quality_reviews, retry_count + 1)
-            else:
-                print(f"rate limit persists for {game_name} after 3 retries.")
-                return {
-                    "main_genre": "rate-limited",
-                    "sub_genre": "api-error",
-                    "sub_sub_genre": "retry-failed",
-                    "art_style": "unknown",
-                    "theme": "unknown",
-                    "music_style": "unknown",
-                    "unique_tags": ["rate-limit-exceeded"],
-                    "subjective_tags": ["rate-limited"],
-                    "tag_ratios": {"rate-limited": 100}
-                }
-        
-        else:
-            print(f"error generating tags for {game_name}: {error_str}")
-            return {
-                "main_genre": "error",
-                "sub_genre": "unknown-error",
-                "sub_sub_genre": "processing-failed",
-                "art_style": "unknown",
-                "theme": "unknown",
-                "music_style": "unknown",
-                "unique_tags": ["unknown-error"],
-                "subjective_tags": ["error"],
-                "tag_ratios": {"error": 100}
-            }
-
-def gather_steam_reviews(appid: int, count: int = 100) -> list:
-    url = f"https://store.steampowered.com/appreviews/{appid}"
-    params = {
-        "json": 1,
-        "num_per_page": count,
-        "filter": "recent",
-        "language": "english"
-    }
     
+    elif "rate_limit_exceeded" in error_str:
+        print(f"rate limit persists for {game_name} after {LLM_MAX_RETRIES} retries.")
+        return {
+            "main_genre": "rate-limited",
+            "sub_genre": "api-error",
+            "sub_sub_genre": "retry-failed",
+            "art_style": "unknown",
+            "theme": "unknown",
+            "music_style": "unknown",
+            "unique_tags": ["rate-limit-exceeded"],
+            "subjective_tags": ["rate-limited"],
+            "tag_ratios": {"rate-limited": 100}
+        }
+    
+    else:
+        print(f"error generating tags for {game_name}: {error_str}")
+        return {
+            "main_genre": "error",
+            "sub_genre": "unknown-error",
+            "sub_sub_genre": "processing-failed",
+            "art_style": "unknown",
+            "theme": "unknown",
+            "music_style": "unknown",
+            "unique_tags": ["unknown-error"],
+            "subjective_tags": ["error"],
+            "tag_ratios": {"error": 100}
+        }
+
+def generate_hierarchical_tags(game_name: str, steam_tags: list, steam_description: str, reviews_text: list, art_style_reviews: list = None, theme_reviews: list = None, music_reviews: list = None, quality_reviews: list = None):
+    """Request, parse and commit the tags of one game against the current registry"""
     try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
+        request = build_tag_request(game_name, steam_tags, steam_description, reviews_text, art_style_reviews, theme_reviews, music_reviews, quality_reviews)
+        return commit_tags(parse_tag_response(request_tag_completion(request, game_name)))
+    except Exception as e:
+        return failed_tags(game_name, e)
 
-        if "reviews" not in data:
-            return []
-            
-        reviews = []
-        for review in data["reviews"]:
-            reviews.append({
-                "author_id": review["author"]["steamid"],
-                "review": review["review"],
-                "voted_up": review["voted_up"],
-                "playtime_hours": round(review["author"]["playtime_forever"] / 60, 1),
-                "date": datetime.fromtimestamp(review["timestamp_created"]).isoformat()
-            })
+def gather_steam_reviews(appid: int, count: int = 100, enough=None) -> list:
+    """Up to `count` reviews following Steam's cursor, stopping early once the check enough()
+    makes for the game (see EnoughReviews) is true for a page"""
+    reviews = []
+    check = enough() if enough is not None else None
+    try:
+        for page in iter_steam_review_pages(appid, count, HTTP_CACHE.get):
+            reviews.extend(page)
+            if check is not None and check(page):
+                break
         return reviews
     
     except Exception as e:
         print(f"error fetching reviews for appid {appid}: {e}")
-        return []
+        return reviews
 
-def save_tag_context(filename='tag_context.json'):
-    context_to_save = {
-        'ratio_tags': sorted(list(TAG_CONTEXT['ratio_tags'])),
-        'unique_tags': sorted(list(TAG_CONTEXT['unique_tags'])),
-        'subjective_tags': sorted(list(TAG_CONTEXT['subjective_tags'])),
-        'main_genres': sorted(list(TAG_CONTEXT['main_genres'])),
-        'sub_genres': sorted(list(TAG_CONTEXT['sub_genres'])),
-        'sub_sub_genres': sorted(list(TAG_CONTEXT['sub_sub_genres'])),
-        'art_styles': sorted(list(TAG_CONTEXT['art_styles'])),
-        'themes': sorted(list(TAG_CONTEXT['themes'])),
-        'music_styles': sorted(list(TAG_CONTEXT['music_styles']))
-    }
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(context_to_save, f, ensure_ascii=False, indent=2)
+# one line per finished game, resumed from after a crash and streamed into the final output
+CHECKPOINT_LOG = 'checkpoint_steam_analysis.jsonl'
 
-def load_tag_context(filename='tag_context.json'):
-    global TAG_CONTEXT
+def load_checkpoint(filename='checkpoint_steam_analysis.json'):
+    """Results of a checkpoint written before the log existed"""
     try:
         with open(filename, 'r', encoding='utf-8') as f:
-            saved_context = json.load(f)
-            TAG_CONTEXT['ratio_tags'] = set(saved_context.get('ratio_tags', []))
-            TAG_CONTEXT['unique_tags'] = set(saved_context.get('unique_tags', []))
-            TAG_CONTEXT['subjective_tags'] = set(saved_context.get('subjective_tags', []))
-            TAG_CONTEXT['main_genres'] = set(saved_context.get('main_genres', []))
-            TAG_CONTEXT['sub_genres'] = set(saved_context.get('sub_genres', []))
-            TAG_CONTEXT['sub_sub_genres'] = set(saved_context.get('sub_sub_genres', []))
-            TAG_CONTEXT['art_styles'] = set(saved_context.get('art_styles', []))
-            TAG_CONTEXT['themes'] = set(saved_context.get('themes', []))
-            TAG_CONTEXT['music_styles'] = set(saved_context.get('music_styles', []))
-            
-        print(f"loaded existing tag context:")
-        print(f"  - main genres: {len(TAG_CONTEXT['main_genres'])}")
-        print(f"  - sub genres: {len(TAG_CONTEXT['sub_genres'])}")
-        print(f"  - sub-sub genres: {len(TAG_CONTEXT['sub_sub_genres'])}")
-        print(f"  - art styles: {len(TAG_CONTEXT['art_styles'])}")
-        print(f"  - themes: {len(TAG_CONTEXT['themes'])}")
-        print(f"  - music styles: {len(TAG_CONTEXT['music_styles'])}")
-        print(f"  - unique tags: {len(TAG_CONTEXT['unique_tags'])}")
-        print(f"  - subjective tags: {len(TAG_CONTEXT['subjective_tags'])}")
-        print(f"  - ratio tags: {len(TAG_CONTEXT['ratio_tags'])}")
-            
+            return json.load(f)
     except FileNotFoundError:
-        print("warning: tag_context.json not found!")
-        print("starting with empty context - creating new tag consistency system.")
+        return {}
+
+def report_fetched(game: dict, fetched: dict):
+    """Print what the fetch stage found for one game"""
+    steam_tags = fetched["steam_tags"]
+    steam_description = fetched["steam_description"]
+    if steam_tags:
+        print(f"steam tags: {', '.join(steam_tags)}")
+    else:
+        print("no steam tags found")
+    
+    if steam_description:
+        print(f"description: {steam_description[:100]}{'...' if len(steam_description) > 100 else ''}")
+    else:
+        print("no description found")
+    
+    if not fetched["raw_reviews"]:
+        print(f"no reviews found for {game['game_name']}")
 
-def save_checkpoint(results, filename='checkpoint_steam_analysis.json'):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    print(f"checkpoint saved: {len(results)} games processed")
+def analyze_game_reviews(raw_reviews: list) -> dict:
+    """CPU stage, picks the reviews worth sending to the model.
+    
+    Runs in a worker process, so it returns only the selected reviews instead of
+    every record.
+    """
+    raw_reviews = sorted(raw_reviews, key=lambda r: r["playtime_hours"], reverse=True)
+    
+    # One pass over the reviews, the selections below only sort and filter the records
+    records = [analyze_review(r) for r in raw_reviews]
+    return {
+        "art_style_reviews": select_category_reviews(records, 'art_style'),
+        "theme_reviews": select_category_reviews(records, 'theme'),
+        "music_reviews": select_category_reviews(records, 'music'),
+        "quality_reviews": select_quality_reviews(records),
+        "top_reviews": select_top_reviews(records)
+    }
 
-def load_checkpoint(filename='checkpoint_steam_analysis.json'):
+def submit_stage(pool, fn, *args) -> Future:
+    """fn(*args) on the pool, or run right away without one, its result or error in a future either way"""
+    if pool is not None:
+        return pool.submit(fn, *args)
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def start_game_tagging(game: dict, fetched: dict, analysis: dict):
+    """Report a game's review analysis and return the build_tag_request arguments, None when there is nothing to tag"""
+    print(f"\n=== processing {game['game_name']} (appid: {game['steam_appid']}) ===")
+    
+    if analysis is None:
+        return None
+    
+    art_style_reviews = analysis["art_style_reviews"]
+    print(f"found {len(art_style_reviews)} reviews mentioning art style")
+    
+    if art_style_reviews:
+        print(f"art style keywords found: {', '.join(art_style_reviews[0]['art_keywords'][:3])}")
+    
+    theme_reviews = analysis["theme_reviews"]
+    print(f"found {len(theme_reviews)} reviews mentioning themes")
+    
+    if theme_reviews:
+        print(f"theme keywords found: {', '.join(theme_reviews[0]['theme_keywords'][:3])}")
+    
+    music_reviews = analysis["music_reviews"]
+    print(f"found {len(music_reviews)} reviews mentioning music")
+    
+    if music_reviews:
+        print(f"music keywords found: {', '.join(music_reviews[0]['music_keywords'][:3])}")
+    
+    quality_reviews = analysis["quality_reviews"]
+    print(f"found {len(quality_reviews)} reviews mentioning quality aspects")
+    
+    if quality_reviews:
+        print(f"quality keywords found: {', '.join(quality_reviews[0]['quality_keywords'][:3])}")
+        print(f"sentiment: {quality_reviews[0]['overall_sentiment']}")
+    
+    top_reviews = analysis["top_reviews"]
+    if not (top_reviews or fetched["steam_tags"] or fetched["steam_description"]):
+        return None
+    
+    return {
+        "game_name": game["game_name"],
+        "steam_tags": fetched["steam_tags"],
+        "steam_description": fetched["steam_description"],
+        "reviews_text": [r["review"] for r in top_reviews],
+        "art_style_reviews": art_style_reviews,
+        "theme_reviews": theme_reviews,
+        "music_reviews": music_reviews,
+        "quality_reviews": quality_reviews
+    }
+
+def build_game_result(game: dict, fetched: dict, analysis: dict, tag_data: dict = None) -> dict:
+    """Result entry for one game, analysis is None without reviews and tag_data None when nothing was tagged"""
+    appid = game["steam_appid"]
+    game_name = game["game_name"]
+    steam_tags = fetched["steam_tags"]
+    steam_description = fetched["steam_description"]
+    
+    if analysis is None:
+        return {
+            "game_id": game["game_id"],
+            "name": game_name,
+            "steam_appid": appid,
+            "steam_tags": steam_tags,
+            "steam_description": steam_description,
+            "reviews": [],
+            "art_style_reviews": [],
+            "theme_reviews": [],
+            "music_reviews": [],
+            "quality_reviews": [],
+            "main_genre": "unknown",
+            "sub_genre": "unknown",
+            "sub_sub_genre": "unknown",
+            "art_style": "unknown",
+            "theme": "unknown",
+            "music_style": "unknown",
+            "unique_tags": [],
+            "subjective_tags": [],
+            "tag_ratios": {},
+            "processing_date": datetime.now().isoformat(),
+            "status": "no_reviews"
+        }
+    
+    top_reviews = analysis["top_reviews"]
+    
+    if tag_data is None:
+        tag_data = {
+            "main_genre": "unknown",
+            "sub_genre": "unknown",
+            "sub_sub_genre": "unknown",
+            "art_style": "unknown",
+            "theme": "unknown",
+            "music_style": "unknown",
+            "unique_tags": [],
+            "subjective_tags": [],
+            "tag_ratios": {}
+        }
+    else:
+        print(f"\n=== tags for {game_name} ===")
+        print(f"hierarchy: {tag_data['main_genre']} -> {tag_data['sub_genre']} -> {tag_data['sub_sub_genre']}")
+        print(f"art style: {tag_data['art_style']}")
+        print(f"theme: {tag_data['theme']}")
+        print(f"music style: {tag_data['music_style']}")
+        print(f"unique tags: {', '.join(tag_data['unique_tags'])}")
+        print(f"subjective tags: {', '.join(tag_data['subjective_tags'])}")
+        print(f"breakdown: {' '.join([f'{tag}:{percent}%' for tag, percent in tag_data['tag_ratios'].items()])}")
+    
+    print(f"found {len(top_reviews)} quality reviews")
+    
+    return {
+        "game_id": game["game_id"],
+        "name": game_name,
+        "steam_appid": appid,
+        "steam_tags": steam_tags,
+        "steam_description": steam_description,
+        "reviews": top_reviews,
+        "art_style_reviews": analysis["art_style_reviews"],
+        "theme_reviews": analysis["theme_reviews"],
+        "music_reviews": analysis["music_reviews"],
+        "quality_reviews": analysis["quality_reviews"],
+        "main_genre": tag_data["main_genre"],
+        "sub_genre": tag_data["sub_genre"],
+        "sub_sub_genre": tag_data["sub_sub_genre"],
+        "art_style": tag_data["art_style"],
+        "theme": tag_data["theme"],
+        "music_style": tag_data["music_style"],
+        "unique_tags": tag_data["unique_tags"],
+        "subjective_tags": tag_data["subjective_tags"],
+        "tag_ratios": tag_data["tag_ratios"],
+        "processing_date": datetime.now().isoformat(),
+        "status": "processed"
+    }
+
+REVIEW_LIST_FIELDS = ["reviews", "art_style_reviews", "theme_reviews", "music_reviews", "quality_reviews"]
+RAW_REVIEW_FIELDS = ["author_id", "review", "voted_up", "playtime_hours", "date"]
+
+def previous_review_pool(previous: dict) -> list:
+    """Reviews a previous run selected for a game, stripped back to their raw fields"""
+    pool = []
+    for field in REVIEW_LIST_FIELDS:
+        for review in (previous or {}).get(field, []):
+            pool.append({key: review[key] for key in RAW_REVIEW_FIELDS if key in review})
+    return pool
+
+def merge_reviews(newer: list, older: list) -> list:
+    """Newer reviews first, then older ones not already present"""
+    merged = []
+    seen = set()
+    for review in newer + older:
+        key = (review.get("author_id"), review["review"])
+        if key not in seen:
+            seen.add(key)
+            merged.append(review)
+    return merged
+
+def hash_review_selection(game: dict, fetched: dict, analysis: dict) -> str:
+    """Hash of everything the model would be prompted with for a game"""
+    selection = {field: [r["review"] for r in analysis[key]] for field, key in [
+        ("reviews", "top_reviews"), ("art_style_reviews", "art_style_reviews"), ("theme_reviews", "theme_reviews"),
+        ("music_reviews", "music_reviews"), ("quality_reviews", "quality_reviews")
+    ]} if analysis else {}
+    return hash_json([game["game_name"], fetched["steam_tags"], fetched["steam_description"], selection])
+
+def newest_review_date(reviews: list):
+    return max((r["date"] for r in reviews if r.get("date")), default=None)
+
+def fetched_summary(fetched: dict) -> dict:
+    """What the stages after analysis need from a fetch, without the raw reviews"""
+    return {
+        "steam_tags": fetched["steam_tags"],
+        "steam_description": fetched["steam_description"],
+        "newest_review_date": newest_review_date(fetched["raw_reviews"])
+    }
+
+def load_previous_results(filename='steam_games_with_hierarchical_tags.json') -> dict:
     try:
         with open(filename, 'r', encoding='utf-8') as f:
             return json.load(f)
     except FileNotFoundError:
         return {}
 
-def main():
+def classifier_training_results(previous, result_log):
+    """What TagClassifier.fit needs of every previous and logged result, one game at a time.
+    
+    `previous` yields (appid, result) of the last run's output, a game's logged result replaces it.
+    """
+    for appid, result in previous:
+        if appid not in result_log:
+            yield training_fields(result)
+    for appid, result in result_log.results():
+        yield training_fields(result)
+
+def main(workers: int = 0, fetch_options: dict = None, max_reviews: int = MAX_REVIEWS_PER_GAME, refresh: bool = False,
+         llm_workers: int = 1, llm_staleness: int = None, pack_size: int = 1, classifier_confidence: float = None,
+         schedule: int = None, traffic_db: str = TRAFFIC_DB, recommendations_db: str = RECOMMENDATIONS_DB):
     if not os.getenv('OPENAI_API_KEY'):
         print("error: openai_api_key environment variable not set")
         print("please set it using: export openai_api_key='your-api-key'")
         return
     
-    load_tag_context()
+    if TAG_REGISTRY.load():
+        counts = TAG_REGISTRY.counts()
+        print(f"loaded existing tag context:")
+        print(f"  - main genres: {counts['main_genres']}")
+        print(f"  - sub genres: {counts['sub_genres']}")
+        print(f"  - sub-sub genres: {counts['sub_sub_genres']}")
+        print(f"  - art styles: {counts['art_styles']}")
+        print(f"  - themes: {counts['themes']}")
+        print(f"  - music styles: {counts['music_styles']}")
+        print(f"  - unique tags: {counts['unique_tags']}")
+        print(f"  - subjective tags: {counts['subjective_tags']}")
+        print(f"  - ratio tags: {counts['ratio_tags']}")
+    else:
+        print("warning: tag_context.json not found!")
+        print("starting with empty context - creating new tag consistency system.")
+    
+    result_log = ResultLog(CHECKPOINT_LOG)
+    legacy_checkpoint = load_checkpoint()
+    for appid_str, result in legacy_checkpoint.items():
+        if appid_str not in result_log:
+            result_log.append(appid_str, result)
+    if legacy_checkpoint:
+        os.remove('checkpoint_steam_analysis.json')
+        print(f"moved {len(legacy_checkpoint)} games from checkpoint_steam_analysis.json to {CHECKPOINT_LOG}")
+    final_output_file = 'steam_games_with_hierarchical_tags.json'
+    refresh_state = ReviewRefreshState()
+    work_queue = WorkQueue()
+    
+    # A scheduled run refreshes the `schedule` games refresh_scheduler.py ranks highest
+    refresh = refresh or schedule is not None
     
-    results = load_checkpoint()
-    processed_appids = set(results.keys())
+    # A refresh revisits every game, fetching only reviews newer than the last run's, and needs
+    # the last run's results in memory. Other runs stream them into the output at the end
+    previous_results = load_previous_results(final_output_file) if refresh else {}
+    if refresh:
+        print(f"refresh mode: {len(previous_results)} games from the previous run")
     
     games = get_games_from_database()
     if not games:
         print("no games found in database!")
         return
-    
     print(f"found {len(games)} games in database")
-    print(f"already processed: {len(processed_appids)} games")
+    
+    # Unfinished jobs are a crashed or replayed run to pick up, otherwise every game starts over
+    resuming = work_queue.unfinished() or len(result_log)
+    
+    if schedule is not None:
+        scheduler = RefreshScheduler(recommendations_db=recommendations_db, traffic_db=traffic_db)
+        if resuming:
+            # the interrupted pass is finished before new games are picked
+            unfinished = []
+            for g in scheduler.order(games):
+                job = work_queue.get(g["steam_appid"])
+                if job is not None and job["stage"] != 'stored' and not job["dead"]:
+                    unfinished.append(g)
+            games = unfinished
+        else:
+            games = scheduler.select(games, schedule)
+        print(f"scheduled refresh of {len(games)} games, the most popular and looked-at stale ones first")
+    
+    if resuming:
+        work_queue.enqueue(games)
+    else:
+        work_queue.start_pass(games)
+    
+    print(f"already processed: {work_queue.counts()['stored']} games")
     
     remaining_games = []
     
     for g in games:
-        appid_str = str(g["steam_appid"])
+        job = work_queue.get(g["steam_appid"])
         
-        if appid_str in processed_appids:
+        if job["stage"] == 'stored' or job["dead"]:
             continue
-            
+        
+        if refresh:
+            g = dict(g, reviews_since=refresh_state.get(g["steam_appid"])[0])
+        
         remaining_games.append(g)
     
     print(f"remaining to process: {len(remaining_games)} games")
     
     if not remaining_games:
         print("no games need steam review processing!")
-        return
+        if not len(result_log):
+            return
     
-    for i, game in enumerate(remaining_games, 1):
-        appid = game["steam_appid"]
-        game_name = game["game_name"]
-        
-        print(f"\n=== processing {i}/{len(remaining_games)}: {game_name} (appid: {appid}) ===")
-        
-        # Get Steam's official tags and description
-        print("fetching steam official data...")
-        steam_tags, steam_description = get_steam_tags_and_description(appid)
-        if steam_tags:
-            print(f"steam tags: {', '.join(steam_tags)}")
+    METRICS.reset()
+    METRICS.set_progress(0, len(remaining_games))
+    
+    # Games the tagged ones agree on confidently take their tags without a model call
+    classifier = None
+    classified = 0
+    if classifier_confidence is not None:
+        previous = previous_results.items() if refresh else iter_json_results(final_output_file)
+        classifier = TagClassifier().fit(classifier_training_results(previous, result_log))
+        print(f"classifier trained on {len(classifier)} tagged games, "
+              f"skipping the model at confidence >= {classifier_confidence}")
+    
+    # Every game is a job in the work queue, moving through its stages on their own workers: the
+    # fetch stage on a background event loop, analysis on the process pool and tagging on the
+    # thread pool, all overlapping. A game whose stage fails is retried in another pass over the
+    # failed games until that stage's retries run out and the job is dead.
+    retry_games = []
+    
+    # Fetching stays on this process while the pool analyzes the games already fetched,
+    # up to `lookahead` games are fetched ahead of the one being tagged
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    lookahead = workers * 2
+    pending = deque()
+    completed = 0
+    
+    # Up to `llm_workers` tag requests are in flight, each tagging up to `pack_size` games.
+    # Responses are committed to the registry in game order, and a game is only queued once every
+    # game more than `llm_staleness` places ahead of it is committed, so the context its prompt
+    # shows misses at most that many games
+    llm_pool = ThreadPoolExecutor(max_workers=max(1, llm_workers))
+    pack_size = max(1, pack_size)
+    if llm_staleness is None:
+        llm_staleness = max(0, llm_workers * pack_size - 1)
+    tagging = deque()
+    batch = None
+    
+    def stage_failed(game, stage, error):
+        if work_queue.fail(game["steam_appid"], stage, error):
+            print(f"{stage} stage failed for {game['game_name']}, retrying later: {error}")
+            retry_games.append(game)
         else:
-            print("no steam tags found")
+            print(f"{stage} stage failed for {game['game_name']} with no retries left, job is dead: {error}")
+    
+    def submit_batch():
+        nonlocal batch
+        if batch is not None:
+            batch.submit(llm_pool, TAG_REGISTRY.snapshot(PROMPT_CONTEXT_LIMITS))
+            batch = None
+    
+    def commit_oldest():
+        nonlocal completed, classified
+        game, fetched, analysis, selection_hash, kept, tag_job = tagging.popleft()
         
-        if steam_description:
-            print(f"description: {steam_description[:100]}{'...' if len(steam_description) > 100 else ''}")
+        appid_str = str(game["steam_appid"])
+        if kept is not None:
+            result = kept
         else:
-            print("no description found")
-        
-        raw_reviews = gather_steam_reviews(appid, 200)
-        if not raw_reviews:
-            print(f"no reviews found for {game_name}")
-            results[str(appid)] = {
-                "game_id": game["game_id"],
-                "name": game_name,
-                "steam_appid": appid,
-                "steam_tags": steam_tags,
-                "steam_description": steam_description,
-                "reviews": [],
-                "art_style_reviews": [],
-                "theme_reviews": [],
-                "music_reviews": [],
-                "quality_reviews": [],
-                "main_genre": "unknown",
-                "sub_genre": "unknown",
-                "sub_sub_genre": "unknown",
-                "art_style": "unknown",
-                "theme": "unknown",
-                "music_style": "unknown",
-                "unique_tags": [],
-                "subjective_tags": [],
-                "tag_ratios": {},
-                "processing_date": datetime.now().isoformat(),
-                "status": "no_reviews"
-            }
-            continue
-        
-        raw_reviews.sort(key=lambda r: r["playtime_hours"], reverse=True)
-        
-        # Find art style reviews first
-        art_style_reviews = find_art_style_reviews(raw_reviews)
-        print(f"found {len(art_style_reviews)} reviews mentioning art style")
-        
-        if art_style_reviews:
-            print(f"art style keywords found: {', '.join(art_style_reviews[0]['art_keywords'][:3])}")
-        
-        # Find theme reviews
-        theme_reviews = find_theme_reviews(raw_reviews)
-        print(f"found {len(theme_reviews)} reviews mentioning themes")
-        
-        if theme_reviews:
-            print(f"theme keywords found: {', '.join(theme_reviews[0]['theme_keywords'][:3])}")
-        
-        # Find music reviews
-        music_reviews = find_music_reviews(raw_reviews)
-        print(f"found {len(music_reviews)} reviews mentioning music")
-        
-        if music_reviews:
-            print(f"music keywords found: {', '.join(music_reviews[0]['music_keywords'][:3])}")
-        
-        # Find quality-focused reviews
-        quality_reviews = find_subjective_quality_reviews(raw_reviews)
-        print(f"found {len(quality_reviews)} reviews mentioning quality aspects")
+            tag_data = None
+            confidence = None
+            if tag_job is not None:
+                game_batch, detail = tag_job
+                if game_batch is None:
+                    # saved by an earlier run or predicted by the classifier
+                    tags = detail
+                else:
+                    if game_batch is batch:
+                        submit_batch()
+                    try:
+                        tags = {"response_text": game_batch.response_text(detail)}
+                    except Exception as e:
+                        stage_failed(game, 'tagged', str(e))
+                        return
+                
+                try:
+                    if "predicted" in tags:
+                        # committed like a response so the registry sees it in order
+                        predicted, confidence = tags["predicted"], tags["confidence"]
+                        tag_data = commit_tags(dict(predicted, tag_ratios=list(predicted["tag_ratios"].items())))
+                    else:
+                        tag_data = commit_tags(parse_tag_response(tags["response_text"]))
+                except Exception as e:
+                    stage_failed(game, 'tagged', f"unusable response: {e}")
+                    return
+                work_queue.advance(game["steam_appid"], 'tagged', tags=tags)
+            
+            result = build_game_result(game, fetched, analysis, tag_data)
+            if confidence is not None:
+                result.update(tag_source="classifier", classifier_confidence=round(confidence, 3))
+                classified += 1
         
-        if quality_reviews:
-            print(f"quality keywords found: {', '.join(quality_reviews[0]['quality_keywords'][:3])}")
-            print(f"sentiment: {quality_reviews[0]['overall_sentiment']}")
+        # The result is on disk before the state that lets a refresh skip the game
+        start = time.perf_counter()
+        result_log.append(appid_str, result)
+        work_queue.advance(game["steam_appid"], 'stored')
+        refresh_state.record(game["steam_appid"], fetched["newest_review_date"], selection_hash)
+        refresh_state.commit()
+        METRICS.record_stage('store', time.perf_counter() - start)
         
-        filtered_reviews = []
-        fallback_candidates = []
+        completed += 1
+        METRICS.set_progress(completed, len(remaining_games))
+        METRICS.set_queue('analyzing', len(pending))
+        METRICS.set_queue('tagging', len(tagging))
+        METRICS.set_queue('retrying', len(retry_games))
+        METRICS.maybe_emit()
+        if completed % 10 == 0:
+            print(f"checkpoint: {len(result_log)} games processed")
+            print(METRICS.progress_line())
+            TAG_REGISTRY.save()
+            time.sleep(1)
+    
+    def start_oldest():
+        nonlocal batch
+        game, fetched, analysis, saved_tags = pending.popleft()
+        if isinstance(analysis, Future):
+            try:
+                analysis, seconds = analysis.result()
+            except Exception as e:
+                stage_failed(game, 'analyzed', str(e))
+                return
+            METRICS.record_stage('analyze', seconds)
+            work_queue.advance(game["steam_appid"], 'analyzed', fetched=fetched, analysis=analysis)
         
-        for r in raw_reviews:
-            text = r['review']
-            if len(text) < 200 or r["playtime_hours"] < 1:
-                continue
-            if not is_comprehensible(text):
-                continue
-
-            stats = gameplay_keyword_stats(text)
-            r["keyword_stats"] = stats
-
-            if stats["total"] < 1:
-                continue
-
-            fallback_candidates.append(r)
-
-            if stats["total"] < 6:
-                continue
-            if is_complaint(text) and mentions_toxicity(text):
-                continue
-
-            filtered_reviews.append(r)
-
-        if not filtered_reviews and fallback_candidates:
-            best_fallback = sorted(
-                fallback_candidates,
-                key=lambda r: (r["voted_up"], r["keyword_stats"]["total"]),
-                reverse=True
-            )[0]
-            filtered_reviews.append(best_fallback)
-
-        top_reviews = filtered_reviews[:3]
+        while len(tagging) > llm_staleness:
+            commit_oldest()
         
-        # Generate hierarchical tags
-        tag_data = {
-            "main_genre": "unknown",
-            "sub_genre": "unknown",
-            "sub_sub_genre": "unknown",
-            "art_style": "unknown",
-            "theme": "unknown",
-            "music_style": "unknown",
-            "unique_tags": [],
-            "subjective_tags": [],
-            "tag_ratios": {}
-        }
+        selection_hash = hash_review_selection(game, fetched, analysis)
+        previous = previous_results.get(str(game["steam_appid"]))
+        kept = tag_job = None
+        if saved_tags is not None:
+            print(f"\n=== {game['game_name']}: reusing the saved tag response ===")
+            tag_job = (None, saved_tags)
+        elif (refresh and previous and previous.get("status") == "processed"
+                and refresh_state.get(game["steam_appid"])[1] == selection_hash):
+            print(f"\n=== {game['game_name']}: selected reviews unchanged, keeping previous tags ===")
+            kept = previous
+        else:
+            game_inputs = start_game_tagging(game, fetched, analysis)
+            if game_inputs is not None and classifier is not None:
+                predicted, confidence = classifier.predict(fetched["steam_tags"], fetched["steam_description"],
+                                                           review_keywords(analysis))
+                if predicted is not None and confidence >= classifier_confidence:
+                    print(f"classifier confidence {confidence:.2f}, skipping the model")
+                    tag_job = (None, {"predicted": predicted, "confidence": confidence})
+                    game_inputs = None
+            if game_inputs is not None:
+                if batch is None:
+                    batch = TagBatch()
+                tag_job = (batch, batch.add(game_inputs))
+                if len(batch.games) >= pack_size:
+                    submit_batch()
+        tagging.append((game, fetched, analysis, selection_hash, kept, tag_job))
+    
+    def pass_jobs(pass_games):
+        """(game, fetched, job) for a pass, the job when its game resumes after the analysis stage
+        and needs no fetching, else None with the freshly fetched data. Resumed games come first."""
+        to_fetch = []
+        for game in pass_games:
+            job = work_queue.get(game["steam_appid"])
+            if job["stage"] in ('analyzed', 'tagged'):
+                yield game, job["fetched"], job
+            else:
+                to_fetch.append(game)
         
-        if top_reviews or steam_tags or steam_description:
-            review_texts = [r["review"] for r in top_reviews]
-            tag_data = generate_hierarchical_tags(game_name, steam_tags, steam_description, review_texts, art_style_reviews, theme_reviews, music_reviews, quality_reviews)
+        # Steam requests for the upcoming games run concurrently on a background event loop,
+        # under the per-endpoint rate limits
+        fetch_stage = fetch_games_in_background(to_fetch, review_count=max_reviews,
+                                                enough=EnoughReviews, **(fetch_options or {}))
+        try:
+            for game, fetched in fetch_stage:
+                yield game, fetched, None
+        finally:
+            fetch_stage.close()
+    
+    pass_games = remaining_games
+    try:
+        while pass_games:
+            for i, (game, fetched, job) in enumerate(pass_jobs(pass_games), 1):
+                if job is not None:
+                    print(f"\n=== resuming {i}/{len(pass_games)}: {game['game_name']} after the {job['stage']} stage ===")
+                    pending.append((game, fetched, job["analysis"], job["tags"] if job["stage"] == 'tagged' else None))
+                else:
+                    print(f"\n=== fetched {i}/{len(pass_games)}: {game['game_name']} (appid: {game['steam_appid']}) ===")
+                    report_fetched(game, fetched)
+                    if fetched["errors"]:
+                        stage_failed(game, 'fetched', '; '.join(fetched["errors"]))
+                        continue
+                    work_queue.advance(game["steam_appid"], 'fetched')
+                    
+                    previous = previous_results.get(str(game["steam_appid"])) if refresh else None
+                    if previous:
+                        # Last run's picks compete with the new reviews, so a refresh never loses coverage
+                        fetched["raw_reviews"] = merge_reviews(fetched["raw_reviews"], previous_review_pool(previous))
+                    
+                    # The raw reviews aren't needed past the analysis stage
+                    summary = fetched_summary(fetched)
+                    if not fetched["raw_reviews"]:
+                        work_queue.advance(game["steam_appid"], 'analyzed', fetched=summary, analysis=None)
+                        pending.append((game, summary, None, None))
+                    else:
+                        pending.append((game, summary, submit_stage(pool, timed_call, analyze_game_reviews, fetched["raw_reviews"]), None))
+                
+                while len(pending) > lookahead:
+                    start_oldest()
             
-            print(f"hierarchy: {tag_data['main_genre']} -> {tag_data['sub_genre']} -> {tag_data['sub_sub_genre']}")
-            print(f"art style: {tag_data['art_style']}")
-            print(f"theme: {tag_data['theme']}")
-            print(f"music style: {tag_data['music_style']}")
-            print(f"unique tags: {', '.join(tag_data['unique_tags'])}")
-            print(f"subjective tags: {', '.join(tag_data['subjective_tags'])}")
-            print(f"breakdown: {' '.join([f'{tag}:{percent}%' for tag, percent in tag_data['tag_ratios'].items()])}")
-        
-        results[str(appid)] = {
-            "game_id": game["game_id"],
-            "name": game_name,
-            "steam_appid": appid,
-            "steam_tags": steam_tags,
-            "steam_description": steam_description,
-            "reviews": top_reviews,
-            "art_style_reviews": art_style_reviews,
-            "theme_reviews": theme_reviews,
-            "music_reviews": music_reviews,
-            "quality_reviews": quality_reviews,
-            "main_genre": tag_data["main_genre"],
-            "sub_genre": tag_data["sub_genre"],
-            "sub_sub_genre": tag_data["sub_sub_genre"],
-            "art_style": tag_data["art_style"],
-            "theme": tag_data["theme"],
-            "music_style": tag_data["music_style"],
-            "unique_tags": tag_data["unique_tags"],
-            "subjective_tags": tag_data["subjective_tags"],
-            "tag_ratios": tag_data["tag_ratios"],
-            "processing_date": datetime.now().isoformat(),
-            "status": "processed"
-        }
-        
-        print(f"found {len(top_reviews)} quality reviews")
-        
-        if i % 10 == 0:
-            save_checkpoint(results)
-            save_tag_context()
-            time.sleep(1)
+            while pending:
+                start_oldest()
+            submit_batch()
+            while tagging:
+                commit_oldest()
+            
+            pass_games, retry_games = retry_games, []
+            if pass_games:
+                print(f"\nretrying {len(pass_games)} games whose stage failed")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        llm_pool.shutdown(cancel_futures=True)
     
-    final_output_file = 'steam_games_with_hierarchical_tags.json'
-    with open(final_output_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    # Games this run didn't redo keep their previous results, whatever the mode
+    previous_appids = set()
+    
+    def previous_entries():
+        for appid, result in (previous_results.items() if refresh else iter_json_results(final_output_file)):
+            previous_appids.add(appid)
+            yield appid, result
+    
+    total_games = result_log.write_json(final_output_file, previous_entries())
+    refresh_state.close()
     
-    save_tag_context()
+    TAG_REGISTRY.save()
     
     print(f"\n{'='*80}")
     print(f"hierarchical analysis complete!")
-    print(f"total games processed: {len(results)}")
+    print(f"total games processed: {total_games}")
     print(f"results saved to: {final_output_file}")
+    HTTP_CACHE.print_stats()
+    LLM_CACHE.print_stats()
+    if classifier is not None:
+        print(f"classifier tagged {classified} games without the model")
+    work_queue.print_stats()
+    print_report(METRICS.write_report())
+    dead_jobs = work_queue.dead_jobs()
+    if dead_jobs:
+        print(f"\nwarning: {len(dead_jobs)} games are dead after running out of retries, see python work_queue.py --dead")
+        for appid, game_name, stage, last_error in dead_jobs:
+            kept = "keeps its previous result" if str(appid) in previous_appids else "has no result"
+            print(f"  {game_name} ({appid}) {kept}: {last_error}")
+    work_queue.close()
     
     print(f"\nfinal tag statistics:")
-    print(f"main genres: {len(TAG_CONTEXT['main_genres'])}")
-    print(f"sub genres: {len(TAG_CONTEXT['sub_genres'])}")
-    print(f"sub-sub genres: {len(TAG_CONTEXT['sub_sub_genres'])}")
-    print(f"art styles: {len(TAG_CONTEXT['art_styles'])}")
-    print(f"themes: {len(TAG_CONTEXT['themes'])}")
-    print(f"music styles: {len(TAG_CONTEXT['music_styles'])}")
-    print(f"unique tags: {len(TAG_CONTEXT['unique_tags'])}")
-    print(f"subjective tags: {len(TAG_CONTEXT['subjective_tags'])}")
-    print(f"ratio tags: {len(TAG_CONTEXT['ratio_tags'])}")
+    counts = TAG_REGISTRY.counts()
+    print(f"main genres: {counts['main_genres']}")
+    print(f"sub genres: {counts['sub_genres']}")
+    print(f"sub-sub genres: {counts['sub_sub_genres']}")
+    print(f"art styles: {counts['art_styles']}")
+    print(f"themes: {counts['themes']}")
+    print(f"music styles: {counts['music_styles']}")
+    print(f"unique tags: {counts['unique_tags']}")
+    print(f"subjective tags: {counts['subjective_tags']}")
+    print(f"ratio tags: {counts['ratio_tags']}")
     
     print(f"\ntag context saved to tag_context.json for consistency!")
     print("database ready for similarity-based game recommendations!")
     
-    if os.path.exists('checkpoint_steam_analysis.json'):
-        os.remove('checkpoint_steam_analysis.json')
-        print("checkpoint file removed")
+    result_log.remove()
+    print("checkpoint file removed")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = add_fetcher_arguments(argparse.ArgumentParser(description="Tag Steam games from their reviews"))
+    add_cache_arguments(parser)
+    add_metrics_arguments(parser)
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="always call the model, without reading or writing cached responses")
+    parser.add_argument("--refresh", action="store_true",
+                        help="revisit every game, fetching only newer reviews and skipping unchanged ones")
+    parser.add_argument("--max-reviews", type=int, default=MAX_REVIEWS_PER_GAME,
+                        help="most reviews fetched per game, fewer once every selection is covered")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes for review analysis, 0 analyzes on the main process")
+    parser.add_argument("--llm-workers", type=int, default=1,
+                        help="tag requests in flight at once")
+    parser.add_argument("--llm-staleness", type=int, default=None,
+                        help="most earlier games whose tags a prompt's context may miss (default: llm workers x pack size - 1)")
+    parser.add_argument("--classifier-confidence", type=float, default=None,
+                        help="tag games locally when the nearest tagged games agree with at least this confidence "
+                             "(0-1), off by default")
+    parser.add_argument("--pack-size", type=int, default=1,
+                        help="games tagged per request, the instructions and tag context are sent once per request")
+    parser.add_argument("--schedule", type=int, default=None, metavar="BUDGET",
+                        help="refresh only the BUDGET games refresh_scheduler.py ranks highest, implies --refresh")
+    parser.add_argument("--continuous", action="store_true",
+                        help="with --schedule, run again every day, BUDGET games per day")
+    parser.add_argument("--traffic-db", default=TRAFFIC_DB,
+                        help="traffic database app.py writes next to itself, read by --schedule")
+    parser.add_argument("--recommendations-db", default=RECOMMENDATIONS_DB,
+                        help="served database whose processing dates --schedule reads")
+    args = parser.parse_args()
+    configure_from_args(args)
+    configure_metrics_from_args(args)
+    LLM_CACHE.enabled = not args.no_llm_cache
+    
+    while True:
+        started = time.time()
+        main(workers=args.workers, fetch_options=fetcher_options(args), max_reviews=args.max_reviews, refresh=args.refresh,
+             llm_workers=args.llm_workers, llm_staleness=args.llm_staleness, pack_size=args.pack_size,
+             classifier_confidence=args.classifier_confidence, schedule=args.schedule,
+             traffic_db=args.traffic_db, recommendations_db=args.recommendations_db)
+        if not (args.continuous and args.schedule is not None):
+            break
+        wait = max(0, started + 24 * 60 * 60 - time.time())
+        print(f"next scheduled refresh at {datetime.fromtimestamp(time.time() + wait).isoformat(timespec='minutes')}")
+        time.sleep(wait)
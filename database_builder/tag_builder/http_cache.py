@@ -0,0 +1,269 @@
+# on-disk cache for http responses shared by the steam, ign and youtube scripts
+# entries are keyed by a hash of the normalized url and params, stored gzip-compressed,
+# and expire after a per-endpoint ttl. in offline mode nothing goes to the network and
+# every cached entry is served regardless of age.
+#   HTTP_CACHE_DIR=http_cache HTTP_CACHE_OFFLINE=1 python extract_verdicts.py
+# the cache also records fixture archives for http_fixtures.py: every response it sees, cached
+# or not, is appended to HTTP_FIXTURE_RECORD, and with HTTP_FIXTURE_SERVER set requests go to
+# that local stand-in instead of the real services.
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DAY = 24 * 60 * 60
+
+# seconds an entry stays fresh, None never expires
+DEFAULT_TTLS = {
+    'appdetails': 7 * DAY,
+    'appreviews': 1 * DAY,
+    'ign_article': 30 * DAY,
+    'youtube_api': 1 * DAY,
+    'youtube_transcript': None,
+    'default': 1 * DAY
+}
+
+class OfflineCacheMiss(Exception):
+    """Raised in offline mode for a request that isn't cached"""
+
+def endpoint_of(url):
+    """TTL bucket a url falls into, by path first so a local stub server shares steam's"""
+    parts = urlsplit(url)
+    if parts.path.startswith('/api/appdetails'):
+        return 'appdetails'
+    if parts.path.startswith('/appreviews/'):
+        return 'appreviews'
+    if parts.hostname and parts.hostname.endswith('ign.com'):
+        return 'ign_article'
+    return 'default'
+
+def normalize_url(url, params=None):
+    """Lowercase scheme and host, drop the fragment and sort the query with params merged in"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((str(k), str(v)) for k, v in params.items())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urlencode(sorted(query)), ''))
+
+class CachedResponse:
+    """The parts of a requests/httpx response the scripts use"""
+
+    from_cache = True
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+class ResponseCache:
+    def __init__(self, cache_dir='http_cache', ttls=None, offline=False, enabled=True,
+                 record_path=None, fixture_server=None):
+        self.cache_dir = cache_dir
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.offline = offline
+        self.enabled = enabled
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0}
+        # fixture archive responses are appended to, and the stand-in serving one
+        self.record_path = record_path
+        self.fixture_server = fixture_server
+        self.record_lock = threading.Lock()
+        self.recorded = set()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            cache_dir=os.getenv('HTTP_CACHE_DIR', 'http_cache'),
+            offline=os.getenv('HTTP_CACHE_OFFLINE', '') not in ('', '0'),
+            enabled=os.getenv('HTTP_CACHE_DISABLED', '') in ('', '0'),
+            record_path=os.getenv('HTTP_FIXTURE_RECORD') or None,
+            fixture_server=os.getenv('HTTP_FIXTURE_SERVER') or None
+        )
+
+    def configure(self, cache_dir=None, offline=None, enabled=None, record_path=None, fixture_server=None):
+        """Change settings in place, so modules that imported the shared cache see them"""
+        if cache_dir is not None:
+            self.cache_dir = cache_dir
+        if offline is not None:
+            self.offline = offline
+        if enabled is not None:
+            self.enabled = enabled
+        if record_path is not None:
+            self.record_path = record_path
+        if fixture_server is not None:
+            self.fixture_server = fixture_server.rstrip('/')
+
+    def record(self, kind, key, body, **meta):
+        """Append a response to the fixture archive when recording, once per key and run.
+
+        `kind` is 'http' keyed by normalized url, 'call' keyed by a memoized call's key or 'chat'
+        keyed by a chat completion request's hash.
+        """
+        if self.record_path is None:
+            return
+        line = json.dumps(dict(meta, kind=kind, key=key, body=base64.b64encode(body).decode('ascii')))
+        with self.record_lock:
+            if (kind, key) in self.recorded:
+                return
+            self.recorded.add((kind, key))
+            # every line is its own gzip member, so a crash loses at most the line being written
+            with gzip.open(self.record_path, 'ab') as f:
+                f.write(line.encode('utf-8') + b'\n')
+
+    def fixture_url(self, url):
+        """`url` on the fixture server when one is set, which matches responses by path and query"""
+        if self.fixture_server is None:
+            return url
+        parts = urlsplit(url)
+        return self.fixture_server + urlunsplit(('', '', parts.path or '/', parts.query, ''))
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.gz')
+
+    def _read(self, key, endpoint):
+        """(meta, body) for a usable entry, None when it is missing or expired"""
+        try:
+            with gzip.open(self._path(key), 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+        ttl = self.ttls.get(endpoint, self.ttls['default'])
+        if not self.offline and ttl is not None and time.time() - meta['stored_at'] > ttl:
+            return None
+        return meta, body
+
+    def _write(self, key, meta, body):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(json.dumps(dict(meta, stored_at=time.time())).encode('utf-8') + b'\n')
+            f.write(body)
+        os.replace(tmp_path, path)
+        self.stats['stored'] += 1
+
+    def _miss(self, what):
+        self.stats['misses'] += 1
+        if self.offline:
+            raise OfflineCacheMiss(f"not in the http cache (offline mode): {what}")
+
+    def lookup(self, url, params=None, endpoint=None):
+        """Cached response for a GET, None when it has to be fetched"""
+        if not self.enabled:
+            return None
+        normalized = normalize_url(url, params)
+        entry = self._read(hashlib.sha256(normalized.encode('utf-8')).hexdigest(), endpoint or endpoint_of(url))
+        if entry is None:
+            self._miss(normalized)
+            return None
+
+        self.stats['hits'] += 1
+        meta, body = entry
+        self.record('http', normalized, body, status=meta['status'], headers=meta['headers'])
+        return CachedResponse(meta['url'], meta['status'], meta['headers'], body)
+
+    def store(self, url, params, response):
+        """Save a successful requests/httpx response, anything else is left uncached"""
+        if response.status_code != 200:
+            return
+        normalized = normalize_url(url, params)
+        meta = {
+            'url': normalized,
+            'status': response.status_code,
+            'headers': {'content-type': response.headers.get('content-type', '')}
+        }
+        self.record('http', normalized, response.content, status=meta['status'], headers=meta['headers'])
+        if self.enabled:
+            self._write(hashlib.sha256(normalized.encode('utf-8')).hexdigest(), meta, response.content)
+
+    def get(self, url, params=None, fetch=None, **kwargs):
+        """requests.get through the cache, `fetch` replaces requests.get"""
+        cached = self.lookup(url, params)
+        if cached is not None:
+            return cached
+        if fetch is None:
+            import requests
+            fetch = requests.get
+        response = fetch(self.fixture_url(url), params=params, **kwargs)
+        self.store(url, params, response)
+        return response
+
+    def call(self, endpoint, key_parts, compute):
+        """Memoize a JSON-serializable result of a non-http call, like a client library request"""
+        key_source = json.dumps([endpoint, key_parts], sort_keys=True)
+        key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+        if self.enabled:
+            entry = self._read(key, endpoint)
+            if entry is not None:
+                self.stats['hits'] += 1
+                self.record('call', key, entry[1], call=key_source)
+                return json.loads(entry[1])
+            self._miss(key_source)
+
+        if self.fixture_server is not None:
+            # the stand-in serves recorded results of library calls by key
+            import requests
+            response = requests.get(f"{self.fixture_server}/_calls/{key}", timeout=30)
+            response.raise_for_status()
+            value = response.json()
+        else:
+            value = compute()
+        body = json.dumps(value).encode('utf-8')
+        self.record('call', key, body, call=key_source)
+        if self.enabled:
+            self._write(key, {'call': key_source}, body)
+        return value
+
+    def memoize(self, endpoint):
+        """Decorator form of call(), keyed by the function's positional arguments"""
+        def decorator(fn):
+            def wrapper(*args):
+                return self.call(endpoint, [fn.__name__, list(args)], lambda: fn(*args))
+            wrapper.__name__ = fn.__name__
+            wrapper.__doc__ = fn.__doc__
+            return wrapper
+        return decorator
+
+    def print_stats(self):
+        mode = " (offline)" if self.offline else ""
+        print(f"http cache{mode}: {self.stats['hits']} hits, {self.stats['misses']} misses, "
+              f"{self.stats['stored']} stored in {self.cache_dir}")
+
+# shared by every script in this directory, configured from the environment or CLI flags
+HTTP_CACHE = ResponseCache.from_env()
+
+def add_cache_arguments(parser):
+    parser.add_argument("--cache-dir", default=None, help="http cache directory (default: $HTTP_CACHE_DIR or http_cache)")
+    parser.add_argument("--offline", action="store_true", help="serve only from the http cache, never the network")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the http cache")
+    parser.add_argument("--record-fixtures", default=None, metavar="ARCHIVE",
+                        help="append every response to a fixture archive for http_fixtures.py")
+    parser.add_argument("--fixture-server", default=None, metavar="URL",
+                        help="send requests to an http_fixtures.py stand-in instead of the real services")
+    return parser
+
+def configure_from_args(args):
+    HTTP_CACHE.configure(
+        cache_dir=args.cache_dir,
+        offline=True if args.offline else None,
+        enabled=False if args.no_cache else None,
+        record_path=args.record_fixtures,
+        fixture_server=args.fixture_server
+    )
@@ -0,0 +1,186 @@
+# local stand-in for steam, ign, youtube and openai that replays a recorded fixture archive
+# record once against the real services, every response the http and llm caches see goes to
+# the archive (cached ones included), then replay it as often as needed with no network:
+#   python extract_verdicts.py --record-fixtures fixtures.jsonl.gz
+#   HTTP_FIXTURE_RECORD=fixtures.jsonl.gz python ign_scrape.py
+#   python http_fixtures.py fixtures.jsonl.gz --port 8800 --latency 0.2 --rate-limit-chance 0.05 --seed 1
+#   OPENAI_BASE_URL=http://127.0.0.1:8800/v1 python extract_verdicts.py \
+#       --fixture-server http://127.0.0.1:8800 --steam-url http://127.0.0.1:8800 --no-cache --no-llm-cache
+# http responses are matched by path and query, results of library calls memoized with
+# HTTP_CACHE.call (the youtube clients) are served under /_calls/<key>, and chat completions
+# by the hash of their request body, the same key LLM_CACHE uses. a request the archive doesn't
+# have gets a 404 and is counted, injected rate limits look like the real services' 429s.
+
+import argparse
+import base64
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from build_cache import hash_json
+from http_cache import normalize_url
+
+def fixture_key(url) -> str:
+    """Path and query of a normalized url, how the stand-in matches http requests"""
+    parts = urlsplit(normalize_url(url))
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+def load_archive(path) -> dict:
+    """{(kind, key): entry} of a fixture archive, the last recording of a key wins"""
+    entries = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                entry = json.loads(line)
+                key = fixture_key(entry['key']) if entry['kind'] == 'http' else entry['key']
+                entries[(entry['kind'], key)] = entry
+        except (EOFError, ValueError):
+            # a line cut off by a crash while recording
+            pass
+    return entries
+
+class FixtureStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.served = 0
+        self.missing = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self, outcome):
+        with self.lock:
+            self.in_flight -= 1
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+def make_handler(entries, stats, latency, rate_limit_chance, retry_after, rng):
+    rng_lock = threading.Lock()
+
+    def rate_limited():
+        with rng_lock:
+            return rng.random() < rate_limit_chance
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            if path.startswith('/_calls/'):
+                self.serve(('call', path[len('/_calls/'):]), 'application/json')
+            else:
+                self.serve(('http', fixture_key('http://fixture' + self.path)), None)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))) or b'{}'
+            if not urlsplit(self.path).path.rstrip('/').endswith('/chat/completions'):
+                self.reply(404, b'', 'text/plain')
+                return
+            request = json.loads(body)
+            self.serve(('chat', hash_json(request)), None, model=request.get("model", "fixture"))
+
+        def serve(self, key, content_type, model=None):
+            stats.enter()
+            outcome = 'served'
+            try:
+                time.sleep(latency)
+                if rate_limited():
+                    outcome = 'rate_limited'
+                    self.reply_rate_limited(key[0] == 'chat')
+                    return
+
+                entry = entries.get(key)
+                if entry is None:
+                    outcome = 'missing'
+                    self.reply(404, json.dumps({"error": {"message": f"no fixture for {key[1]}"}}).encode('utf-8'),
+                               'application/json')
+                    return
+
+                body = base64.b64decode(entry['body'])
+                if key[0] == 'chat':
+                    body = json.dumps({
+                        "id": f"chatcmpl-fixture-{key[1][:12]}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": body.decode('utf-8')},
+                            "finish_reason": "stop"
+                        }],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                    }).encode('utf-8')
+                    content_type = 'application/json'
+                self.reply(entry.get('status', 200), body,
+                           content_type or entry.get('headers', {}).get('content-type') or 'application/octet-stream')
+            finally:
+                stats.leave(outcome)
+
+        def reply_rate_limited(self, chat):
+            if chat:
+                body = {"error": {"message": "Rate limit reached for requests", "type": "requests",
+                                  "code": "rate_limit_exceeded"}}
+            else:
+                body = {"error": "Too Many Requests"}
+            self.reply(429, json.dumps(body).encode('utf-8'), 'application/json', {"Retry-After": str(retry_after)})
+
+        def reply(self, status, payload, content_type, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+def serve(archive, port=8800, latency=0.0, rate_limit_chance=0.0, retry_after=1, seed=None):
+    """Start the stand-in for a fixture archive on a background thread, returns the server"""
+    entries = load_archive(archive)
+    stats = FixtureStats()
+    handler = make_handler(entries, stats, latency, rate_limit_chance, retry_after, random.Random(seed))
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.stats = stats
+    server.entries = entries
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a fixture archive as a local stand-in for the services")
+    parser.add_argument("archive", help="fixture archive written with --record-fixtures or HTTP_FIXTURE_RECORD")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every request takes")
+    parser.add_argument("--rate-limit-chance", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the injected rate limits")
+    args = parser.parse_args()
+
+    server = serve(args.archive, args.port, args.latency, args.rate_limit_chance, args.retry_after, args.seed)
+    kinds = {}
+    for kind, _ in server.entries:
+        kinds[kind] = kinds.get(kind, 0) + 1
+    print(f"replaying {', '.join(f'{count} {kind}' for kind, count in kinds.items()) or 'no'} fixtures "
+          f"on http://127.0.0.1:{args.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        stats = server.stats
+        print(f"{stats.served} served, {stats.missing} missing, {stats.rate_limited} rate limited, "
+              f"at most {stats.max_in_flight} in flight")
@@ -14,6 +14,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 from bs4 import BeautifulSoup
 import random
+from http_cache import HTTP_CACHE, OfflineCacheMiss
 
 def clean_title(raw_title):
     """Extract clean game title from raw text"""
@@ -38,10 +39,15 @@ def fetch_article_content(url, retry_count=3, base_delay=5):
     
     for attempt in range(retry_count):
         try:
-            # random delay to avoid rate limiting
-            time.sleep(random.uniform(2, 5))
-            
-            response = requests.get(url, headers=headers, timeout=15)
+            # articles fetched on an earlier run skip the network and the politeness delay
+            response = HTTP_CACHE.lookup(url)
+            if response is None:
+                # random delay to avoid rate limiting, a fixture stand-in sets its own pace
+                if HTTP_CACHE.fixture_server is None:
+                    time.sleep(random.uniform(2, 5))
+                
+                response = requests.get(HTTP_CACHE.fixture_url(url), headers=headers, timeout=15)
+                HTTP_CACHE.store(url, None, response)
             
             #if ign trys to stop me ill wait 
             if response.status_code == 429:
@@ -69,6 +75,8 @@ def fetch_article_content(url, retry_count=3, base_delay=5):
             
             return response.text
             
+        except OfflineCacheMiss as e:
+            return f"Error: {str(e)}"
         except requests.exceptions.RequestException as e:
             if attempt < retry_count - 1:
                 wait_time = base_delay * (2 ** attempt) + random.uniform(0, 1)
@@ -1,15 +1,192 @@
 import json
 import sqlite3
 import os
+import re
+import hashlib
+import pickle
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from build_cache import BuildManifest, hash_file, hash_json, hash_query
+
+# Vector modes: 'tfidf' fits vocabulary and idf over the catalog and freezes them
+# until the next reweight, 'hashing' uses a fixed feature space that never needs refitting
+VECTOR_MODES = ['tfidf', 'hashing']
+HASHING_FEATURES = 1024
+
+# Rebuild tf-idf weights once this share of the catalog was vectorized with a frozen vocabulary
+REWEIGHT_THRESHOLD = 0.25
+
+# Cached build stages, in order
+BUILD_STAGES = ['tables', 'vectors', 'summary']
+
+# Bump when the schema written by create_database_schema changes
+SCHEMA_VERSION = 3
+
+# Summaries materialized at build time and refreshed per key on upsert
+SUMMARY_TABLES = ['hierarchy_summary', 'popular_unique_tags', 'aesthetic_combinations', 'summary_counts']
+
+# Attempts at taking the live database out of WAL mode before a bulk build is swapped in,
+# readers holding it open make an attempt fail
+SWAP_ATTEMPTS = 10
+SWAP_RETRY_SECONDS = 1.0
+
+# Games per batch of inserts, new tags get their ids in this order batch by batch
+INSERT_BATCH_SIZE = 1000
+
+# Tables keyed by steam_appid that hold per-game rows derived from the JSON
+GAME_CHILD_TABLES = ['steam_tags', 'unique_tags', 'subjective_tags', 'tag_ratios', 'game_reviews', 'game_vectors']
+
+def game_content_hash(game_data):
+    """Stable hash of a game's JSON record, used to detect re-tagged games"""
+    payload = json.dumps(game_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def normalize_tag_text(tag):
+    """Lowercase, hyphen-joined form of a tag used for case-insensitive lookups"""
+    return re.sub(r'[\s_-]+', '-', tag.strip().lower())
+
+def _chunks(items, size=500):
+    """Split a list into chunks that stay under SQLite's bound parameter limit"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def build_game_rows(steam_appid, game_data):
+    """Build the row tuples for one game across all tables"""
+    # Prepare search text for full-text search
+    search_components = [
+        game_data.get('name', ''),
+        game_data.get('main_genre', ''),
+        game_data.get('sub_genre', ''),
+        game_data.get('sub_sub_genre', ''),
+        ' '.join(game_data.get('unique_tags', [])),
+        ' '.join(game_data.get('subjective_tags', []))
+    ]
+    search_text = ' '.join(filter(None, search_components)).lower()
+    
+    # Main game record
+    game_row = (
+        steam_appid,
+        game_data.get('name', ''),
+        game_data.get('steam_description', ''),
+        game_data.get('main_genre', 'unknown'),
+        game_data.get('sub_genre', 'unknown'),
+        game_data.get('sub_sub_genre', 'unknown'),
+        game_data.get('art_style', 'unknown'),
+        game_data.get('theme', 'unknown'),
+        game_data.get('music_style', 'unknown'),
+        game_data.get('processing_date', ''),
+        game_data.get('status', ''),
+        search_text,
+        game_content_hash(game_data)
+    )
+    
+    steam_tags_rows = [(steam_appid, tag, i) for i, tag in enumerate(game_data.get('steam_tags', []))]
+    unique_tags_rows = [(steam_appid, tag, i) for i, tag in enumerate(game_data.get('unique_tags', []))]
+    subjective_tags_rows = [(steam_appid, tag, i) for i, tag in enumerate(game_data.get('subjective_tags', []))]
+    tag_ratios_rows = [(steam_appid, tag, int(ratio)) for tag, ratio in game_data.get('tag_ratios', {}).items()]
+    
+    # Reviews (condensed)
+    reviews_rows = []
+    for review_type in ['general', 'art_style', 'theme', 'music', 'quality']:
+        reviews_key = f"{review_type}_reviews" if review_type != 'general' else 'reviews'
+        if reviews_key in game_data:
+            for review in game_data[reviews_key][:3]:  # Limit to top 3 reviews per type
+                reviews_rows.append((
+                    steam_appid,
+                    review_type,
+                    review.get('review', ''),
+                    review.get('voted_up', True),
+                    review.get('playtime_hours', 0),
+                    review.get('date', ''),
+                    review.get('keyword_score', 0)
+                ))
+    
+    return game_row, steam_tags_rows, unique_tags_rows, subjective_tags_rows, tag_ratios_rows, reviews_rows
+
+def game_vector_text(game):
+    """Tag text that feeds the similarity vectors"""
+    all_tags = []
+    all_tags.extend(game.get('unique_tags', []))
+    all_tags.extend(game.get('subjective_tags', []))
+    all_tags.append(game.get('theme', ''))
+    return ' '.join(filter(None, all_tags))
+
+def build_vector_rows(vectorizer, games):
+    """Transform (appid, game) pairs with an already fitted vectorizer"""
+    vectors = vectorizer.transform([game_vector_text(game) for _, game in games])
+    
+    vector_batch = []
+    for start in range(0, len(games), 500):
+        # Densify a block at a time, row-by-row toarray() is far slower
+        dense_block = vectors[start:start + 500].toarray()
+        for (appid, _), vector_dense in zip(games[start:start + 500], dense_block):
+            vector_batch.append((appid, vector_dense.tobytes(), len(vector_dense)))
+    return vector_batch
+
+def collect_game_batches(games):
+    """Group the rows of several (appid, game) pairs into one batch per table"""
+    batches = [[], [], [], [], [], []]
+    for appid, game_data in games:
+        rows = build_game_rows(appid, game_data)
+        batches[0].append(rows[0])
+        for batch, table_rows in zip(batches[1:], rows[1:]):
+            batch.extend(table_rows)
+    return batches
+
+# Vectorizer shared by the build worker processes, set once per process
+_worker_vectorizer = None
+
+def _init_build_worker(vectorizer):
+    global _worker_vectorizer
+    _worker_vectorizer = vectorizer
+
+def prepare_game_batch(games):
+    """Worker task: table rows and vectors for a chunk of (appid, game) pairs"""
+    return collect_game_batches(games), build_vector_rows(_worker_vectorizer, games)
 
 class HierarchicalDatabaseConverter:
-    def __init__(self, json_file_path, db_file_path):
+    def __init__(self, json_file_path, db_file_path, vectorizer_path='hierarchical_vectorizer.pkl', vector_mode='tfidf'):
         self.json_file_path = json_file_path
         self.db_file_path = db_file_path
+        self.vectorizer_path = vectorizer_path
+        self.vector_mode = vector_mode
         self.games_data = {}
+        self.bulk_load = False
+        self.stage_timings = []
+        self.tag_ids = {}  # (kind, tag) -> tags.id for the current database
+    
+    def _connect(self):
+        self.tag_ids = {}
+        conn = sqlite3.connect(self.db_file_path)
+        if self.bulk_load:
+            # Nothing reads the file until it is renamed into place, so skip durability
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-200000")
+        return conn
+    
+    @contextmanager
+    def timed_stage(self, name):
+        """Record how long a build stage took"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_timings.append((name, time.perf_counter() - start))
+    
+    def print_stage_timings(self):
+        total = sum(seconds for _, seconds in self.stage_timings)
+        print("\n⏱️ BUILD STAGE TIMINGS:")
+        for name, seconds in self.stage_timings:
+            share = (seconds / total * 100) if total else 0
+            print(f"   {name:<12} {seconds:8.2f}s  ({share:4.1f}%)")
+        print(f"   {'total':<12} {total:8.2f}s")
         
     def load_json_data(self):
         """Load the hierarchical JSON data"""
@@ -21,7 +198,7 @@ class HierarchicalDatabaseConverter:
         print(f"✅ Loaded {len(self.games_data)} games")
         return True
     
-    def create_database_schema(self):
+    def create_database_schema(self, create_indexes=True):
         """Create the SQLite database schema"""
         print(f"Creating database schema in {self.db_file_path}...")
         
@@ -30,7 +207,7 @@ class HierarchicalDatabaseConverter:
             os.remove(self.db_file_path)
             print(f"🗑️ Removed existing database")
         
-        conn = sqlite3.connect(self.db_file_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Main games table with hierarchical structure
@@ -59,53 +236,71 @@ class HierarchicalDatabaseConverter:
             -- Search optimization
             search_text TEXT, -- For full-text search
             
+            -- Incremental builds
+            content_hash TEXT, -- Hash of the source JSON record
+            
             -- Indexes will be created separately
             FOREIGN KEY (steam_appid) REFERENCES steam_tags(steam_appid)
         );
         """)
         
+        # Tag dictionary, every tag table references these ids
+        cursor.execute("""
+        CREATE TABLE tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL, -- 'steam', 'unique', 'subjective', 'ratio'
+            tag TEXT NOT NULL,
+            normalized TEXT NOT NULL, -- Lowercase, hyphen-joined form for lookups
+            UNIQUE (kind, tag)
+        );
+        """)
+        
         # Steam tags table (original Steam tags)
         cursor.execute("""
         CREATE TABLE steam_tags (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
             steam_appid INTEGER NOT NULL,
-            tag TEXT NOT NULL,
+            tag_id INTEGER NOT NULL,
             tag_order INTEGER, -- Order in the original tags list
-            FOREIGN KEY (steam_appid) REFERENCES games(steam_appid)
-        );
+            PRIMARY KEY (steam_appid, tag_id),
+            FOREIGN KEY (steam_appid) REFERENCES games(steam_appid),
+            FOREIGN KEY (tag_id) REFERENCES tags(id)
+        ) WITHOUT ROWID;
         """)
         
         # Unique gameplay tags
         cursor.execute("""
         CREATE TABLE unique_tags (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
             steam_appid INTEGER NOT NULL,
-            tag TEXT NOT NULL,
+            tag_id INTEGER NOT NULL,
             tag_order INTEGER,
-            FOREIGN KEY (steam_appid) REFERENCES games(steam_appid)
-        );
+            PRIMARY KEY (steam_appid, tag_id),
+            FOREIGN KEY (steam_appid) REFERENCES games(steam_appid),
+            FOREIGN KEY (tag_id) REFERENCES tags(id)
+        ) WITHOUT ROWID;
         """)
         
         # Subjective quality tags
         cursor.execute("""
         CREATE TABLE subjective_tags (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
             steam_appid INTEGER NOT NULL,
-            tag TEXT NOT NULL,
+            tag_id INTEGER NOT NULL,
             tag_order INTEGER,
-            FOREIGN KEY (steam_appid) REFERENCES games(steam_appid)
-        );
+            PRIMARY KEY (steam_appid, tag_id),
+            FOREIGN KEY (steam_appid) REFERENCES games(steam_appid),
+            FOREIGN KEY (tag_id) REFERENCES tags(id)
+        ) WITHOUT ROWID;
         """)
         
         # Tag ratios (gameplay element percentages)
         cursor.execute("""
         CREATE TABLE tag_ratios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
             steam_appid INTEGER NOT NULL,
-            tag TEXT NOT NULL,
+            tag_id INTEGER NOT NULL,
             ratio INTEGER NOT NULL, -- Percentage 0-100
-            FOREIGN KEY (steam_appid) REFERENCES games(steam_appid)
-        );
+            PRIMARY KEY (steam_appid, tag_id),
+            FOREIGN KEY (steam_appid) REFERENCES games(steam_appid),
+            FOREIGN KEY (tag_id) REFERENCES tags(id)
+        ) WITHOUT ROWID;
         """)
         
         # Reviews data (condensed from original reviews)
@@ -123,6 +318,14 @@ class HierarchicalDatabaseConverter:
         );
         """)
         
+        # Build bookkeeping (vector mode, how stale the tf-idf weights are)
+        cursor.execute("""
+        CREATE TABLE build_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        """)
+        
         # Vector embeddings for similarity search
         cursor.execute("""
         CREATE TABLE game_vectors (
@@ -134,7 +337,22 @@ class HierarchicalDatabaseConverter:
         );
         """)
         
-        # Create indexes for fast querying
+        # Full-text search (if SQLite supports it)
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE games_fts USING fts5(name, search_text, content='games', content_rowid='id');")
+            print("✅ Created FTS5 virtual table for full-text search")
+        except sqlite3.OperationalError:
+            print("⚠️ FTS5 not available, using regular indexes")
+        
+        if create_indexes:
+            self._create_indexes(cursor)
+        
+        conn.commit()
+        conn.close()
+        print("✅ Database schema created successfully")
+    
+    def _create_indexes(self, cursor):
+        """Create indexes for fast querying"""
         print("Creating indexes...")
         
         # Hierarchy indexes
@@ -148,14 +366,12 @@ class HierarchicalDatabaseConverter:
         cursor.execute("CREATE INDEX idx_games_theme ON games(theme);")
         cursor.execute("CREATE INDEX idx_games_music_style ON games(music_style);")
         
-        # Tag indexes
-        cursor.execute("CREATE INDEX idx_steam_tags_appid ON steam_tags(steam_appid);")
-        cursor.execute("CREATE INDEX idx_steam_tags_tag ON steam_tags(tag);")
-        cursor.execute("CREATE INDEX idx_unique_tags_appid ON unique_tags(steam_appid);")
-        cursor.execute("CREATE INDEX idx_unique_tags_tag ON unique_tags(tag);")
-        cursor.execute("CREATE INDEX idx_subjective_tags_appid ON subjective_tags(steam_appid);")
-        cursor.execute("CREATE INDEX idx_subjective_tags_tag ON subjective_tags(tag);")
-        cursor.execute("CREATE INDEX idx_tag_ratios_appid ON tag_ratios(steam_appid);")
+        # Tag indexes, (steam_appid, tag_id) is covered by each table's primary key
+        cursor.execute("CREATE INDEX idx_tags_normalized ON tags(normalized);")
+        cursor.execute("CREATE INDEX idx_steam_tags_tag ON steam_tags(tag_id, steam_appid);")
+        cursor.execute("CREATE INDEX idx_unique_tags_tag ON unique_tags(tag_id, steam_appid);")
+        cursor.execute("CREATE INDEX idx_subjective_tags_tag ON subjective_tags(tag_id, steam_appid);")
+        cursor.execute("CREATE INDEX idx_tag_ratios_tag ON tag_ratios(tag_id, steam_appid);")
         
         # Review indexes
         cursor.execute("CREATE INDEX idx_reviews_appid ON game_reviews(steam_appid);")
@@ -164,26 +380,24 @@ class HierarchicalDatabaseConverter:
         # Search index
         cursor.execute("CREATE INDEX idx_games_search ON games(search_text);")
         cursor.execute("CREATE INDEX idx_games_name ON games(name);")
-        
-        # Full-text search (if SQLite supports it)
-        try:
-            cursor.execute("CREATE VIRTUAL TABLE games_fts USING fts5(name, search_text, content='games', content_rowid='id');")
-            print("✅ Created FTS5 virtual table for full-text search")
-        except sqlite3.OperationalError:
-            print("⚠️ FTS5 not available, using regular indexes")
-        
+    
+    def create_indexes(self):
+        """Create indexes on an already loaded database and refresh planner statistics"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        self._create_indexes(cursor)
+        cursor.execute("ANALYZE")
         conn.commit()
         conn.close()
-        print("✅ Database schema created successfully")
+        print("✅ Created indexes and ran ANALYZE")
     
     def insert_game_data(self):
         """Insert all game data into the database"""
         print("Inserting game data...")
         
-        conn = sqlite3.connect(self.db_file_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        batch_size = 1000
         game_count = 0
         
         # Prepare batch inserts
@@ -195,70 +409,18 @@ class HierarchicalDatabaseConverter:
         reviews_batch = []
         
         for appid, game_data in self.games_data.items():
-            steam_appid = int(appid)
-            
-            # Prepare search text for full-text search
-            search_components = [
-                game_data.get('name', ''),
-                game_data.get('main_genre', ''),
-                game_data.get('sub_genre', ''),
-                game_data.get('sub_sub_genre', ''),
-                ' '.join(game_data.get('unique_tags', [])),
-                ' '.join(game_data.get('subjective_tags', []))
-            ]
-            search_text = ' '.join(filter(None, search_components)).lower()
-            
-            # Main game record
-            games_batch.append((
-                steam_appid,
-                game_data.get('name', ''),
-                game_data.get('steam_description', ''),
-                game_data.get('main_genre', 'unknown'),
-                game_data.get('sub_genre', 'unknown'),
-                game_data.get('sub_sub_genre', 'unknown'),
-                game_data.get('art_style', 'unknown'),
-                game_data.get('theme', 'unknown'),
-                game_data.get('music_style', 'unknown'),
-                game_data.get('processing_date', ''),
-                game_data.get('status', ''),
-                search_text
-            ))
-            
-            # Steam tags
-            for i, tag in enumerate(game_data.get('steam_tags', [])):
-                steam_tags_batch.append((steam_appid, tag, i))
-            
-            # Unique tags
-            for i, tag in enumerate(game_data.get('unique_tags', [])):
-                unique_tags_batch.append((steam_appid, tag, i))
-            
-            # Subjective tags
-            for i, tag in enumerate(game_data.get('subjective_tags', [])):
-                subjective_tags_batch.append((steam_appid, tag, i))
-            
-            # Tag ratios
-            for tag, ratio in game_data.get('tag_ratios', {}).items():
-                tag_ratios_batch.append((steam_appid, tag, int(ratio)))
-            
-            # Reviews (condensed)
-            for review_type in ['general', 'art_style', 'theme', 'music', 'quality']:
-                reviews_key = f"{review_type}_reviews" if review_type != 'general' else 'reviews'
-                if reviews_key in game_data:
-                    for review in game_data[reviews_key][:3]:  # Limit to top 3 reviews per type
-                        reviews_batch.append((
-                            steam_appid,
-                            review_type,
-                            review.get('review', ''),
-                            review.get('voted_up', True),
-                            review.get('playtime_hours', 0),
-                            review.get('date', ''),
-                            review.get('keyword_score', 0)
-                        ))
+            rows = build_game_rows(int(appid), game_data)
+            games_batch.append(rows[0])
+            steam_tags_batch.extend(rows[1])
+            unique_tags_batch.extend(rows[2])
+            subjective_tags_batch.extend(rows[3])
+            tag_ratios_batch.extend(rows[4])
+            reviews_batch.extend(rows[5])
             
             game_count += 1
             
             # Batch insert when we hit the batch size
-            if game_count % batch_size == 0:
+            if game_count % INSERT_BATCH_SIZE == 0:
                 self._execute_batch_inserts(cursor, games_batch, steam_tags_batch, 
                                           unique_tags_batch, subjective_tags_batch, 
                                           tag_ratios_batch, reviews_batch)
@@ -279,10 +441,24 @@ class HierarchicalDatabaseConverter:
                                       unique_tags_batch, subjective_tags_batch, 
                                       tag_ratios_batch, reviews_batch)
         
+        self._rebuild_fts(cursor)
+        
         conn.commit()
         conn.close()
         print(f"✅ Inserted {game_count} games successfully")
     
+    def _table_exists(self, cursor, name):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+        return cursor.fetchone() is not None
+    
+    def _has_fts(self, cursor):
+        return self._table_exists(cursor, 'games_fts')
+    
+    def _rebuild_fts(self, cursor):
+        """Repopulate the external-content FTS index from the games table"""
+        if self._has_fts(cursor):
+            cursor.execute("INSERT INTO games_fts(games_fts) VALUES('rebuild')")
+    
     def _execute_batch_inserts(self, cursor, games_batch, steam_tags_batch, 
                               unique_tags_batch, subjective_tags_batch, 
                               tag_ratios_batch, reviews_batch):
@@ -290,37 +466,39 @@ class HierarchicalDatabaseConverter:
         
         # Insert games
         cursor.executemany("""
-        INSERT OR REPLACE INTO games 
+        INSERT INTO games 
         (steam_appid, name, steam_description, main_genre, sub_genre, sub_sub_genre,
-         art_style, theme, music_style, processing_date, status, search_text)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+         art_style, theme, music_style, processing_date, status, search_text, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(steam_appid) DO UPDATE SET
+            name = excluded.name,
+            steam_description = excluded.steam_description,
+            main_genre = excluded.main_genre,
+            sub_genre = excluded.sub_genre,
+            sub_sub_genre = excluded.sub_sub_genre,
+            art_style = excluded.art_style,
+            theme = excluded.theme,
+            music_style = excluded.music_style,
+            processing_date = excluded.processing_date,
+            status = excluded.status,
+            search_text = excluded.search_text,
+            content_hash = excluded.content_hash
         """, games_batch)
         
-        # Insert steam tags
-        if steam_tags_batch:
-            cursor.executemany("""
-            INSERT INTO steam_tags (steam_appid, tag, tag_order)
-            VALUES (?, ?, ?)
-            """, steam_tags_batch)
-        
-        # Insert unique tags
-        if unique_tags_batch:
-            cursor.executemany("""
-            INSERT INTO unique_tags (steam_appid, tag, tag_order)
-            VALUES (?, ?, ?)
-            """, unique_tags_batch)
-        
-        if subjective_tags_batch:
-            cursor.executemany("""
-            INSERT INTO subjective_tags (steam_appid, tag, tag_order)
-            VALUES (?, ?, ?)
-            """, subjective_tags_batch)
-        
-        if tag_ratios_batch:
-            cursor.executemany("""
-            INSERT INTO tag_ratios (steam_appid, tag, ratio)
-            VALUES (?, ?, ?)
-            """, tag_ratios_batch)
+        # Insert tag rows, swapping tag text for dictionary ids. A tag repeated
+        # in one game's list keeps its first position.
+        for table, kind, value_column, batch in [
+            ('steam_tags', 'steam', 'tag_order', steam_tags_batch),
+            ('unique_tags', 'unique', 'tag_order', unique_tags_batch),
+            ('subjective_tags', 'subjective', 'tag_order', subjective_tags_batch),
+            ('tag_ratios', 'ratio', 'ratio', tag_ratios_batch)
+        ]:
+            if batch:
+                tag_ids = self._resolve_tag_ids(cursor, kind, [row[1] for row in batch])
+                cursor.executemany(f"""
+                INSERT OR IGNORE INTO {table} (steam_appid, tag_id, {value_column})
+                VALUES (?, ?, ?)
+                """, [(row[0], tag_ids[row[1]], row[2]) for row in batch])
         
         if reviews_batch:
             cursor.executemany("""
@@ -329,116 +507,595 @@ class HierarchicalDatabaseConverter:
             VALUES (?, ?, ?, ?, ?, ?, ?)
             """, reviews_batch)
     
-    def build_and_store_vectors(self):
-        """Build TF-IDF vectors and store them in the database"""
-        print("Building and storing similarity vectors...")
-        
-        game_tag_texts = []
-        game_appids = []
-        
-        for appid, game in self.games_data.items():
-            all_tags = []
-            all_tags.extend(game.get('unique_tags', []))
-            all_tags.extend(game.get('subjective_tags', []))
-            all_tags.append(game.get('theme', ''))
+    def _resolve_tag_ids(self, cursor, kind, tags):
+        """Map tag text to dictionary ids, adding any tags not seen before"""
+        # first-seen order rather than a set's, which changes with the hash seed
+        missing = [tag for tag in dict.fromkeys(tags) if (kind, tag) not in self.tag_ids]
+        if missing:
+            cursor.executemany("""
+            INSERT OR IGNORE INTO tags (kind, tag, normalized)
+            VALUES (?, ?, ?)
+            """, [(kind, tag, normalize_tag_text(tag)) for tag in missing])
             
-            tag_text = ' '.join(filter(None, all_tags))
-            game_tag_texts.append(tag_text)
-            game_appids.append(int(appid))
+            for chunk in _chunks(missing):
+                placeholders = ','.join('?' for _ in chunk)
+                cursor.execute(f"SELECT tag, id FROM tags WHERE kind = ? AND tag IN ({placeholders})",
+                               [kind] + chunk)
+                for tag, tag_id in cursor.fetchall():
+                    self.tag_ids[(kind, tag)] = tag_id
+        
+        return {tag: self.tag_ids[(kind, tag)] for tag in tags}
+    
+    def _vector_rows(self, vectorizer, appids):
+        """Transform the given games with an already fitted vectorizer"""
+        return build_vector_rows(vectorizer, [(appid, self.games_data[str(appid)]) for appid in appids])
+    
+    def _insert_vectors(self, cursor, vector_batch):
+        cursor.executemany("""
+        INSERT INTO game_vectors (steam_appid, vector_data, vector_dimension)
+        VALUES (?, ?, ?)
+        """, vector_batch)
+    
+    def _fit_vectorizer(self):
+        """Fit the TF-IDF vectorizer over the whole catalog, hashing mode needs no fit"""
+        if self.vector_mode == 'hashing':
+            return HashingVectorizer(
+                lowercase=True,
+                token_pattern=r'[a-zA-Z-]+',
+                ngram_range=(1, 2),
+                n_features=HASHING_FEATURES,
+                alternate_sign=False,
+                norm='l2'
+            )
         
-        # Build TF-IDF vectors
         vectorizer = TfidfVectorizer(
             lowercase=True,
             token_pattern=r'[a-zA-Z-]+',
             ngram_range=(1, 2),
             max_features=1000
         )
+        vectorizer.fit([game_vector_text(game) for game in self.games_data.values()])
+        return vectorizer
+    
+    def _save_vectorizer(self, vectorizer):
+        """Save vectorizer for later use"""
+        tmp_path = self.vectorizer_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(vectorizer, f)
+        os.replace(tmp_path, self.vectorizer_path)
+        print(f"💾 Saved vectorizer to {self.vectorizer_path}")
+    
+    def _vector_mode_of(self, vectorizer):
+        return 'hashing' if isinstance(vectorizer, HashingVectorizer) else 'tfidf'
+    
+    def _set_build_meta(self, cursor, **values):
+        cursor.execute("CREATE TABLE IF NOT EXISTS build_meta (key TEXT PRIMARY KEY, value TEXT)")
+        cursor.executemany("INSERT OR REPLACE INTO build_meta (key, value) VALUES (?, ?)",
+                           [(key, str(value)) for key, value in values.items()])
+    
+    def _get_build_meta(self, cursor, key, default=None):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'build_meta'")
+        if cursor.fetchone() is None:
+            return default
+        cursor.execute("SELECT value FROM build_meta WHERE key = ?", (key,))
+        row = cursor.fetchone()
+        return row[0] if row else default
+    
+    def _record_vector_fit(self, cursor):
+        self._set_build_meta(cursor, vector_mode=self.vector_mode,
+                             vectors_fitted_on=len(self.games_data), vectors_appended=0)
+    
+    def build_and_store_vectors(self):
+        """Build TF-IDF vectors and store them in the database.
+        
+        This is also the scheduled reweighting job: it refits vocabulary and idf
+        over the whole catalog and rewrites every vector in one transaction.
+        """
+        print(f"Building and storing similarity vectors ({self.vector_mode})...")
         
-        vectors = vectorizer.fit_transform(game_tag_texts)
+        vectorizer = self._fit_vectorizer()
+        vector_batch = self._vector_rows(vectorizer, [int(appid) for appid in self.games_data])
         
         # Store vectors in database
-        conn = sqlite3.connect(self.db_file_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        vector_batch = []
-        for i, appid in enumerate(game_appids):
-            vector_dense = vectors[i].toarray()[0]
-            vector_blob = vector_dense.tobytes()
-            
-            vector_batch.append((
-                appid,
-                vector_blob,
-                len(vector_dense)
-            ))
-        
-        cursor.executemany("""
-        INSERT INTO game_vectors (steam_appid, vector_data, vector_dimension)
-        VALUES (?, ?, ?)
-        """, vector_batch)
+        cursor.execute("DELETE FROM game_vectors")
+        self._insert_vectors(cursor, vector_batch)
+        self._record_vector_fit(cursor)
         
         conn.commit()
         conn.close()
         
-        # Save vectorizer for later use
-        import pickle
-        with open('hierarchical_vectorizer.pkl', 'wb') as f:
-            pickle.dump(vectorizer, f)
-        
         print(f"✅ Stored {len(vector_batch)} vectors in database")
-        print("💾 Saved vectorizer to hierarchical_vectorizer.pkl")
+        self._save_vectorizer(vectorizer)
+    
+    def parallel_insert_and_vectorize(self, workers, chunk_size=250):
+        """Insert games and vectors with worker processes preparing the batches.
+        
+        Workers build row tuples and transform vectors for chunks of games while
+        this process is the single SQLite writer, streaming results in input order.
+        Rows are written in the same INSERT_BATCH_SIZE batches as insert_game_data,
+        so rowids and tag ids come out the same as in a serial build as long as
+        chunk_size divides INSERT_BATCH_SIZE.
+        """
+        print(f"Inserting game data and vectors with {workers} worker processes...")
+        
+        vectorizer = self._fit_vectorizer()
+        games = [(int(appid), game) for appid, game in self.games_data.items()]
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        game_count = 0
+        pending = [[], [], [], [], [], []]
+        pending_games = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_build_worker,
+                                 initargs=(vectorizer,)) as executor:
+            for batches, vector_batch in executor.map(prepare_game_batch, _chunks(games, chunk_size)):
+                for rows, batch in zip(pending, batches):
+                    rows.extend(batch)
+                pending_games += len(vector_batch)
+                if pending_games >= INSERT_BATCH_SIZE:
+                    self._execute_batch_inserts(cursor, *pending)
+                    pending = [[], [], [], [], [], []]
+                    pending_games = 0
+                
+                self._insert_vectors(cursor, vector_batch)
+                game_count += len(vector_batch)
+        
+        if pending_games:
+            self._execute_batch_inserts(cursor, *pending)
+        
+        self._rebuild_fts(cursor)
+        self._record_vector_fit(cursor)
+        
+        conn.commit()
+        conn.close()
+        
+        print(f"✅ Inserted {game_count} games and vectors successfully")
+        self._save_vectorizer(vectorizer)
     
-    def create_summary_views(self):
-        """Create useful views for quick queries"""
-        print("Creating summary views...")
+    def reweight_vectors(self):
+        """Explicit job: refit vectors over the current catalog in the existing database"""
+        conn = sqlite3.connect(self.db_file_path)
+        cursor = conn.cursor()
+        previous = self._get_build_meta(cursor, 'vectors_appended', 0)
+        conn.close()
         
+        print(f"Reweighting vectors ({previous} games appended since the last fit)...")
+        self.build_and_store_vectors()
+    
+    def _load_vectorizer(self):
+        try:
+            with open(self.vectorizer_path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def schema_is_current(self):
+        """Whether the existing database has the schema this converter writes"""
         conn = sqlite3.connect(self.db_file_path)
         cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('tags', 'summary_counts')")
+        current = cursor.fetchone()[0] == 2
+        conn.close()
+        return current
+    
+    def incremental_update(self):
+        """Upsert only games whose JSON changed since the last build and drop removed games.
+        
+        Everything happens in one transaction on a WAL database, so readers such as
+        app.py keep seeing the previous snapshot until the commit.
+        """
+        print(f"Diffing {self.json_file_path} against {self.db_file_path}...")
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
+        cursor.execute("PRAGMA table_info(games)")
+        if 'content_hash' not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE games ADD COLUMN content_hash TEXT")
+        
+        cursor.execute("SELECT steam_appid, content_hash FROM games")
+        existing_hashes = {row[0]: row[1] for row in cursor.fetchall()}
         
-        # Hierarchy summary view
+        changed = [int(appid) for appid, game_data in self.games_data.items()
+                   if existing_hashes.get(int(appid)) != game_content_hash(game_data)]
+        removed = [appid for appid in existing_hashes if str(appid) not in self.games_data]
+        
+        print(f"   {len(changed)} new/changed, {len(removed)} removed, "
+              f"{len(self.games_data) - len(changed)} unchanged")
+        
+        if not changed and not removed:
+            conn.close()
+            print("✅ Database already up to date")
+            return {'changed': [], 'removed': []}
+        
+        # Vectors of changed games are written with the saved vectorizer so the
+        # rest of the catalog keeps its weights. A mode switch needs a full rewrite.
+        vectorizer = self._load_vectorizer()
+        if vectorizer is not None and self._vector_mode_of(vectorizer) != self.vector_mode:
+            print(f"⚠️ Saved vectorizer is {self._vector_mode_of(vectorizer)}, rewriting all vectors as {self.vector_mode}")
+            vectorizer = None
+        has_fts = self._has_fts(cursor)
+        
+        # Databases built before the FTS index was populated need one full rebuild
+        fts_in_sync = False
+        if has_fts:
+            cursor.execute("SELECT (SELECT COUNT(*) FROM games_fts_docsize) = (SELECT COUNT(*) FROM games)")
+            fts_in_sync = bool(cursor.fetchone()[0])
+        
+        try:
+            cursor.execute("BEGIN")
+            
+            affected = changed + removed
+            has_summaries = self._table_exists(cursor, 'summary_counts')
+            if has_summaries:
+                old_keys = self._summary_keys(cursor, affected)
+            
+            for chunk in _chunks(affected):
+                placeholders = ','.join('?' for _ in chunk)
+                
+                # Drop the old FTS entries while the old column values are still there
+                if fts_in_sync:
+                    cursor.execute(f"""
+                    INSERT INTO games_fts(games_fts, rowid, name, search_text)
+                    SELECT 'delete', id, name, search_text FROM games WHERE steam_appid IN ({placeholders})
+                    """, chunk)
+                
+                for table in GAME_CHILD_TABLES:
+                    cursor.execute(f"DELETE FROM {table} WHERE steam_appid IN ({placeholders})", chunk)
+            
+            for chunk in _chunks(removed):
+                placeholders = ','.join('?' for _ in chunk)
+                cursor.execute(f"DELETE FROM games WHERE steam_appid IN ({placeholders})", chunk)
+            
+            for chunk in _chunks(changed):
+                self._execute_batch_inserts(cursor, *collect_game_batches(
+                    [(appid, self.games_data[str(appid)]) for appid in chunk]))
+                
+                placeholders = ','.join('?' for _ in chunk)
+                if fts_in_sync:
+                    cursor.execute(f"""
+                    INSERT INTO games_fts(rowid, name, search_text)
+                    SELECT id, name, search_text FROM games WHERE steam_appid IN ({placeholders})
+                    """, chunk)
+                
+                if vectorizer is not None:
+                    self._insert_vectors(cursor, self._vector_rows(vectorizer, chunk))
+            
+            if has_fts and not fts_in_sync:
+                self._rebuild_fts(cursor)
+            
+            # Only the summary rows the old and new versions of these games fall into
+            if has_summaries:
+                new_keys = self._summary_keys(cursor, changed)
+                self._refresh_summary_tables(cursor, *(old | new for old, new in zip(old_keys, new_keys)))
+            
+            appended = 0
+            if vectorizer is not None and self.vector_mode == 'tfidf':
+                appended = int(self._get_build_meta(cursor, 'vectors_appended', 0)) + len(changed)
+                self._set_build_meta(cursor, vectors_appended=appended)
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        if vectorizer is None:
+            print("⚠️ No usable saved vectorizer, rebuilding all vectors")
+            self.build_and_store_vectors()
+        elif appended > REWEIGHT_THRESHOLD * len(self.games_data):
+            print(f"💡 {appended} games were vectorized with frozen tf-idf weights, "
+                  f"consider running the reweight job (--reweight)")
+        
+        print(f"✅ Upserted {len(changed)} games, removed {len(removed)} games")
+        return {'changed': changed, 'removed': removed}
+    
+    def bulk_build(self, workers=0):
+        """Build a fresh database in a temporary file and atomically swap it into place.
+        
+        Indexes are created only after all rows are loaded, so the inserts don't
+        maintain every B-tree, and the live database stays untouched until the rename.
+        With workers > 0 the insert and vector stages run as one parallel stage.
+        """
+        live_path = self.db_file_path
+        build_path = live_path + '.building'
+        
+        if os.path.exists(build_path):
+            os.remove(build_path)
+        
+        self.db_file_path = build_path
+        self.bulk_load = True
+        try:
+            with self.timed_stage('schema'):
+                self.create_database_schema(create_indexes=False)
+            if workers:
+                with self.timed_stage('insert+vec'):
+                    self.parallel_insert_and_vectorize(workers)
+            else:
+                with self.timed_stage('insert'):
+                    self.insert_game_data()
+                with self.timed_stage('vectors'):
+                    self.build_and_store_vectors()
+            with self.timed_stage('summary'):
+                self.create_summary_tables()
+            with self.timed_stage('indexes'):
+                self.create_indexes()
+        finally:
+            self.db_file_path = live_path
+            self.bulk_load = False
+        
+        with self.timed_stage('swap'):
+            if os.path.exists(live_path):
+                self.release_wal(live_path)
+            os.replace(build_path, live_path)
+        
+        print(f"✅ Swapped new database into {live_path}")
+    
+    def release_wal(self, path):
+        """Fully checkpoint `path` and switch it to journal_mode=DELETE.
+        
+        A -wal/-shm left next to the database would be applied to the file renamed over it,
+        so the swap is aborted when readers keep the checkpoint from finishing.
+        """
+        for attempt in range(SWAP_ATTEMPTS):
+            conn = sqlite3.connect(path, timeout=SWAP_RETRY_SECONDS)
+            try:
+                busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+                if not busy and log_frames in (-1, checkpointed):
+                    mode = conn.execute("PRAGMA journal_mode=DELETE").fetchone()[0]
+                    if mode == 'delete' and not os.path.exists(path + '-wal'):
+                        return
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                conn.close()
+            print(f"⚠️ {path} is busy, retrying the checkpoint ({attempt + 1}/{SWAP_ATTEMPTS})")
+            time.sleep(SWAP_RETRY_SECONDS)
+        raise RuntimeError(f"could not checkpoint {path} while readers hold it open, "
+                           f"the new database was left in {path}.building")
+    
+    def create_summary_tables(self):
+        """Create the materialized summary tables and fill them from scratch"""
+        print("Creating summary tables...")
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        # Databases from before the summaries were materialized have views here
+        for name in SUMMARY_TABLES:
+            cursor.execute(f"DROP VIEW IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {name}")
+        
+        # Hierarchy summary
         cursor.execute("""
-        CREATE VIEW hierarchy_summary AS
-        SELECT 
-            main_genre,
-            sub_genre,
-            sub_sub_genre,
-            COUNT(*) as game_count,
-            GROUP_CONCAT(name, ', ') as sample_games
-        FROM games
-        GROUP BY main_genre, sub_genre, sub_sub_genre
-        ORDER BY game_count DESC;
+        CREATE TABLE hierarchy_summary (
+            main_genre TEXT NOT NULL,
+            sub_genre TEXT NOT NULL,
+            sub_sub_genre TEXT NOT NULL,
+            game_count INTEGER NOT NULL,
+            sample_games TEXT,
+            PRIMARY KEY (main_genre, sub_genre, sub_sub_genre)
+        );
         """)
         
-        # Popular tags view
+        # Popular tags
         cursor.execute("""
-        CREATE VIEW popular_unique_tags AS
-        SELECT 
-            tag,
-            COUNT(*) as usage_count,
-            GROUP_CONCAT(DISTINCT g.name, ', ') as sample_games
-        FROM unique_tags ut
-        JOIN games g ON ut.steam_appid = g.steam_appid
-        GROUP BY tag
-        ORDER BY usage_count DESC;
+        CREATE TABLE popular_unique_tags (
+            tag_id INTEGER PRIMARY KEY,
+            tag TEXT NOT NULL,
+            usage_count INTEGER NOT NULL,
+            sample_games TEXT
+        );
         """)
         
-        # Aesthetic combinations view
+        # Aesthetic combinations
         cursor.execute("""
-        CREATE VIEW aesthetic_combinations AS
-        SELECT 
-            art_style,
-            theme,
-            music_style,
-            COUNT(*) as game_count,
-            GROUP_CONCAT(name, ', ') as sample_games
-        FROM games
-        WHERE art_style != 'unknown' AND theme != 'unknown' AND music_style != 'unknown'
-        GROUP BY art_style, theme, music_style
-        ORDER BY game_count DESC;
+        CREATE TABLE aesthetic_combinations (
+            art_style TEXT NOT NULL,
+            theme TEXT NOT NULL,
+            music_style TEXT NOT NULL,
+            game_count INTEGER NOT NULL,
+            sample_games TEXT,
+            PRIMARY KEY (art_style, theme, music_style)
+        );
+        """)
+        
+        # Table sizes served by /debug/stats
+        cursor.execute("""
+        CREATE TABLE summary_counts (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
         """)
         
+        cursor.execute("CREATE INDEX idx_hierarchy_summary_count ON hierarchy_summary(game_count DESC);")
+        cursor.execute("CREATE INDEX idx_popular_unique_tags_count ON popular_unique_tags(usage_count DESC);")
+        cursor.execute("CREATE INDEX idx_aesthetic_combinations_count ON aesthetic_combinations(game_count DESC);")
+        
+        self._refresh_summary_tables(cursor)
+        
         conn.commit()
         conn.close()
-        print("✅ Created summary views")
+        print("✅ Created summary tables")
+    
+    def _summary_keys(self, cursor, appids):
+        """Summary rows a set of games contributes to, used before and after an upsert"""
+        hierarchy_keys, aesthetic_keys, tag_ids = set(), set(), set()
+        for chunk in _chunks(appids):
+            placeholders = ','.join('?' for _ in chunk)
+            cursor.execute(f"""
+            SELECT main_genre, sub_genre, sub_sub_genre, art_style, theme, music_style
+            FROM games WHERE steam_appid IN ({placeholders})
+            """, chunk)
+            for row in cursor.fetchall():
+                hierarchy_keys.add(row[:3])
+                aesthetic_keys.add(row[3:])
+            
+            cursor.execute(f"SELECT tag_id FROM unique_tags WHERE steam_appid IN ({placeholders})", chunk)
+            tag_ids.update(row[0] for row in cursor.fetchall())
+        return hierarchy_keys, aesthetic_keys, tag_ids
+    
+    def _refresh_summary_tables(self, cursor, hierarchy_keys=None, aesthetic_keys=None, tag_ids=None):
+        """Recompute summary rows, only for the given keys when they are passed"""
+        hierarchy_select = """
+        SELECT main_genre, sub_genre, sub_sub_genre, COUNT(*), GROUP_CONCAT(name, ', ')
+        FROM games
+        {where}
+        GROUP BY main_genre, sub_genre, sub_sub_genre
+        """
+        aesthetic_select = """
+        SELECT art_style, theme, music_style, COUNT(*), GROUP_CONCAT(name, ', ')
+        FROM games
+        WHERE art_style != 'unknown' AND theme != 'unknown' AND music_style != 'unknown' {where}
+        GROUP BY art_style, theme, music_style
+        """
+        tags_select = """
+        SELECT ut.tag_id, t.tag, COUNT(*), GROUP_CONCAT(g.name, ', ')
+        FROM unique_tags ut
+        JOIN tags t ON ut.tag_id = t.id
+        JOIN games g ON ut.steam_appid = g.steam_appid
+        {where}
+        GROUP BY ut.tag_id
+        """
+        
+        if hierarchy_keys is None:
+            cursor.execute("DELETE FROM hierarchy_summary")
+            cursor.execute("INSERT INTO hierarchy_summary " + hierarchy_select.format(where=""))
+        elif hierarchy_keys:
+            cursor.executemany("""
+            DELETE FROM hierarchy_summary WHERE main_genre = ? AND sub_genre = ? AND sub_sub_genre = ?
+            """, list(hierarchy_keys))
+            cursor.executemany("INSERT INTO hierarchy_summary " + hierarchy_select.format(
+                where="WHERE main_genre = ? AND sub_genre = ? AND sub_sub_genre = ?"), list(hierarchy_keys))
+        
+        if aesthetic_keys is None:
+            cursor.execute("DELETE FROM aesthetic_combinations")
+            cursor.execute("INSERT INTO aesthetic_combinations " + aesthetic_select.format(where=""))
+        elif aesthetic_keys:
+            cursor.executemany("""
+            DELETE FROM aesthetic_combinations WHERE art_style = ? AND theme = ? AND music_style = ?
+            """, list(aesthetic_keys))
+            cursor.executemany("INSERT INTO aesthetic_combinations " + aesthetic_select.format(
+                where="AND art_style = ? AND theme = ? AND music_style = ?"), list(aesthetic_keys))
+        
+        if tag_ids is None:
+            cursor.execute("DELETE FROM popular_unique_tags")
+            cursor.execute("INSERT INTO popular_unique_tags " + tags_select.format(where=""))
+        elif tag_ids:
+            cursor.executemany("DELETE FROM popular_unique_tags WHERE tag_id = ?", [(tag_id,) for tag_id in tag_ids])
+            cursor.executemany("INSERT INTO popular_unique_tags " + tags_select.format(where="WHERE ut.tag_id = ?"),
+                               [(tag_id,) for tag_id in tag_ids])
+        
+        # Counts are cheap enough to always recompute
+        cursor.execute("DELETE FROM summary_counts")
+        for table in ['games', 'steam_tags', 'unique_tags', 'subjective_tags', 'tag_ratios', 'game_vectors']:
+            cursor.execute(f"INSERT INTO summary_counts (name, value) SELECT 'total_{table}', COUNT(*) FROM {table}")
+    
+    def _fingerprint(self, queries):
+        if not os.path.exists(self.db_file_path):
+            return None
+        conn = sqlite3.connect(self.db_file_path)
+        cursor = conn.cursor()
+        try:
+            return {name: hash_query(cursor, sql) for name, sql in queries.items()}
+        except sqlite3.OperationalError:
+            # Missing tables, the stage has to run
+            return None
+        finally:
+            conn.close()
+    
+    def tables_fingerprint(self):
+        """Hash of the game rows; content_hash covers everything derived from the JSON"""
+        return self._fingerprint({
+            'games': "SELECT steam_appid, content_hash FROM games ORDER BY steam_appid",
+            'rows': """SELECT (SELECT COUNT(*) FROM steam_tags), (SELECT COUNT(*) FROM unique_tags),
+                              (SELECT COUNT(*) FROM subjective_tags), (SELECT COUNT(*) FROM tag_ratios),
+                              (SELECT COUNT(*) FROM game_reviews)"""
+        })
+    
+    def vectors_fingerprint(self):
+        fingerprint = self._fingerprint({
+            'vectors': "SELECT steam_appid, vector_data FROM game_vectors ORDER BY steam_appid"
+        })
+        if fingerprint is not None:
+            fingerprint['vectorizer'] = hash_file(self.vectorizer_path)
+        return fingerprint
+    
+    def summary_fingerprint(self):
+        return self._fingerprint({
+            'hierarchy': "SELECT * FROM hierarchy_summary ORDER BY main_genre, sub_genre, sub_sub_genre",
+            'tags': "SELECT * FROM popular_unique_tags ORDER BY tag_id",
+            'aesthetics': "SELECT * FROM aesthetic_combinations ORDER BY art_style, theme, music_style",
+            'counts': "SELECT * FROM summary_counts ORDER BY name"
+        })
+    
+    def cached_build(self, manifest):
+        """Run only the build stages whose inputs changed since the manifest was written.
+        
+        The tables stage upserts into an existing database, which also refreshes the
+        vectors of changed games, so the vectors stage only refits when it has to.
+        """
+        db_exists = os.path.exists(self.db_file_path) and self.schema_is_current()
+        upserted = False
+        
+        tables_inputs = {'json': hash_file(self.json_file_path), 'schema': SCHEMA_VERSION}
+        if manifest.is_fresh('tables', tables_inputs, self.tables_fingerprint) and db_exists:
+            print("⏭️ tables: inputs unchanged, skipping")
+        else:
+            with self.timed_stage('tables'):
+                if db_exists:
+                    self.incremental_update()
+                    upserted = True
+                else:
+                    self.create_database_schema()
+                    self.insert_game_data()
+            manifest.record('tables', tables_inputs, self.tables_fingerprint())
+        
+        vectors_inputs = {
+            'texts': hash_json(sorted((appid, game_vector_text(game)) for appid, game in self.games_data.items())),
+            'mode': self.vector_mode
+        }
+        if manifest.is_fresh('vectors', vectors_inputs, self.vectors_fingerprint):
+            print("⏭️ vectors: tag texts unchanged, skipping")
+        else:
+            with self.timed_stage('vectors'):
+                if 'vectors' in manifest.force or 'all' in manifest.force or not self._vectors_current():
+                    self.build_and_store_vectors()
+                else:
+                    print("✅ Vectors already refreshed for changed games")
+            manifest.record('vectors', vectors_inputs, self.vectors_fingerprint())
+        
+        summary_inputs = {'tables': self.tables_fingerprint()}
+        if manifest.is_fresh('summary', summary_inputs, self.summary_fingerprint):
+            print("⏭️ summary: tables unchanged, skipping")
+        else:
+            with self.timed_stage('summary'):
+                if upserted and 'summary' not in manifest.force and 'all' not in manifest.force:
+                    print("✅ Summary tables already refreshed for changed games")
+                else:
+                    self.create_summary_tables()
+            manifest.record('summary', summary_inputs, self.summary_fingerprint())
+    
+    def _vectors_current(self):
+        """Whether every game has a vector written by a vectorizer of the requested mode"""
+        vectorizer = self._load_vectorizer()
+        if vectorizer is None or self._vector_mode_of(vectorizer) != self.vector_mode:
+            return False
+        conn = sqlite3.connect(self.db_file_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+        SELECT COUNT(*) FROM games g LEFT JOIN game_vectors v ON v.steam_appid = g.steam_appid
+        WHERE v.steam_appid IS NULL
+        """)
+        missing = cursor.fetchone()[0]
+        conn.close()
+        return missing == 0
     
     def print_database_stats(self):
         """Print statistics about the created database"""
@@ -446,7 +1103,7 @@ class HierarchicalDatabaseConverter:
         print("DATABASE STATISTICS")
         print("="*50)
         
-        conn = sqlite3.connect(self.db_file_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Basic counts
@@ -469,10 +1126,9 @@ class HierarchicalDatabaseConverter:
         # Top hierarchies
         print(f"\n🎮 TOP HIERARCHIES:")
         cursor.execute("""
-        SELECT main_genre, sub_genre, sub_sub_genre, COUNT(*) as count
-        FROM games 
-        GROUP BY main_genre, sub_genre, sub_sub_genre
-        ORDER BY count DESC
+        SELECT main_genre, sub_genre, sub_sub_genre, game_count
+        FROM hierarchy_summary
+        ORDER BY game_count DESC
         LIMIT 10
         """)
         
@@ -487,17 +1143,51 @@ class HierarchicalDatabaseConverter:
         print("="*50)
 
 def convert_json_to_sqlite(json_file="steam_games_with_hierarchical_tags.json", 
-                          db_file="steam_recommendations.db"):
+                          db_file="steam_recommendations.db", incremental=False, bulk=False, workers=0,
+                          vector_mode='tfidf', reweight=False, cached=False, force=(),
+                          manifest_file="build_manifest.json"):
     """Main conversion function"""
     print("🚀 Starting JSON to SQLite conversion...")
     print(f"Input: {json_file}")
     print(f"Output: {db_file}")
     
-    converter = HierarchicalDatabaseConverter(json_file, db_file)
+    converter = HierarchicalDatabaseConverter(json_file, db_file, vector_mode=vector_mode)
     
     try:
         # Step 1: Load JSON data
-        converter.load_json_data()
+        with converter.timed_stage('load'):
+            converter.load_json_data()
+        
+        if reweight and os.path.exists(db_file):
+            # Only refit and rewrite the vectors of an existing database
+            converter.reweight_vectors()
+            return
+        
+        if cached or force:
+            # Steps 2-5, skipping stages whose inputs are unchanged
+            manifest = BuildManifest(manifest_file, force=force)
+            converter.cached_build(manifest)
+            converter.print_database_stats()
+            converter.print_stage_timings()
+            manifest.print_report()
+            return
+        
+        if bulk or workers:
+            # Steps 2-5 against a temporary file, indexes last
+            converter.bulk_build(workers=workers)
+            converter.print_database_stats()
+            converter.print_stage_timings()
+            return
+        
+        if incremental and os.path.exists(db_file) and not converter.schema_is_current():
+            print("⚠️ Existing database uses an older schema, doing a full rebuild")
+            incremental = False
+        
+        if incremental and os.path.exists(db_file):
+            # Upsert changed games into the live database
+            converter.incremental_update()
+            converter.print_database_stats()
+            return
         
         # Step 2: Create database schema
         converter.create_database_schema()
@@ -508,8 +1198,8 @@ def convert_json_to_sqlite(json_file="steam_games_with_hierarchical_tags.json",
         # Step 4: Build and store vectors
         converter.build_and_store_vectors()
         
-        # Step 5: Create summary views
-        converter.create_summary_views()
+        # Step 5: Create summary tables
+        converter.create_summary_tables()
         
         # Step 6: Print statistics
         converter.print_database_stats()
@@ -520,13 +1210,35 @@ def convert_json_to_sqlite(json_file="steam_games_with_hierarchical_tags.json",
         traceback.print_exc()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the hierarchical tag JSON into the recommendations database")
+    parser.add_argument("--json", default="steam_games_with_hierarchical_tags.json", help="input JSON file")
+    parser.add_argument("--db", default="steam_recommendations.db", help="output SQLite database")
+    parser.add_argument("--incremental", action="store_true",
+                        help="upsert only changed games into an existing database instead of rebuilding it")
+    parser.add_argument("--bulk", action="store_true",
+                        help="build into a temporary file with deferred indexes and atomically replace the database")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="bulk build with this many worker processes preparing rows and vectors")
+    parser.add_argument("--vectors", choices=VECTOR_MODES, default="tfidf",
+                        help="tfidf freezes vocabulary and idf between reweights, hashing never needs refitting")
+    parser.add_argument("--reweight", action="store_true",
+                        help="refit and rewrite all vectors of an existing database, nothing else")
+    parser.add_argument("--cached", action="store_true",
+                        help="skip build stages whose inputs are unchanged according to the build manifest")
+    parser.add_argument("--force", action="append", default=[], choices=BUILD_STAGES + ['all'],
+                        help="rebuild this stage even if it is cached (implies --cached, repeatable)")
+    parser.add_argument("--manifest", default="build_manifest.json", help="build manifest file for --cached")
+    args = parser.parse_args()
+    
     # Run the conversion
-    convert_json_to_sqlite()
+    convert_json_to_sqlite(args.json, args.db, incremental=args.incremental, bulk=args.bulk, workers=args.workers,
+                           vector_mode=args.vectors, reweight=args.reweight, cached=args.cached,
+                           force=args.force, manifest_file=args.manifest)
     
     # Optional: Test the database
     print("\n🧪 Testing database queries...")
     
-    conn = sqlite3.connect("steam_recommendations.db")
+    conn = sqlite3.connect(args.db)
     cursor = conn.cursor()
     
     # Test basic query
@@ -0,0 +1,99 @@
+# multi-category keyword matching with a single aho-corasick automaton
+# every keyword set is compiled into one automaton, so a review is lowercased and scanned
+# once and the hits for every category come out of the same pass.
+# counts follow str.count: substring matches, non-overlapping per keyword, leftmost first
+
+from functools import lru_cache
+
+class KeywordAutomaton:
+    def __init__(self, categories, cache_size=4096):
+        """categories maps a category name to an iterable of lowercase keywords"""
+        # keywords keep the order their category iterates in, so results list them in the same order
+        self.categories = {name: tuple(keywords) for name, keywords in categories.items()}
+        self.keywords = []
+        self.keyword_ids = {}
+        for keywords in self.categories.values():
+            for keyword in keywords:
+                if keyword and keyword not in self.keyword_ids:
+                    self.keyword_ids[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+        self.lengths = [len(keyword) for keyword in self.keywords]
+
+        # keyword_id -> [(category, position in that category)], keywords can sit in several categories
+        self.memberships = [[] for _ in self.keywords]
+        for name, keywords in self.categories.items():
+            for position, keyword in enumerate(keywords):
+                if keyword in self.keyword_ids:
+                    self.memberships[self.keyword_ids[keyword]].append((name, position))
+
+        self._build()
+        # the same review is usually asked about by several callers in a row
+        self.scan = lru_cache(maxsize=cache_size)(self._scan)
+
+    def _build(self):
+        goto = [{}]
+        outputs = [[]]
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                if ch not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][ch] = len(goto) - 1
+                state = goto[state][ch]
+            outputs[state].append(keyword_id)
+
+        # breadth-first so every fail target is finished before the states that point at it
+        fail = [0] * len(goto)
+        order = list(goto[0].values())
+        for state in order:
+            for ch, child in goto[state].items():
+                order.append(child)
+                if state:
+                    target = fail[state]
+                    while target and ch not in goto[target]:
+                        target = fail[target]
+                    fail[child] = goto[target].get(ch, 0)
+
+        # fold the fail links into complete transition tables and output lists,
+        # the scan loop is then one dict lookup per character
+        self.transitions = [None] * len(goto)
+        self.transitions[0] = dict(goto[0])
+        self.outputs = [tuple(out) for out in outputs]
+        for state in order:
+            table = dict(self.transitions[fail[state]])
+            table.update(goto[state])
+            self.transitions[state] = table
+            self.outputs[state] = self.outputs[state] + self.outputs[fail[state]]
+
+    def count(self, text):
+        """Occurrences of every keyword in text, {keyword_id: count} for keywords that appear"""
+        transitions = self.transitions
+        outputs = self.outputs
+        lengths = self.lengths
+        counts = {}
+        next_start = {}
+        state = 0
+        for end, ch in enumerate(text.lower(), 1):
+            state = transitions[state].get(ch, 0)
+            for keyword_id in outputs[state]:
+                start = end - lengths[keyword_id]
+                if start >= next_start.get(keyword_id, 0):
+                    counts[keyword_id] = counts.get(keyword_id, 0) + 1
+                    next_start[keyword_id] = end
+        return counts
+
+    def _scan(self, text):
+        """Per-category hits for one text, {category: {keyword: count}}.
+
+        Every category is present, empty when nothing matched. The result is cached
+        and shared between callers, so treat it as read-only.
+        """
+        found = {name: [] for name in self.categories}
+        for keyword_id, count in self.count(text).items():
+            for name, position in self.memberships[keyword_id]:
+                found[name].append((position, self.keywords[keyword_id], count))
+        return {
+            name: {keyword: count for _, keyword, count in sorted(matches)}
+            for name, matches in found.items()
+        }
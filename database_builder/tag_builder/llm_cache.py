@@ -0,0 +1,95 @@
+# persistent cache of chat completion responses, stored next to the review state in pipeline_state.db
+# the key is a hash of the model, the request parameters and the exact messages, so any change to
+# the prompt (game data, reviews, tag context) is a miss, and re-running after a crash or a parser
+# fix re-parses the stored text instead of calling the api again
+
+import threading
+import time
+from datetime import datetime
+
+from build_cache import hash_json
+from http_cache import HTTP_CACHE
+from pipeline_metrics import METRICS
+from pipeline_state import PIPELINE_STATE_DB, connect_state
+
+class LLMCache:
+    def __init__(self, db_path=PIPELINE_STATE_DB, enabled=True):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.conn = None
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _connection(self):
+        # opened on first use so importing a script doesn't create the database
+        if self.conn is None:
+            # shared across threads, every access holds self.lock
+            self.conn = connect_state(self.db_path, check_same_thread=False)
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                request_hash TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response_text TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """)
+            self.conn.commit()
+        return self.conn
+
+    @staticmethod
+    def request_key(request):
+        return hash_json(request)
+
+    def get(self, request):
+        if not self.enabled:
+            return None
+        with self.lock:
+            row = self._connection().execute(
+                "SELECT response_text FROM llm_cache WHERE request_hash = ?", (self.request_key(request),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, request, response_text):
+        if not self.enabled:
+            return
+        with self.lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (request_hash, model, response_text, created_at) VALUES (?, ?, ?, ?)",
+                (self.request_key(request), request.get('model', ''), response_text, datetime.now().isoformat())
+            )
+            # every response cost money, keep it even if the run dies right after
+            conn.commit()
+
+    def chat_completion_text(self, client, **request):
+        """Stripped text of client.chat.completions.create(**request), served from the cache when possible.
+
+        Errors from the api are raised as usual and nothing is cached for them. The latency, status and
+        token usage of api calls go to METRICS.
+        """
+        cached = self.get(request)
+        with self.lock:
+            self.stats['hits' if cached is not None else 'misses'] += 1
+        if cached is not None:
+            HTTP_CACHE.record('chat', self.request_key(request), cached.encode('utf-8'))
+            return cached
+
+        start = time.perf_counter()
+        try:
+            response = client.chat.completions.create(**request)
+        except Exception as e:
+            METRICS.record_request('chat_completions', time.perf_counter() - start, getattr(e, 'status_code', 'error'))
+            raise
+        METRICS.record_request('chat_completions', time.perf_counter() - start, 200)
+        usage = getattr(response, 'usage', None)
+        METRICS.record_llm(getattr(usage, 'prompt_tokens', 0), getattr(usage, 'completion_tokens', 0))
+        response_text = response.choices[0].message.content.strip()
+        self.put(request, response_text)
+        HTTP_CACHE.record('chat', self.request_key(request), response_text.encode('utf-8'))
+        return response_text
+
+    def print_stats(self):
+        print(f"llm cache: {self.stats['hits']} hits, {self.stats['misses']} misses")
+
+# shared by the tagging scripts in this directory
+LLM_CACHE = LLMCache()
@@ -0,0 +1,227 @@
+# throughput, latency and eta of the tagging pipeline
+# stages record how long each item took, requests their latency and status per endpoint, the
+# model its token usage, and the main loop its queue depths and progress. a snapshot of all of it
+# is appended to pipeline_metrics.jsonl every `interval` seconds, so a multi-day run can be
+# watched while it works, and a summary report is written when the run ends.
+#   python pipeline_metrics.py                     the latest snapshot of a running build
+#   python pipeline_metrics.py --report            the summary report of the last finished run
+
+import argparse
+import json
+import threading
+import time
+from collections import Counter, deque
+
+METRICS_FILE = 'pipeline_metrics.jsonl'
+METRICS_REPORT = 'pipeline_metrics_report.json'
+
+# timings kept per stage or endpoint for the percentiles, older ones are dropped
+RECENT_SAMPLES = 1000
+
+def timed_call(fn, *args):
+    """(fn(*args), seconds it took), for timing work done in another process"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def format_duration(seconds) -> str:
+    if seconds is None:
+        return "unknown"
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d{hours:02d}h{minutes:02d}m"
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    return f"{minutes}m{seconds:02d}s"
+
+class Timing:
+    """Count, total and recent percentiles of durations in seconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.items = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, seconds: float, items: int = 1):
+        self.count += 1
+        self.items += items
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self, elapsed: float) -> dict:
+        recent = sorted(self.recent)
+        def percentile(p):
+            return round(recent[min(len(recent) - 1, int(len(recent) * p))] * 1000, 1) if recent else None
+        return {
+            "count": self.count,
+            "items": self.items,
+            "per_second": round(self.items / elapsed, 3) if elapsed else None,
+            "busy_seconds": round(self.total, 1),
+            "mean_ms": round(self.total / self.count * 1000, 1) if self.count else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(self.max * 1000, 1)
+        }
+
+class PipelineMetrics:
+    """Metrics shared by the pipeline's threads, written out as json lines"""
+
+    def __init__(self, path=METRICS_FILE, interval=60.0, enabled=True):
+        self.path = path
+        self.interval = interval
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.monotonic()
+            self.last_emit = self.started
+            self.stages = {}
+            self.requests = {}
+            self.statuses = {}
+            self.llm = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+            self.queues = {}
+            self.done = 0
+            self.total = None
+
+    def configure(self, path=None, interval=None, enabled=None):
+        if path is not None:
+            self.path = path
+        if interval is not None:
+            self.interval = interval
+        if enabled is not None:
+            self.enabled = enabled
+
+    def record_stage(self, stage: str, seconds: float, items: int = 1):
+        """One piece of work done by `stage`, covering `items` games"""
+        with self.lock:
+            self.stages.setdefault(stage, Timing()).add(seconds, items)
+
+    def record_request(self, endpoint: str, seconds: float, status):
+        """One request to `endpoint` that took `seconds`, with its http status or 'error'"""
+        with self.lock:
+            self.requests.setdefault(endpoint, Timing()).add(seconds)
+            self.statuses.setdefault(endpoint, Counter())[str(status)] += 1
+
+    def record_llm(self, prompt_tokens: int, completion_tokens: int):
+        with self.lock:
+            self.llm["requests"] += 1
+            self.llm["prompt_tokens"] += prompt_tokens or 0
+            self.llm["completion_tokens"] += completion_tokens or 0
+
+    def set_queue(self, name: str, depth: int):
+        self.queues[name] = depth
+
+    def set_progress(self, done: int, total: int):
+        self.done = done
+        self.total = total
+
+    def eta(self):
+        """Seconds until every game is done at the rate so far, None before the first one"""
+        elapsed = time.monotonic() - self.started
+        if not self.done or self.total is None:
+            return None
+        return max(0, self.total - self.done) * elapsed / self.done
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        with self.lock:
+            return {
+                "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "elapsed_seconds": round(elapsed, 1),
+                "progress": {
+                    "done": self.done,
+                    "total": self.total,
+                    "per_second": round(self.done / elapsed, 3) if elapsed else None,
+                    "eta_seconds": None if self.eta() is None else round(self.eta())
+                },
+                "stages": {stage: timing.summary(elapsed) for stage, timing in self.stages.items()},
+                "requests": {endpoint: dict(timing.summary(elapsed), statuses=dict(self.statuses[endpoint]),
+                                            throttled=self.statuses[endpoint]['429'])
+                             for endpoint, timing in self.requests.items()},
+                "llm": dict(self.llm),
+                "queues": dict(self.queues)
+            }
+
+    def emit(self, kind='snapshot') -> dict:
+        """Append a snapshot to the metrics file, returns it"""
+        snapshot = dict(self.snapshot(), kind=kind)
+        self.last_emit = time.monotonic()
+        if self.enabled:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(snapshot) + '\n')
+        return snapshot
+
+    def maybe_emit(self):
+        """Emit a snapshot when the last one is `interval` seconds old, cheap enough to call per game"""
+        if time.monotonic() - self.last_emit >= self.interval:
+            self.emit()
+
+    def progress_line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        total = '?' if self.total is None else self.total
+        rate = self.done / elapsed if elapsed else 0.0
+        return f"progress: {self.done}/{total} games, {rate * 60:.1f} games/min, eta {format_duration(self.eta())}"
+
+    def write_report(self, filename=METRICS_REPORT) -> dict:
+        """Emit the final snapshot and write it as the run's summary report"""
+        report = self.emit('summary')
+        if self.enabled:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        return report
+
+def print_report(report: dict):
+    progress = report["progress"]
+    print(f"\npipeline metrics after {format_duration(report['elapsed_seconds'])}: "
+          f"{progress['done']}/{progress['total']} games, eta {format_duration(progress['eta_seconds'])}")
+    for stage, timing in report["stages"].items():
+        print(f"  stage {stage}: {timing['items']} games at {timing['per_second']}/s, "
+              f"mean {timing['mean_ms']}ms, p95 {timing['p95_ms']}ms, busy {format_duration(timing['busy_seconds'])}")
+    for endpoint, timing in report["requests"].items():
+        print(f"  {endpoint}: {timing['count']} requests, mean {timing['mean_ms']}ms, p95 {timing['p95_ms']}ms, "
+              f"{timing['throttled']} throttled (429)")
+    llm = report["llm"]
+    if llm["requests"]:
+        print(f"  llm: {llm['requests']} requests, {llm['prompt_tokens']} prompt tokens, "
+              f"{llm['completion_tokens']} completion tokens")
+    if report["queues"]:
+        print("  queues: " + ', '.join(f"{name} {depth}" for name, depth in report["queues"].items()))
+
+# shared by the tagging scripts in this directory
+METRICS = PipelineMetrics()
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-file", default=METRICS_FILE, help="json lines file the metrics snapshots go to")
+    parser.add_argument("--metrics-interval", type=float, default=60.0, help="seconds between metrics snapshots")
+    parser.add_argument("--no-metrics", action="store_true", help="don't write metrics files")
+    return parser
+
+def configure_metrics_from_args(args):
+    METRICS.configure(path=args.metrics_file, interval=args.metrics_interval, enabled=not args.no_metrics)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the tagging pipeline's metrics")
+    parser.add_argument("--metrics-file", default=METRICS_FILE)
+    parser.add_argument("--report", action="store_true", help="show the last finished run's summary report")
+    args = parser.parse_args()
+
+    if args.report:
+        with open(METRICS_REPORT, 'r', encoding='utf-8') as f:
+            print_report(json.load(f))
+    else:
+        last = None
+        with open(args.metrics_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                last = line
+        if last is None:
+            print("no metrics yet")
+        else:
+            print_report(json.loads(last))
@@ -0,0 +1,59 @@
+# sqlite file holding what the tagging pipeline remembers between runs
+# review_state: the newest review seen per game and a hash of the reviews that were selected,
+# so a refresh run only fetches newer reviews and skips the model when the selection is unchanged
+
+import sqlite3
+from datetime import datetime
+
+PIPELINE_STATE_DB = "pipeline_state.db"
+
+def connect_state(db_path=PIPELINE_STATE_DB, check_same_thread=True):
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class ReviewRefreshState:
+    """Per-game review watermark and selection hash.
+
+    Writes stay in an open transaction until commit(), which the pipeline calls once the
+    game's result is in the checkpoint log, so the state never runs ahead of the results on disk.
+    """
+
+    def __init__(self, db_path=PIPELINE_STATE_DB):
+        self.conn = connect_state(db_path)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS review_state (
+            steam_appid INTEGER PRIMARY KEY,
+            newest_review_date TEXT,
+            selection_hash TEXT,
+            refreshed_at TEXT NOT NULL
+        )
+        """)
+        self.conn.commit()
+
+    def get(self, steam_appid):
+        """(newest_review_date, selection_hash), both None for a game never processed"""
+        row = self.conn.execute(
+            "SELECT newest_review_date, selection_hash FROM review_state WHERE steam_appid = ?",
+            (steam_appid,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def record(self, steam_appid, newest_review_date, selection_hash):
+        self.conn.execute("""
+        INSERT INTO review_state (steam_appid, newest_review_date, selection_hash, refreshed_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(steam_appid) DO UPDATE SET
+            newest_review_date = NULLIF(MAX(COALESCE(excluded.newest_review_date, ''),
+                                            COALESCE(review_state.newest_review_date, '')), ''),
+            selection_hash = excluded.selection_hash,
+            refreshed_at = excluded.refreshed_at
+        """, (steam_appid, newest_review_date, selection_hash, datetime.now().isoformat()))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,168 @@
+# orders the tagging work queue so a limited budget of refreshes goes where users look
+# every game gets a score from its steam_spy popularity (owners and review count), the traffic
+# app.py logged for it in the recommender (searches and appearances in results, decayed by
+# age) and how stale its tags are (days since processing_date). popularity and traffic decide
+# which games matter, staleness scales that down to nothing for games refreshed recently, so
+# the top of the queue is the most looked-at data that is also the oldest.
+#   python refresh_scheduler.py --top 20 --traffic-db ../../traffic.db
+#       the next games a scheduled run would refresh
+#   python extract_verdicts.py --schedule 500 --continuous --traffic-db ../../traffic.db
+#       refresh the top 500 games every day
+# a source database that can't be read is reported once and its signal left out of the scores.
+
+import argparse
+import math
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+
+from pipeline_state import PIPELINE_STATE_DB
+
+STEAM_API_DB = "steam_api.db"
+RECOMMENDATIONS_DB = "steam_recommendations.db"
+# written by app.py next to itself (the repository root), one row per game and day
+TRAFFIC_DB = "traffic.db"
+
+# weights of the log-scaled signals, a game with no data for any of them still scores 1
+OWNERS_WEIGHT = 1.0
+REVIEWS_WEIGHT = 0.5
+TRAFFIC_WEIGHT = 2.0
+
+# a result shown in someone's recommendations counts for this fraction of a search
+RECOMMENDATION_HIT_WEIGHT = 0.2
+# traffic loses half its weight every TRAFFIC_HALF_LIFE days, none older than TRAFFIC_WINDOW counts
+TRAFFIC_HALF_LIFE = 14
+TRAFFIC_WINDOW = 90
+
+# tags this many days old are fully stale, never processed games count as that old
+STALE_AFTER_DAYS = 180
+
+def parse_owners(owners) -> float:
+    """Midpoint of a steam_spy owners range like "1,000,000 .. 2,000,000", 0 when unknown"""
+    if owners is None:
+        return 0.0
+    bounds = [int(n.replace(',', '')) for n in re.findall(r'[\d,]+', str(owners)) if n.strip(',')]
+    return sum(bounds) / len(bounds) if bounds else 0.0
+
+def parse_date(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+# sources already reported missing, so each is only warned about once per process
+_reported_missing = set()
+
+def report_missing(db_path, error):
+    if db_path not in _reported_missing:
+        _reported_missing.add(db_path)
+        print(f"warning: refresh scheduler can't read {os.path.abspath(db_path)} ({error}), "
+              f"its signal is left out of the scores")
+
+def read_rows(db_path, query, params=()):
+    """Rows of a query, empty when the database or its table doesn't exist yet"""
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    except sqlite3.OperationalError as e:
+        report_missing(db_path, e)
+        return []
+    try:
+        return conn.execute(query, params).fetchall()
+    except sqlite3.OperationalError as e:
+        report_missing(db_path, e)
+        return []
+    finally:
+        conn.close()
+
+class RefreshScheduler:
+    """Scores games for a refresh from popularity, traffic and staleness"""
+
+    def __init__(self, steam_api_db=STEAM_API_DB, recommendations_db=RECOMMENDATIONS_DB,
+                 traffic_db=TRAFFIC_DB, state_db=PIPELINE_STATE_DB):
+        self.steam_api_db = steam_api_db
+        self.recommendations_db = recommendations_db
+        self.traffic_db = traffic_db
+        self.state_db = state_db
+
+    def popularity(self) -> dict:
+        """{steam_appid: (owners, review count)} from steam_spy"""
+        return {appid: (parse_owners(owners), (positive or 0) + (negative or 0))
+                for appid, positive, negative, owners in read_rows(self.steam_api_db, """
+                SELECT steam_appid, positive_reviews, negative_reviews, owners FROM steam_spy
+                """)}
+
+    def traffic(self, now: datetime) -> dict:
+        """{steam_appid: decayed hits} over the traffic window"""
+        since = (now - timedelta(days=TRAFFIC_WINDOW)).date().isoformat()
+        traffic = {}
+        for appid, day, searches, recommendations in read_rows(self.traffic_db, """
+        SELECT steam_appid, day, searches, recommendations FROM game_traffic WHERE day >= ?
+        """, (since,)):
+            age = max(0, (now.date() - datetime.fromisoformat(day).date()).days)
+            hits = searches + RECOMMENDATION_HIT_WEIGHT * recommendations
+            traffic[appid] = traffic.get(appid, 0.0) + hits * 0.5 ** (age / TRAFFIC_HALF_LIFE)
+        return traffic
+
+    def processed_dates(self) -> dict:
+        """{steam_appid: datetime} of the latest processing, from the served database or the pipeline's state"""
+        dates = {}
+        rows = read_rows(self.recommendations_db, "SELECT steam_appid, processing_date FROM games")
+        rows += read_rows(self.state_db, "SELECT steam_appid, refreshed_at FROM review_state")
+        for appid, value in rows:
+            date = parse_date(value)
+            if date is not None and (appid not in dates or date > dates[appid]):
+                dates[appid] = date
+        return dates
+
+    def scores(self, games: list, now: datetime = None) -> dict:
+        """{steam_appid: score} for games, 0 for a game processed just now"""
+        now = now or datetime.now()
+        popularity = self.popularity()
+        traffic = self.traffic(now)
+        processed = self.processed_dates()
+
+        scores = {}
+        for game in games:
+            appid = game["steam_appid"]
+            owners, reviews = popularity.get(appid, (0.0, 0))
+            importance = (1 + OWNERS_WEIGHT * math.log10(1 + owners)
+                          + REVIEWS_WEIGHT * math.log10(1 + reviews)
+                          + TRAFFIC_WEIGHT * math.log2(1 + traffic.get(appid, 0.0)))
+            date = processed.get(appid)
+            age_days = STALE_AFTER_DAYS if date is None else (now - date).total_seconds() / 86400
+            scores[appid] = importance * min(1.0, max(0.0, age_days) / STALE_AFTER_DAYS)
+        return scores
+
+    def order(self, games: list, now: datetime = None) -> list:
+        """Games by descending score, ties kept in table order"""
+        scores = self.scores(games, now)
+        return sorted(games, key=lambda game: -scores[game["steam_appid"]])
+
+    def select(self, games: list, budget: int, now: datetime = None) -> list:
+        """The `budget` highest scoring games, leaving out any refreshed so recently they score 0"""
+        scores = self.scores(games, now)
+        ordered = sorted(games, key=lambda game: -scores[game["steam_appid"]])
+        return [game for game in ordered if scores[game["steam_appid"]] > 0][:budget]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the order a scheduled refresh would tag games in")
+    parser.add_argument("--steam-db", default=STEAM_API_DB)
+    parser.add_argument("--recommendations-db", default=RECOMMENDATIONS_DB)
+    parser.add_argument("--traffic-db", default=TRAFFIC_DB)
+    parser.add_argument("--top", type=int, default=20, help="games to show")
+    args = parser.parse_args()
+
+    scheduler = RefreshScheduler(args.steam_db, args.recommendations_db, args.traffic_db)
+    games = [{"game_name": name, "steam_appid": appid}
+             for appid, name in read_rows(args.steam_db, "SELECT steam_appid, game_name FROM main_game")]
+    scores = scheduler.scores(games)
+    popularity = scheduler.popularity()
+    traffic = scheduler.traffic(datetime.now())
+    processed = scheduler.processed_dates()
+    for game in scheduler.order(games)[:args.top]:
+        appid = game["steam_appid"]
+        owners, reviews = popularity.get(appid, (0.0, 0))
+        date = processed.get(appid)
+        print(f"{scores[appid]:7.2f}  {game['game_name']} ({appid}): {owners:,.0f} owners, {reviews:,} reviews, "
+              f"traffic {traffic.get(appid, 0.0):.1f}, processed {date.date() if date else 'never'}")
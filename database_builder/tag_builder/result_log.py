@@ -0,0 +1,171 @@
+# append-only log of per-game results for the tagging pipeline, one json line per game
+# every line is fsynced as it is written, so a crash loses at most the game being written, and a
+# resumed run only keeps the offset of each game's line in memory. the final json is streamed
+# from the log instead of being built up in memory, and so is the previous output it merges.
+
+import json
+import os
+
+_decoder = json.JSONDecoder()
+
+class _JsonStream:
+    """Reads json tokens from a file, holding only the unparsed rest of the current chunk"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+
+    def _more(self) -> bool:
+        # reading at least as much as is buffered keeps reparsing a large value linear
+        chunk = self.f.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, '' at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._more():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"expected one of {chars!r} in {self.f.name}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # a number cut off by the chunk end still parses, so something has to follow it
+                if end < len(self.buffer):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                pass
+            if not self._more():
+                value, self.pos = _decoder.raw_decode(self.buffer, self.pos)
+                return value
+
+def iter_json_results(path, chunk_size=1 << 16):
+    """(appid, result) of a results json like write_json's output, one result in memory at a time.
+
+    Yields nothing when the file doesn't exist.
+    """
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with f:
+        stream = _JsonStream(f, chunk_size)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            appid = stream.value()
+            stream.expect(':')
+            yield appid, stream.value()
+            if stream.expect(',}') == '}':
+                return
+
+class ResultLog:
+    def __init__(self, path='checkpoint_steam_analysis.jsonl'):
+        self.path = path
+        # appid -> offset of its latest line
+        self.offsets = {}
+        self._recover()
+        self.file = open(path, 'ab')
+
+    def _recover(self):
+        """Index the lines already in the log, cutting off a last line a crash left half written"""
+        good = 0
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        appid = json.loads(line)['appid']
+                    except (ValueError, KeyError):
+                        break
+                    self.offsets[appid] = good
+                    good += len(line)
+        except FileNotFoundError:
+            return
+
+        if good < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(good)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, appid):
+        return appid in self.offsets
+
+    def append(self, appid: str, result: dict):
+        line = json.dumps({'appid': appid, 'result': result}, ensure_ascii=False).encode('utf-8') + b'\n'
+        offset = self.file.tell()
+        self.file.write(line)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.offsets[appid] = offset
+
+    def results(self):
+        """(appid, result) for every game in the log, latest line per game, in first-logged order"""
+        with open(self.path, 'rb') as f:
+            for appid, offset in self.offsets.items():
+                yield appid, self._read(f, offset)
+
+    @staticmethod
+    def _read(f, offset):
+        f.seek(offset)
+        return json.loads(f.readline())['result']
+
+    def write_json(self, filename: str, base=()) -> int:
+        """Stream {**base, **log} to `filename` formatted like json.dump(indent=2), returns the game count.
+
+        `base` is an iterable of (appid, result), e.g. iter_json_results of the previous output, which
+        may be `filename` itself. Only one result is in memory at a time. The file is written next
+        to the target and renamed over it, so a crash never leaves it half written.
+        """
+        count = 0
+        logged_in_base = set()
+        tmp_path = f"{filename}.{os.getpid()}.tmp"
+        with open(self.path, 'rb') as log, open(tmp_path, 'w', encoding='utf-8') as f:
+            def write(appid, result):
+                value = json.dumps(result, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+                f.write(f"{',' if count else ''}\n  {json.dumps(appid, ensure_ascii=False)}: {value}")
+
+            f.write('{')
+            for appid, result in base:
+                if appid in self.offsets:
+                    logged_in_base.add(appid)
+                    result = self._read(log, self.offsets[appid])
+                write(appid, result)
+                count += 1
+            for appid, offset in self.offsets.items():
+                if appid not in logged_in_base:
+                    write(appid, self._read(log, offset))
+                    count += 1
+            f.write('\n}' if count else '}')
+        os.replace(tmp_path, filename)
+        return count
+
+    def close(self):
+        self.file.close()
+
+    def remove(self):
+        self.close()
+        os.remove(self.path)
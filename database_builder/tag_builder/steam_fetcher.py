@@ -0,0 +1,421 @@
+# concurrent steam store fetcher
+# one httpx.AsyncClient is shared by every request so connections are reused, each endpoint
+# has its own token bucket, and a 429 from steam pauses every task on that endpoint at once.
+# the parsing helpers are shared with the blocking calls in extract_verdicts
+
+import argparse
+import asyncio
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from http_cache import HTTP_CACHE
+from pipeline_metrics import METRICS
+
+STEAM_STORE_URL = "https://store.steampowered.com"
+
+# requests per second and burst size for each endpoint. appdetails is limited to
+# 200 requests per 5 minutes per IP, appreviews has no published limit and is kept modest
+STEAM_RATE_LIMITS = {
+    'appdetails': (200 / 300, 10),
+    'appreviews': (1.0, 5)
+}
+
+# steam ignores num_per_page above this, further reviews need the cursor
+REVIEWS_PER_PAGE = 100
+
+# categories that don't say anything about the game itself
+IGNORED_CATEGORIES = ["steam achievements", "steam cloud", "steam trading cards", "full controller support"]
+
+# official tags kept per game, genres come before categories so this many genres settle them
+OFFICIAL_TAG_COUNT = 3
+
+def appdetails_params(appid):
+    return {"appids": appid, "filters": "categories,genres,short_description,detailed_description"}
+
+def appreviews_params(count, cursor='*'):
+    return {"json": 1, "num_per_page": min(count, REVIEWS_PER_PAGE), "filter": "recent",
+            "language": "english", "cursor": cursor}
+
+def parse_steam_appdetails(appid, data):
+    """Official tags and description from an appdetails response, ([], "") when steam has no data"""
+    if str(appid) not in data or not data[str(appid)]["success"]:
+        return [], ""
+
+    game_data = data[str(appid)]["data"]
+    tags = []
+    description = ""
+
+    # Get genres
+    if "genres" in game_data:
+        for genre in game_data["genres"]:
+            tags.append(genre["description"].lower())
+
+    # Get categories (like multiplayer, co-op, etc.)
+    if "categories" in game_data:
+        for category in game_data["categories"]:
+            cat_name = category["description"].lower()
+            if cat_name not in IGNORED_CATEGORIES:
+                tags.append(cat_name)
+
+    # Get description (prefer short, fallback to detailed)
+    if "short_description" in game_data and game_data["short_description"]:
+        description = game_data["short_description"]
+    elif "detailed_description" in game_data and game_data["detailed_description"]:
+        # Clean HTML tags from detailed description and limit length
+        description = re.sub(r'<[^>]+>', '', game_data["detailed_description"])
+        if len(description) > 500:
+            description = description[:500] + "..."
+
+    return tags[:OFFICIAL_TAG_COUNT], description  # Return top 3 most relevant tags and description
+
+def local_app_details(game):
+    """Tags and description from the game's steam_api.db row, None when appdetails would add to them.
+    
+    The go builder stores appdetails' genres in order and its short description, which is all
+    parse_steam_appdetails keeps once a game has OFFICIAL_TAG_COUNT genres.
+    """
+    genres = game.get("steam_api_genres") or []
+    description = game.get("steam_api_description") or ""
+    if len(genres) < OFFICIAL_TAG_COUNT or not description:
+        return None
+    return [genre.lower() for genre in genres[:OFFICIAL_TAG_COUNT]], description
+
+def parse_steam_review(review):
+    return {
+        "author_id": review["author"]["steamid"],
+        "review": review["review"],
+        "voted_up": review["voted_up"],
+        "playtime_hours": round(review["author"]["playtime_forever"] / 60, 1),
+        "date": datetime.fromtimestamp(review["timestamp_created"]).isoformat()
+    }
+
+def parse_steam_reviews(data):
+    if "reviews" not in data:
+        return []
+    return [parse_steam_review(review) for review in data["reviews"]]
+
+def next_review_cursor(data, seen):
+    """Cursor for the page after `data`, None once steam has nothing more.
+    
+    Steam hands back the same cursor when the last page is reached, so seen cursors end the walk.
+    """
+    cursor = data.get("cursor")
+    if not data.get("reviews") or not cursor or cursor in seen:
+        return None
+    seen.add(cursor)
+    return cursor
+
+def reviews_newer_than(page, since):
+    """(reviews dated after `since`, whether the page reached `since`), pages are newest first"""
+    if since is None:
+        return page, False
+    newer = [review for review in page if review["date"] > since]
+    return newer, len(newer) < len(page)
+
+def iter_steam_review_pages(appid, max_reviews, get, base_url=STEAM_STORE_URL, since=None):
+    """Blocking review stream, yields pages of parsed reviews following the cursor.
+    
+    `get` is a requests.get compatible callable, like HTTP_CACHE.get. With `since`
+    (a review date) the stream ends at the first review that isn't newer.
+    """
+    url = f"{base_url}/appreviews/{appid}"
+    cursor, seen, fetched = '*', {'*'}, 0
+    while cursor is not None and fetched < max_reviews:
+        data = get(url, params=appreviews_params(max_reviews - fetched, cursor), timeout=10).json()
+        page, reached_since = reviews_newer_than(parse_steam_reviews(data)[:max_reviews - fetched], since)
+        fetched += len(page)
+        yield page
+        cursor = None if reached_since else next_review_cursor(data, seen)
+
+def retry_after_seconds(value, default):
+    """Seconds to wait from a Retry-After header, which is either seconds or an HTTP date"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+class TokenBucket:
+    """Async token bucket, `rate` tokens per second up to `capacity` saved up"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def back_off(self, seconds):
+        """Stop handing out tokens for `seconds`, and start refilling from empty afterwards"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+        self.updated = self.blocked_until
+
+class SteamFetcher:
+    """Fetches appdetails and appreviews for many games concurrently.
+
+    Use as an async context manager so the client is opened and closed once.
+    """
+
+    def __init__(self, base_url=STEAM_STORE_URL, rate_limits=None, max_in_flight=8,
+                 max_retries=5, default_backoff=30.0, timeout=10.0):
+        self.base_url = base_url.rstrip('/')
+        limits = dict(STEAM_RATE_LIMITS, **(rate_limits or {}))
+        self.buckets = {endpoint: TokenBucket(rate, capacity) for endpoint, (rate, capacity) in limits.items()}
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.default_backoff = default_backoff
+        self.timeout = timeout
+        self.client = None
+        self._in_flight = None
+        self.stats = {'requests': 0, 'throttled': 0, 'local_details': 0}
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        )
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def get_json(self, endpoint, path, params):
+        """GET under the endpoint's rate limit, retrying 429/503 after the shared backoff.
+        
+        Cached responses are served without using a token.
+        """
+        url = self.base_url + path
+        cached = HTTP_CACHE.lookup(url, params, endpoint)
+        if cached is not None:
+            return cached.json()
+
+        bucket = self.buckets[endpoint]
+        for attempt in range(self.max_retries + 1):
+            # waiting for a token or a back-off must not hold a slot other endpoints could use
+            await bucket.acquire()
+            async with self._in_flight:
+                self.stats['requests'] += 1
+                start = time.perf_counter()
+                try:
+                    response = await self.client.get(HTTP_CACHE.fixture_url(url), params=params)
+                except Exception:
+                    METRICS.record_request(endpoint, time.perf_counter() - start, 'error')
+                    raise
+                METRICS.record_request(endpoint, time.perf_counter() - start, response.status_code)
+
+            if response.status_code in (429, 503) and attempt < self.max_retries:
+                self.stats['throttled'] += 1
+                delay = retry_after_seconds(response.headers.get('Retry-After'),
+                                            self.default_backoff * 2 ** attempt)
+                # every task on this endpoint waits, not only the one that was throttled
+                bucket.back_off(delay)
+                continue
+
+            response.raise_for_status()
+            HTTP_CACHE.store(url, params, response)
+            return response.json()
+
+    async def fetch_app_details(self, appid, errors=None):
+        """Tags and description, empty after an error, which is also appended to `errors`"""
+        try:
+            data = await self.get_json('appdetails', "/api/appdetails", appdetails_params(appid))
+            return parse_steam_appdetails(appid, data)
+        except Exception as e:
+            print(f"error fetching steam data for appid {appid}: {e}")
+            if errors is not None:
+                errors.append(f"appdetails: {e}")
+            return [], ""
+
+    async def app_details(self, game, errors=None):
+        """Tags and description from steam_api.db when it has all of them, from appdetails otherwise"""
+        local = local_app_details(game)
+        if local is not None:
+            self.stats['local_details'] += 1
+            return local
+        return await self.fetch_app_details(game["steam_appid"], errors)
+
+    async def iter_review_pages(self, appid, max_reviews, since=None):
+        """Async stream of review pages following steam's cursor, up to max_reviews in total,
+        ending early at the first review not newer than `since`"""
+        cursor, seen, fetched = '*', {'*'}, 0
+        while cursor is not None and fetched < max_reviews:
+            data = await self.get_json('appreviews', f"/appreviews/{appid}",
+                                       appreviews_params(max_reviews - fetched, cursor))
+            page, reached_since = reviews_newer_than(parse_steam_reviews(data)[:max_reviews - fetched], since)
+            fetched += len(page)
+            yield page
+            cursor = None if reached_since else next_review_cursor(data, seen)
+
+    async def fetch_reviews(self, appid, max_reviews=100, enough=None, since=None, errors=None):
+        """Reviews for one game, no more pages are requested once the game's check is true.
+
+        `enough()` makes the check, which is called with each new page. It runs on a worker
+        thread so the event loop keeps serving the other games' requests meanwhile.
+        An error ends the pages early and is appended to `errors`.
+        """
+        reviews = []
+        check = enough() if enough is not None else None
+        try:
+            async for page in self.iter_review_pages(appid, max_reviews, since):
+                reviews.extend(page)
+                if check is not None and await asyncio.to_thread(check, page):
+                    break
+            return reviews
+        except Exception as e:
+            print(f"error fetching reviews for appid {appid}: {e}")
+            if errors is not None:
+                errors.append(f"appreviews: {e}")
+            return reviews
+
+    async def fetch_game(self, game, review_count=200, enough=None):
+        """Steam's official data and the raw reviews for one game, both requests run concurrently.
+        
+        Only reviews newer than game["reviews_since"] are fetched when it is set, and appdetails
+        only when the game's steam_api.db data doesn't cover it. Requests that failed after their
+        retries are listed in "errors", the data they would have added is missing.
+        """
+        appid = game["steam_appid"]
+        errors = []
+        start = time.perf_counter()
+        (steam_tags, steam_description), raw_reviews = await asyncio.gather(
+            self.app_details(game, errors),
+            self.fetch_reviews(appid, review_count, enough, game.get("reviews_since"), errors)
+        )
+        METRICS.record_stage('fetch', time.perf_counter() - start)
+        return {"steam_tags": steam_tags, "steam_description": steam_description, "raw_reviews": raw_reviews,
+                "errors": errors}
+
+_DONE = object()
+
+def fetch_games_in_background(games, buffer=32, review_count=200, enough=None, **fetcher_options):
+    """Yield (game, fetched) in input order while an event loop thread keeps fetching ahead.
+
+    Each game gets at most `review_count` reviews, fewer when the check enough() makes for it
+    says so early.
+
+    Up to `buffer` games are fetched concurrently, and up to `buffer` finished ones
+    wait for the consumer.
+    """
+    results = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+
+    async def produce():
+        async with SteamFetcher(**fetcher_options) as fetcher:
+            tasks = deque()
+
+            async def hand_over_oldest():
+                game_done, task = tasks[0]
+                # poll so a closed consumer isn't kept waiting on a throttled request
+                while not task.done():
+                    await asyncio.wait({task}, timeout=0.2)
+                    if stop.is_set():
+                        return
+                tasks.popleft()
+                await asyncio.to_thread(results.put, (game_done, task.result()))
+                METRICS.set_queue('fetching', len(tasks))
+                METRICS.set_queue('fetched_waiting', results.qsize())
+
+            try:
+                for game in games:
+                    tasks.append((game, asyncio.create_task(fetcher.fetch_game(game, review_count, enough))))
+                    while len(tasks) >= buffer and not stop.is_set():
+                        await hand_over_oldest()
+                    if stop.is_set():
+                        return
+                while tasks and not stop.is_set():
+                    await hand_over_oldest()
+            finally:
+                for _, task in tasks:
+                    task.cancel()
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(_DONE)
+
+    thread = threading.Thread(target=run, name="steam-fetcher", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # unblock a producer waiting on a full queue so the thread can exit
+        while thread.is_alive():
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        thread.join()
+
+def add_fetcher_arguments(parser):
+    """CLI flags shared by the scripts that use the fetcher"""
+    parser.add_argument("--steam-url", default=STEAM_STORE_URL,
+                        help="store base url, point at steam_stub_server.py for local runs")
+    parser.add_argument("--concurrency", type=int, default=8, help="max requests in flight")
+    parser.add_argument("--appdetails-rate", type=float, default=STEAM_RATE_LIMITS['appdetails'][0],
+                        help="appdetails requests per second")
+    parser.add_argument("--appreviews-rate", type=float, default=STEAM_RATE_LIMITS['appreviews'][0],
+                        help="appreviews requests per second")
+    return parser
+
+def fetcher_options(args):
+    return {
+        "base_url": args.steam_url,
+        "max_in_flight": args.concurrency,
+        "rate_limits": {
+            'appdetails': (args.appdetails_rate, STEAM_RATE_LIMITS['appdetails'][1]),
+            'appreviews': (args.appreviews_rate, STEAM_RATE_LIMITS['appreviews'][1])
+        }
+    }
+
+if __name__ == "__main__":
+    parser = add_fetcher_arguments(argparse.ArgumentParser(description="Fetch Steam data for a list of appids"))
+    parser.add_argument("appids", type=int, nargs="+")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games = [{"steam_appid": appid} for appid in args.appids]
+    for game, fetched in fetch_games_in_background(games, **fetcher_options(args)):
+        print(f"{game['steam_appid']}: {', '.join(fetched['steam_tags'])} "
+              f"({len(fetched['raw_reviews'])} reviews)")
+    print(f"fetched {len(games)} games in {time.perf_counter() - start:.1f}s")
@@ -1,4 +1,3 @@
-import requests
 import sqlite3
 import json
 import os
@@ -7,6 +6,9 @@ import re
 from datetime import datetime
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from openai import OpenAI
+from http_cache import HTTP_CACHE
+from steam_fetcher import iter_steam_review_pages
+from llm_cache import LLM_CACHE
 
 analyzer = SentimentIntensityAnalyzer()
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
@@ -165,7 +167,8 @@ analyze this game based on the user reviews and provide:
 4. subjective tags that capture the reviewers' opinions (2-4 tags, can include quality assessments)"""
     
     try:
-        response = client.chat.completions.create(
+        response_text = LLM_CACHE.chat_completion_text(
+            client,
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -175,8 +178,6 @@ analyze this game based on the user reviews and provide:
             max_tokens=150
         )
         
-        response_text = response.choices[0].message.content.strip()
-        
         ratios_match = re.search(r'RATIOS:\s*(.+?)(?:\n|$)', response_text)
         genre_match = re.search(r'MAIN_GENRE:\s*(.+?)(?:\n|$)', response_text)
         unique_match = re.search(r'UNIQUE_TAGS:\s*(.+?)(?:\n|$)', response_text)
@@ -253,35 +254,16 @@ analyze this game based on the user reviews and provide:
             return {"error": 100}, "error", ["unknown-error"], ["error"]
 
 def gather_steam_reviews(appid: int, count: int = 100) -> list:
-    url = f"https://store.steampowered.com/appreviews/{appid}"
-    params = {
-        "json": 1,
-        "num_per_page": count,
-        "filter": "recent",
-        "language": "english"
-    }
-    
+    reviews = []
     try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
-
-        if "reviews" not in data:
-            return []
-            
-        reviews = []
-        for review in data["reviews"]:
-            reviews.append({
-                "author_id": review["author"]["steamid"],
-                "review": review["review"],
-                "voted_up": review["voted_up"],
-                "playtime_hours": round(review["author"]["playtime_forever"] / 60, 1),
-                "date": datetime.fromtimestamp(review["timestamp_created"]).isoformat()
-            })
+        # Steam caps a page at 100 reviews, the rest come from following the cursor
+        for page in iter_steam_review_pages(appid, count, HTTP_CACHE.get):
+            reviews.extend(page)
         return reviews
     
     except Exception as e:
         print(f"error fetching reviews for appid {appid}: {e}")
-        return []
+        return reviews
 
 def save_tag_context(filename='tag_context.json'):
     context_to_save = {
@@ -0,0 +1,143 @@
+# local stand-in for the steam store endpoints the fetcher uses, for testing without touching steam:
+#   python steam_stub_server.py --port 8765 --appdetails-rate 5 --appreviews-rate 5
+#   python extract_verdicts.py --steam-url http://127.0.0.1:8765
+# each endpoint enforces its own rate limit and answers 429 with Retry-After when it is exceeded,
+# the request counts are printed on shutdown
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+GENRES = ["Action", "Adventure", "RPG", "Strategy", "Indie", "Simulation"]
+CATEGORIES = ["Single-player", "Multi-player", "Co-op", "Steam Achievements", "Steam Cloud"]
+REVIEW_WORDS = ("the combat and exploration feel great, pixel art is gorgeous and the soundtrack "
+                "is memorable, some bugs and grind but the story and controls are polished").split()
+
+class StubRateLimit:
+    """Fixed-rate limiter, `rate` requests per second with a burst of `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.accepted += 1
+                return True, 0
+            self.rejected += 1
+            return False, (1 - self.tokens) / self.rate
+
+def stub_appdetails(appid):
+    rng = random.Random(appid)
+    return {str(appid): {"success": True, "data": {
+        "genres": [{"description": g} for g in rng.sample(GENRES, 2)],
+        "categories": [{"description": c} for c in rng.sample(CATEGORIES, 3)],
+        "short_description": f"Stub game {appid}."
+    }}}
+
+def stub_appreviews(appid, count, cursor):
+    """One page of a game's reviews, newest first like steam's recent filter.
+    
+    The cursor is the offset of the next page.
+    """
+    rng = random.Random(appid)
+    total = rng.randint(30, 450)
+    start = 0 if cursor == '*' else int(cursor)
+    end = min(total, start + min(count, 100))
+    reviews = []
+    for i in range(start, end):
+        review_rng = random.Random(appid * 100000 + i)
+        reviews.append({
+            "author": {"steamid": str(76561190000000000 + i), "playtime_forever": review_rng.randint(0, 6000)},
+            "review": ' '.join(review_rng.choice(REVIEW_WORDS) for _ in range(review_rng.randint(20, 120))),
+            "voted_up": review_rng.random() < 0.8,
+            "timestamp_created": 1700000000 - i * 3600
+        })
+    # like steam, the last page repeats the cursor it was asked for
+    return {"success": 1, "cursor": str(end) if end < total else cursor, "reviews": reviews}
+
+def make_handler(limits, latency):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+
+            if url.path == "/api/appdetails":
+                endpoint = 'appdetails'
+            elif url.path.startswith("/appreviews/"):
+                endpoint = 'appreviews'
+            else:
+                self.send_error(404)
+                return
+
+            allowed, wait = limits[endpoint].allow()
+            if not allowed:
+                self.send_response(429)
+                self.send_header("Retry-After", f"{max(1, round(wait))}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            time.sleep(latency)
+            if endpoint == 'appdetails':
+                body = stub_appdetails(int(query["appids"][0]))
+            else:
+                body = stub_appreviews(int(url.path.rsplit('/', 1)[1]), int(query.get("num_per_page", ["100"])[0]),
+                                       query.get("cursor", ["*"])[0])
+
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+def serve(port=8765, appdetails_rate=5.0, appreviews_rate=5.0, capacity=5, latency=0.2):
+    """Start the stub server on a background thread, returns the server"""
+    limits = {
+        'appdetails': StubRateLimit(appdetails_rate, capacity),
+        'appreviews': StubRateLimit(appreviews_rate, capacity)
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(limits, latency))
+    server.limits = limits
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Steam store server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--appdetails-rate", type=float, default=5.0)
+    parser.add_argument("--appreviews-rate", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds added to every accepted request")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.appdetails_rate, args.appreviews_rate, latency=args.latency)
+    print(f"stub steam store on http://127.0.0.1:{args.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        for endpoint, limit in server.limits.items():
+            print(f"{endpoint}: {limit.accepted} accepted, {limit.rejected} throttled")
@@ -0,0 +1,187 @@
+# local first pass of the tagging stage: a nearest-neighbour vote over games that are already tagged
+# each game becomes a tf-idf vector of its steam tags, the review keywords its selected reviews
+# matched and its description. when the closest tagged games agree on every hierarchy field the
+# game takes their tags without a model call, anything less certain still goes to the model.
+#   python tag_classifier.py steam_games_with_hierarchical_tags.json --holdout 0.2 --min-confidence 0.8
+
+import argparse
+import json
+import random
+from collections import defaultdict
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# single-valued fields a prediction has to be confident about
+TAG_FIELDS = ["main_genre", "sub_genre", "sub_sub_genre", "art_style", "theme", "music_style"]
+TAG_LIST_FIELDS = ["unique_tags", "subjective_tags"]
+
+# fields of the selected reviews holding the keywords each one matched
+REVIEW_KEYWORD_FIELDS = {
+    "art_style_reviews": "art_keywords",
+    "theme_reviews": "theme_keywords",
+    "music_reviews": "music_keywords",
+    "quality_reviews": "quality_keywords"
+}
+
+# fields of a result training uses besides the selected reviews' keywords
+TRAINING_FIELDS = ["status", "tag_source", "steam_tags", "steam_description", "tag_ratios"] + TAG_FIELDS + TAG_LIST_FIELDS
+
+# main genres of results that stand for a failed request rather than a classification
+FAILED_GENRES = {"unknown", "error", "skipped", "rate-limited"}
+
+def review_keywords(reviews_by_field: dict) -> list:
+    """Keywords matched by a game's selected reviews, from a result or an analysis dict"""
+    keywords = set()
+    for field, keywords_field in REVIEW_KEYWORD_FIELDS.items():
+        for review in reviews_by_field.get(field) or []:
+            keywords.update(review.get(keywords_field, []))
+    return sorted(keywords)
+
+def game_document(steam_tags: list, steam_description: str, keywords: list) -> str:
+    """Text the vectorizer sees for a game, tags and keywords as single prefixed tokens"""
+    tokens = [f"tag:{tag.lower().replace(' ', '_')}" for tag in steam_tags]
+    tokens += [f"kw:{keyword.lower().replace(' ', '_')}" for keyword in keywords]
+    return ' '.join(tokens) + ' ' + (steam_description or '')
+
+def training_fields(result: dict) -> dict:
+    """The parts of a result fit looks at, its selected reviews cut down to their matched keywords"""
+    fields = {key: result[key] for key in TRAINING_FIELDS if key in result}
+    for field, keywords_field in REVIEW_KEYWORD_FIELDS.items():
+        fields[field] = [{keywords_field: review.get(keywords_field, [])} for review in result.get(field) or []]
+    return fields
+
+def is_trainable(result: dict) -> bool:
+    """Tagged by the model and not a placeholder for a failed request"""
+    return (result.get("status") == "processed"
+            and result.get("tag_source", "model") == "model"
+            and result.get("main_genre") not in FAILED_GENRES)
+
+class TagClassifier:
+    """k-nearest-neighbour vote over tagged games, weighted by cosine similarity"""
+
+    def __init__(self, k=5, min_similarity=0.3, min_neighbours=3):
+        self.k = k
+        self.min_similarity = min_similarity
+        self.min_neighbours = min_neighbours
+        self.vectorizer = None
+        self.vectors = None
+        self.labels = []
+
+    def fit(self, results):
+        """Train on result dicts like the values of steam_games_with_hierarchical_tags.json, returns self.
+
+        `results` can be any iterable, only the documents and labels are kept.
+        """
+        documents = []
+        self.labels = []
+        for result in results:
+            if not is_trainable(result):
+                continue
+            documents.append(game_document(result.get("steam_tags", []), result.get("steam_description", ""),
+                                           review_keywords(result)))
+            self.labels.append({field: result[field] for field in TAG_FIELDS + TAG_LIST_FIELDS + ["tag_ratios"]})
+
+        if not documents:
+            self.vectorizer = self.vectors = None
+            return self
+
+        self.vectorizer = TfidfVectorizer(
+            lowercase=True,
+            token_pattern=r'[\w:-]{2,}',
+            stop_words='english',
+            sublinear_tf=True
+        )
+        # rows are l2-normalized, so a dot product is the cosine similarity
+        self.vectors = self.vectorizer.fit_transform(documents)
+        return self
+
+    def __len__(self):
+        return len(self.labels)
+
+    def neighbours(self, document: str) -> list:
+        """(similarity, label) of the closest tagged games above min_similarity, closest first"""
+        if self.vectorizer is None:
+            return []
+        similarities = (self.vectors @ self.vectorizer.transform([document]).T).toarray().ravel()
+        count = min(self.k, len(similarities))
+        closest = np.argpartition(-similarities, count - 1)[:count]
+        closest = closest[np.argsort(-similarities[closest])]
+        return [(float(similarities[i]), self.labels[i]) for i in closest if similarities[i] >= self.min_similarity]
+
+    def predict(self, steam_tags: list, steam_description: str, keywords: list):
+        """(tag_data, confidence) for a game, confidence being the weakest field's share of the vote.
+
+        tag_data is None when too few tagged games are similar enough to vote.
+        """
+        neighbours = self.neighbours(game_document(steam_tags, steam_description, keywords))
+        if len(neighbours) < self.min_neighbours:
+            return None, 0.0
+
+        total = sum(similarity for similarity, _ in neighbours)
+        tag_data = {}
+        confidence = 1.0
+        for field in TAG_FIELDS:
+            votes = defaultdict(float)
+            for similarity, label in neighbours:
+                votes[label[field]] += similarity
+            winner = max(votes, key=votes.get)
+            tag_data[field] = winner
+            confidence = min(confidence, votes[winner] / total)
+
+        # list tags backed by more than half the vote, ratios averaged over the neighbours
+        for field in TAG_LIST_FIELDS:
+            votes = defaultdict(float)
+            for similarity, label in neighbours:
+                for tag in set(label[field]):
+                    votes[tag] += similarity
+            tag_data[field] = sorted((tag for tag in votes if votes[tag] > total / 2), key=votes.get, reverse=True)[:4]
+
+        ratios = defaultdict(float)
+        for similarity, label in neighbours:
+            for tag, percentage in label["tag_ratios"].items():
+                ratios[tag] += similarity * percentage / total
+        top_ratios = sorted(ratios, key=ratios.get, reverse=True)[:3]
+        tag_data["tag_ratios"] = {tag: round(ratios[tag]) for tag in top_ratios}
+
+        return tag_data, confidence
+
+def evaluate(results: dict, holdout: float, min_confidence: float, seed: int = 0, **classifier_options):
+    """Train on part of the tagged games and report coverage and per-field accuracy on the rest"""
+    trainable = [appid for appid, result in results.items() if is_trainable(result)]
+    random.Random(seed).shuffle(trainable)
+    split = int(len(trainable) * (1 - holdout))
+    classifier = TagClassifier(**classifier_options).fit(results[appid] for appid in trainable[:split])
+
+    held_out = trainable[split:]
+    confident = 0
+    correct = defaultdict(int)
+    for appid in held_out:
+        result = results[appid]
+        tag_data, confidence = classifier.predict(result.get("steam_tags", []), result.get("steam_description", ""),
+                                                  review_keywords(result))
+        if tag_data is None or confidence < min_confidence:
+            continue
+        confident += 1
+        for field in TAG_FIELDS:
+            correct[field] += tag_data[field] == result[field]
+
+    print(f"trained on {len(classifier)} games, evaluated on {len(held_out)}")
+    print(f"confident (>= {min_confidence}): {confident} games ({confident / max(1, len(held_out)):.1%}), "
+          f"these skip the model")
+    for field in TAG_FIELDS:
+        print(f"  {field}: {correct[field] / max(1, confident):.1%} agree with the model")
+    return confident, dict(correct)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the nearest-neighbour tag classifier on tagged games")
+    parser.add_argument("results", nargs="?", default="steam_games_with_hierarchical_tags.json")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of tagged games held out for evaluation")
+    parser.add_argument("--min-confidence", type=float, default=0.8)
+    parser.add_argument("--k", type=int, default=5, help="neighbours that vote")
+    parser.add_argument("--min-similarity", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with open(args.results, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    evaluate(results, args.holdout, args.min_confidence, k=args.k, min_similarity=args.min_similarity)
@@ -0,0 +1,119 @@
+# the tag vocabulary the tagging pipeline keeps consistent across games
+# prompts show a snapshot of it and every tag a response assigns goes through commit(), which
+# canonicalizes it against the existing tags of its category and adds it. the pipeline commits
+# responses in game order, so with several requests in flight the tags don't depend on which
+# response came back first.
+#
+# each category keeps hash indexes for the variations a new tag is folded into (hyphens vs
+# spaces, a trailing plural "s") and a sorted list kept up to date by insertion, so canonicalizing
+# a tag and showing the first tags of a category cost the same however large the vocabulary gets
+
+import json
+import os
+import threading
+from bisect import insort
+
+TAG_CATEGORIES = [
+    'ratio_tags', 'unique_tags', 'subjective_tags', 'main_genres', 'sub_genres',
+    'sub_sub_genres', 'art_styles', 'themes', 'music_styles'
+]
+
+class TagCategory:
+    """The tags of one category and their canonical-key indexes"""
+
+    def __init__(self, tags=()):
+        # tag -> position it was added at, the earliest tag wins when several match
+        self.rank = {}
+        self.sorted = []
+        self.by_dehyphenated = {}
+        self.by_singular = {}
+        for tag in tags:
+            self.add(tag)
+
+    def __len__(self):
+        return len(self.rank)
+
+    def __contains__(self, tag):
+        return tag in self.rank
+
+    def canonical(self, tag: str) -> str:
+        """Existing tag `tag` is a variation of, else its normalized form"""
+        normalized = tag.strip().lower()
+        if normalized in self.rank:
+            return normalized
+
+        # hyphenated vs not, spaces vs hyphens, plural vs singular in either direction
+        candidates = [
+            self.by_dehyphenated.get(normalized.replace('-', '')),
+            normalized.replace(' ', '-'),
+            normalized.replace('-', ' '),
+            normalized.rstrip('s'),
+            self.by_singular.get(normalized)
+        ]
+        matches = [c for c in candidates if c in self.rank]
+        return min(matches, key=self.rank.get) if matches else normalized
+
+    def add(self, tag: str):
+        if tag in self.rank:
+            return
+        self.rank[tag] = len(self.rank)
+        insort(self.sorted, tag)
+        self.by_dehyphenated.setdefault(tag.replace('-', ''), tag)
+        self.by_singular.setdefault(tag.rstrip('s'), tag)
+
+class TagRegistry:
+    """Canonical tags per category, safe to use from the tagging threads"""
+
+    def __init__(self, categories=TAG_CATEGORIES):
+        self.categories = {category: TagCategory() for category in categories}
+        self.lock = threading.Lock()
+        # number of commits so far, a snapshot taken at version v misses every later commit
+        self.version = 0
+
+    def canonical(self, category: str, tag: str) -> str:
+        with self.lock:
+            return self.categories[category].canonical(tag)
+
+    def snapshot(self, limits: dict) -> dict:
+        """{category: (tag count, first `limit` tags in sorted order)} for the categories in `limits`"""
+        with self.lock:
+            return {category: (len(self.categories[category]), self.categories[category].sorted[:limit])
+                    for category, limit in limits.items()}
+
+    def commit(self, assignments: list) -> list:
+        """Canonicalize and add (category, tag) pairs in order, returns the canonical tags"""
+        canonical = []
+        with self.lock:
+            for category, tag in assignments:
+                tags = self.categories[category]
+                tag = tags.canonical(tag)
+                tags.add(tag)
+                canonical.append(tag)
+            self.version += 1
+        return canonical
+
+    def counts(self) -> dict:
+        with self.lock:
+            return {category: len(tags) for category, tags in self.categories.items()}
+
+    def save(self, filename='tag_context.json'):
+        """Write every category's sorted tags, replacing the file in one step so a crash never truncates it"""
+        with self.lock:
+            context = {category: list(tags.sorted) for category, tags in self.categories.items()}
+        tmp_path = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(context, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+
+    def load(self, filename='tag_context.json') -> bool:
+        """Replace the tags with a saved file's, False when there is no file"""
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return False
+        with self.lock:
+            self.categories = {category: TagCategory(saved.get(category, [])) for category in self.categories}
+        return True
@@ -0,0 +1,191 @@
+# durable per-game jobs for the tagging pipeline, kept in pipeline_state.db
+# a job records the last stage its game completed, along with what later stages need to pick
+# it up again, so a resumed run skips finished work and a stage can be replayed on its own:
+#   queued -> fetched -> analyzed (selected reviews) -> tagged (model response) -> stored
+# raw reviews aren't kept, a job that has to fetch again is served from the http cache.
+# each stage has its own retry budget, a job that keeps failing is parked as dead instead of
+# being stored with placeholder tags, its game keeps its previous result until a new full pass
+# gives it another budget.
+#   python work_queue.py                       stage counts
+#   python work_queue.py --dead                dead jobs and their last error
+#   python work_queue.py --retry-dead          give dead jobs another round of retries
+#   python work_queue.py --replay-from analyzed    tag every stored game again from its saved reviews
+
+import argparse
+import json
+from datetime import datetime
+
+from pipeline_state import PIPELINE_STATE_DB, connect_state
+
+STAGES = ['queued', 'fetched', 'analyzed', 'tagged', 'stored']
+
+# failed attempts at reaching a stage before the job is dead
+STAGE_RETRIES = {
+    'fetched': 3,
+    'analyzed': 2,
+    'tagged': 3
+}
+
+# stages a stored job can be sent back to, the later stages' payloads are dropped
+REPLAY_STAGES = ['analyzed', 'tagged']
+
+class WorkQueue:
+    def __init__(self, db_path=PIPELINE_STATE_DB, retries=None):
+        self.retries = dict(STAGE_RETRIES, **(retries or {}))
+        self.conn = connect_state(db_path)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            steam_appid INTEGER PRIMARY KEY,
+            game TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            dead INTEGER NOT NULL DEFAULT 0,
+            failed_stage TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            fetched TEXT,
+            analysis TEXT,
+            tags TEXT,
+            updated_at TEXT NOT NULL
+        )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_stage ON jobs(stage, dead)")
+        self.conn.commit()
+
+    def unfinished(self) -> int:
+        """Live jobs that haven't been stored, left by a crash or a replay"""
+        return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE stage != 'stored' AND dead = 0").fetchone()[0]
+
+    def start_pass(self, games: list):
+        """Queue games for a new pass, their stored and dead jobs start over with a fresh retry budget"""
+        now = datetime.now().isoformat()
+        self.conn.executemany("""
+        UPDATE jobs SET stage = 'queued', dead = 0, failed_stage = NULL, attempts = 0, last_error = NULL,
+                        fetched = NULL, analysis = NULL, tags = NULL, updated_at = ?
+        WHERE steam_appid = ? AND (stage = 'stored' OR dead = 1)
+        """, [(now, game["steam_appid"]) for game in games])
+        self.enqueue(games)
+
+    def enqueue(self, games: list):
+        """Add jobs for games that don't have one"""
+        now = datetime.now().isoformat()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO jobs (steam_appid, game, stage, updated_at) VALUES (?, ?, 'queued', ?)",
+            [(game["steam_appid"], json.dumps(game, ensure_ascii=False), now) for game in games]
+        )
+        self.conn.commit()
+
+    def get(self, steam_appid) -> dict:
+        """The job for a game with its payloads decoded, None when there is none"""
+        row = self.conn.execute("""
+        SELECT stage, dead, failed_stage, attempts, last_error, fetched, analysis, tags FROM jobs WHERE steam_appid = ?
+        """, (steam_appid,)).fetchone()
+        if row is None:
+            return None
+        stage, dead, failed_stage, attempts, last_error, fetched, analysis, tags = row
+        return {
+            "stage": stage,
+            "dead": bool(dead),
+            "failed_stage": failed_stage,
+            "attempts": attempts,
+            "last_error": last_error,
+            "fetched": json.loads(fetched) if fetched else None,
+            "analysis": json.loads(analysis) if analysis else None,
+            "tags": json.loads(tags) if tags else None
+        }
+
+    def advance(self, steam_appid, stage: str, **payloads):
+        """Record that a game completed `stage`, storing that stage's payloads (fetched, analysis, tags).
+
+        Failed attempts are only forgotten once the stage that failed is done, so a job retried from an
+        earlier stage can't fail a later one forever.
+        """
+        assignments = ''.join(f", {column} = ?" for column in payloads)
+        values = [json.dumps(value, ensure_ascii=False) for value in payloads.values()]
+        self.conn.execute(
+            f"""UPDATE jobs SET stage = ?, updated_at = ?{assignments},
+                attempts = CASE WHEN failed_stage = ? THEN 0 ELSE attempts END,
+                failed_stage = CASE WHEN failed_stage = ? THEN NULL ELSE failed_stage END
+            WHERE steam_appid = ?""",
+            [stage, datetime.now().isoformat(), *values, stage, stage, steam_appid]
+        )
+        self.conn.commit()
+
+    def fail(self, steam_appid, stage: str, error: str) -> bool:
+        """Count a failed attempt at reaching `stage`, True while the job has retries left"""
+        failed_stage, attempts = self.conn.execute(
+            "SELECT failed_stage, attempts FROM jobs WHERE steam_appid = ?", (steam_appid,)
+        ).fetchone()
+        attempts = attempts + 1 if failed_stage == stage else 1
+        dead = attempts >= self.retries.get(stage, 1)
+        self.conn.execute(
+            "UPDATE jobs SET failed_stage = ?, attempts = ?, last_error = ?, dead = ?, updated_at = ? WHERE steam_appid = ?",
+            (stage, attempts, f"{stage}: {error}", int(dead), datetime.now().isoformat(), steam_appid)
+        )
+        self.conn.commit()
+        return not dead
+
+    def replay(self, stage: str, appids=None) -> int:
+        """Send stored jobs back to `stage` so the next run redoes what comes after it, returns how many moved"""
+        if stage not in REPLAY_STAGES:
+            raise ValueError(f"can only replay from {', '.join(REPLAY_STAGES)}")
+        cleared = ", tags = NULL" if stage == 'analyzed' else ""
+        query = f"UPDATE jobs SET stage = ?, failed_stage = NULL, attempts = 0, last_error = NULL{cleared}, updated_at = ? WHERE stage = 'stored' AND dead = 0"
+        params = [stage, datetime.now().isoformat()]
+        if stage == 'tagged':
+            # only jobs whose response was saved can skip the model
+            query += " AND tags IS NOT NULL"
+        else:
+            query += " AND analysis IS NOT NULL"
+        if appids:
+            query += f" AND steam_appid IN ({','.join('?' * len(appids))})"
+            params += list(appids)
+        moved = self.conn.execute(query, params).rowcount
+        self.conn.commit()
+        return moved
+
+    def retry_dead(self) -> int:
+        moved = self.conn.execute(
+            "UPDATE jobs SET dead = 0, failed_stage = NULL, attempts = 0, updated_at = ? WHERE dead = 1", (datetime.now().isoformat(),)
+        ).rowcount
+        self.conn.commit()
+        return moved
+
+    def dead_jobs(self) -> list:
+        """(steam_appid, game name, stage reached, last error) of every dead job"""
+        return [(appid, json.loads(game)["game_name"], stage, last_error) for appid, game, stage, last_error in
+                self.conn.execute("SELECT steam_appid, game, stage, last_error FROM jobs WHERE dead = 1 ORDER BY steam_appid")]
+
+    def counts(self) -> dict:
+        counts = {stage: 0 for stage in STAGES}
+        counts['dead'] = 0
+        for stage, dead, count in self.conn.execute("SELECT stage, dead, COUNT(*) FROM jobs GROUP BY stage, dead"):
+            counts['dead' if dead else stage] += count
+        return counts
+
+    def print_stats(self):
+        counts = self.counts()
+        print("work queue: " + ', '.join(f"{count} {stage}" for stage, count in counts.items() if count))
+
+    def close(self):
+        self.conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and replay the tagging pipeline's work queue")
+    parser.add_argument("--db", default=PIPELINE_STATE_DB)
+    parser.add_argument("--dead", action="store_true", help="list dead jobs with their last error")
+    parser.add_argument("--retry-dead", action="store_true", help="give dead jobs their retries again")
+    parser.add_argument("--replay-from", choices=REPLAY_STAGES,
+                        help="send stored games back to a stage, the next extract_verdicts.py run redoes the rest")
+    parser.add_argument("--appids", type=int, nargs="+", help="limit --replay-from to these games")
+    args = parser.parse_args()
+
+    work_queue = WorkQueue(args.db)
+    if args.retry_dead:
+        print(f"{work_queue.retry_dead()} dead jobs queued again")
+    if args.replay_from:
+        print(f"{work_queue.replay(args.replay_from, args.appids)} stored jobs sent back to {args.replay_from}")
+    if args.dead:
+        for appid, name, stage, last_error in work_queue.dead_jobs():
+            print(f"{appid} {name}: stuck after {stage}, {last_error}")
+    work_queue.print_stats()
+    work_queue.close()
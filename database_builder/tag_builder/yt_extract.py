@@ -3,18 +3,29 @@ import json
 from dotenv import load_dotenv
 from googleapiclient.discovery import build
 from youtube_transcript_api import YouTubeTranscriptApi
+from http_cache import HTTP_CACHE
 
 def request_channel_id(servicer: object) -> str:
-    return servicer.channels().list(part = 'id', forHandle = '@gameranxTV').execute()['items'][0]['id']
+    response = HTTP_CACHE.call('youtube_api', ['channels', '@gameranxTV'],
+                               lambda: servicer.channels().list(part = 'id', forHandle = '@gameranxTV').execute())
+    return response['items'][0]['id']
     
 def request_videos(servicer: object, channel_id: str, video_count: int) -> dict:
-    return servicer.search().list(
+    return HTTP_CACHE.call('youtube_api', ['search', channel_id, video_count], lambda: servicer.search().list(
         part = 'snippet',
         channelId = channel_id,
         type = 'video',
         videoCaption = 'closedCaption',
         maxResults = video_count,
-        order = 'date').execute()
+        order = 'date').execute())
+
+def request_video_details(servicer: object, vid: str) -> dict:
+    return HTTP_CACHE.call('youtube_api', ['videos', vid],
+                           lambda: servicer.videos().list(part = 'topicDetails,snippet', id = vid).execute())
+
+@HTTP_CACHE.memoize('youtube_transcript')
+def request_transcript(vid: str) -> list:
+    return YouTubeTranscriptApi().get_transcript(vid)
         
 def dump_json(servicer: object, videos_response: dict) -> None:
     URL_TEMPLATE = "https://www.youtube.com/watch?v="
@@ -22,10 +33,9 @@ def dump_json(servicer: object, videos_response: dict) -> None:
               for item in videos_response['items']}
     
     all_verdicts = []
-    ytt_api = YouTubeTranscriptApi()
     
     for vid, info in videos.items():
-        video_response = servicer.videos().list(part = 'topicDetails,snippet', id = vid).execute()
+        video_response = request_video_details(servicer, vid)
         
         tags = video_response['items'][0]['snippet'].get('tags', [])
         
@@ -35,7 +45,7 @@ def dump_json(servicer: object, videos_response: dict) -> None:
             topics = {}
             
         try:
-            transcript = "".join(line['text'] for line in ytt_api.get_transcript(vid))
+            transcript = "".join(line['text'] for line in request_transcript(vid))
         except Exception:
             transcript = ""
             